@@ -20,13 +20,48 @@ document.addEventListener('DOMContentLoaded', function() {
     });
     
     // Форматирование сумм
-    document.querySelectorAll('.income, .expense').forEach(el => {
+    formatAmounts(document);
+
+    // Подгрузка следующей страницы («Загрузить ещё») без перезагрузки
+    document.querySelectorAll('[data-load-more]').forEach(link => {
+        link.addEventListener('click', function(e) {
+            e.preventDefault();
+            loadMore(this);
+        });
+    });
+});
+
+function formatAmounts(root) {
+    root.querySelectorAll('.income, .expense').forEach(el => {
         const amount = parseFloat(el.textContent);
         if (!isNaN(amount)) {
             el.textContent = formatCurrency(amount);
         }
     });
-});
+}
+
+function loadMore(link) {
+    const targetId = link.dataset.loadMore;
+    fetch(link.href, { headers: { 'X-Requested-With': 'XMLHttpRequest' } })
+        .then(response => response.text())
+        .then(html => {
+            const page = new DOMParser().parseFromString(html, 'text/html');
+            const target = document.getElementById(targetId);
+            page.querySelectorAll(`#${targetId} > tr`).forEach(row => {
+                formatAmounts(row);
+                target.appendChild(row);
+            });
+            const next = page.querySelector(`[data-load-more="${targetId}"]`);
+            if (next) {
+                link.href = next.getAttribute('href');
+            } else {
+                link.parentElement.remove();
+            }
+        })
+        .catch(() => {
+            window.location.href = link.href;
+        });
+}
 
 function formatCurrency(amount) {
     return new Intl.NumberFormat('ru-RU', {
@@ -1,5 +1,58 @@
 from django.contrib import admin
-from .models import Category, Transaction
+from .models import (
+    Account, ArchivedTransaction, Budget, Category, ExchangeRate, Job, Profile, RecurringRule, Transaction,
+)
 
 admin.site.register(Category)
 admin.site.register(Transaction)
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'kind', 'status', 'progress', 'created_at', 'finished_at')
+    list_filter = ('kind', 'status')
+
+
+@admin.register(RecurringRule)
+class RecurringRuleAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'type', 'amount', 'frequency', 'interval', 'next_date', 'is_active')
+    list_filter = ('frequency', 'is_active')
+
+
+@admin.register(Account)
+class AccountAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'name', 'kind', 'currency', 'opening_balance', 'balance')
+    list_filter = ('kind', 'currency')
+    readonly_fields = ('balance',)
+
+
+@admin.register(Profile)
+class ProfileAdmin(admin.ModelAdmin):
+    list_display = ('user', 'base_currency')
+
+
+@admin.register(ExchangeRate)
+class ExchangeRateAdmin(admin.ModelAdmin):
+    list_display = ('date', 'currency', 'rate')
+    list_filter = ('currency',)
+    date_hierarchy = 'date'
+
+
+@admin.register(Budget)
+class BudgetAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'category', 'limit', 'currency', 'alert', 'alert_month')
+    list_filter = ('alert', 'currency')
+    readonly_fields = ('alert', 'alert_month', 'alerted_at')
+
+
+@admin.register(ArchivedTransaction)
+class ArchivedTransactionAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'date', 'type', 'amount', 'currency', 'category')
+    list_filter = ('type', 'currency')
+    date_hierarchy = 'date'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,304 @@
+"""
+Аналитика по рядам транзакций: скользящие средние, рост к прошлому месяцу,
+прогноз расходов по категориям на следующий месяц, аномальные операции.
+
+Транзакции пользователя читаются одним запросом values_list в массивы
+NumPy, дальше все считается векторно (bincount, cumsum, матричные
+операции) без циклов по строкам. Окно загрузки начинается раньше
+периода: на 30 дней — для скользящих средних на первые дни периода и
+на FORECAST_HISTORY_MONTHS месяцев — для прогноза.
+
+Суммы переводятся в валюту отчета (по умолчанию базовую валюту
+пользователя) тем же запросом, см. currency.converted.
+
+NumPy — необязательная зависимость: без него аналитика недоступна
+(analytics_available()), остальная статистика работает.
+"""
+from datetime import date, timedelta
+
+from django.db.models import FloatField, Value
+from django.db.models.functions import Cast, Coalesce
+
+from .archive import transaction_source
+from .cache import get_or_compute
+from .currency import converted, get_base_currency
+from .models import Category, Transaction
+from .statistics import decimal_to_float
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+DEFAULT_PERIOD_DAYS = 365
+ROLLING_WINDOWS = (7, 30)
+# Месяцев истории для прогноза; сезонная модель — от 24 месяцев
+FORECAST_HISTORY_MONTHS = 36
+SEASONAL_MIN_MONTHS = 24
+LINEAR_MIN_MONTHS = 3
+# Аномалия — |z| не меньше порога в группе (тип, категория)
+# не меньше чем из OUTLIER_MIN_GROUP операций
+Z_SCORE_THRESHOLD = 3.0
+OUTLIER_MIN_GROUP = 10
+OUTLIERS_LIMIT = 20
+
+UNCATEGORIZED = 0
+
+
+def analytics_available():
+    return np is not None
+
+
+def _month_number(day):
+    """Номер месяца с 1970-01 (как у datetime64[M])"""
+    return (day.year - 1970) * 12 + day.month - 1
+
+
+def _month_start(number):
+    return date(1970 + number // 12, number % 12 + 1, 1)
+
+
+def _month_label(number):
+    return f'{1970 + number // 12:04d}-{number % 12 + 1:02d}'
+
+
+def _rounded(values):
+    return np.round(values, 2).tolist()
+
+
+def _percent(value):
+    return None if np.isnan(value) else round(float(value), 1)
+
+
+def load_series(user, date_from, date_to, currency):
+    """
+    Транзакции пользователя с date_from по date_to одним запросом:
+    массивы id, дней (datetime64[D]), признака дохода, категорий
+    (0 — без категории) и сумм в валюте currency (float64)
+    """
+    rows = transaction_source(date_from).objects.filter(
+        user=user,
+        date__range=[date_from, date_to],
+    ).order_by().values_list(
+        'pk',
+        'date',
+        'type',
+        Coalesce('category_id', Value(UNCATEGORIZED)),
+        Cast(converted('amount', currency), FloatField()),
+    )
+    columns = list(zip(*rows)) or [(), (), (), (), ()]
+    ids, dates, types, categories, amounts = columns
+    return {
+        'ids': np.array(ids, dtype=np.int64),
+        'dates': np.array(dates, dtype='datetime64[D]'),
+        'is_income': np.array(types, dtype=object) == Transaction.INCOME,
+        'categories': np.array(categories, dtype=np.int64),
+        'amounts': np.array(amounts, dtype=np.float64),
+    }
+
+
+def daily_series(series, load_from, date_from, date_to):
+    """Доходы и расходы по дням периода со скользящими средними"""
+    days = (date_to - load_from).days + 1
+    offsets = (series['dates'] - np.datetime64(load_from, 'D')).astype(np.int64)
+    is_income = series['is_income']
+    totals = {
+        'income': np.bincount(offsets[is_income], weights=series['amounts'][is_income], minlength=days),
+        'expense': np.bincount(offsets[~is_income], weights=series['amounts'][~is_income], minlength=days),
+    }
+
+    start = (date_from - load_from).days
+    result = {
+        'dates': np.arange(
+            np.datetime64(date_from, 'D'), np.datetime64(date_to, 'D') + 1,
+        ).astype(str).tolist(),
+    }
+    for name, values in totals.items():
+        result[name] = _rounded(values[start:])
+        # Скользящее среднее по календарным дням (дни без операций — нули)
+        cumulative = np.concatenate(([0.0], np.cumsum(values)))
+        for window in ROLLING_WINDOWS:
+            end = np.arange(start, days) + 1
+            begin = np.maximum(end - window, 0)
+            result[f'{name}_avg_{window}'] = _rounded((cumulative[end] - cumulative[begin]) / (end - begin))
+    return result
+
+
+def monthly_growth(series, date_from, date_to):
+    """Доходы и расходы по месяцам периода и рост к предыдущему месяцу, %"""
+    first = _month_number(date_from)
+    last = _month_number(date_to)
+    # Предыдущий месяц нужен для роста первого месяца периода
+    months = series['dates'].astype('datetime64[M]').astype(np.int64) - (first - 1)
+    in_range = (months >= 0) & (months <= last - first + 1)
+    size = last - first + 2
+
+    totals = {}
+    for name, mask in (('income', series['is_income']), ('expense', ~series['is_income'])):
+        mask = mask & in_range
+        totals[name] = np.bincount(months[mask], weights=series['amounts'][mask], minlength=size)
+
+    growth = {}
+    for name, values in totals.items():
+        previous, current = values[:-1], values[1:]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            percent = np.where(previous > 0, (current - previous) / previous * 100, np.nan)
+        growth[name] = percent
+
+    result = []
+    for index, number in enumerate(range(first, last + 1)):
+        result.append({
+            'month': _month_label(number),
+            'income': round(float(totals['income'][index + 1]), 2),
+            'expense': round(float(totals['expense'][index + 1]), 2),
+            'income_growth': _percent(growth['income'][index]),
+            'expense_growth': _percent(growth['expense'][index]),
+        })
+    return result
+
+
+def forecast_history(date_to):
+    """(первый, последний) полные месяцы истории прогноза и месяц прогноза"""
+    target = _month_number(date_to) + 1
+    # Неполный текущий месяц в историю не входит
+    last = target - 1 if (date_to + timedelta(days=1)).day == 1 else target - 2
+    return last - FORECAST_HISTORY_MONTHS + 1, last, target
+
+
+def forecast_expenses(series, date_to, category_names):
+    """
+    Прогноз расходов по категориям на месяц после date_to.
+    Векторно по всем категориям сразу: сезонная модель (тот же месяц
+    год назад с поправкой на изменение среднего за год) при истории
+    от SEASONAL_MIN_MONTHS месяцев, линейный тренд — от LINEAR_MIN_MONTHS,
+    иначе среднее
+    """
+    first, last, target = forecast_history(date_to)
+    months = series['dates'].astype('datetime64[M]').astype(np.int64)
+    mask = ~series['is_income'] & (months >= first) & (months <= last)
+    if not mask.any():
+        return {'month': _month_label(target), 'method': None, 'total': 0.0, 'categories': []}
+
+    # История начинается с первого месяца, в котором были расходы
+    first = int(months[mask].min())
+    size = last - first + 1
+    categories, category_index = np.unique(series['categories'][mask], return_inverse=True)
+    matrix = np.bincount(
+        category_index * size + (months[mask] - first),
+        weights=series['amounts'][mask],
+        minlength=len(categories) * size,
+    ).reshape(len(categories), size)
+
+    horizon = target - last
+    if size >= SEASONAL_MIN_MONTHS:
+        method = 'seasonal'
+        level_change = matrix[:, -12:].mean(axis=1) - matrix[:, -24:-12].mean(axis=1)
+        forecast = matrix[:, size - 1 + horizon - 12] + level_change
+    elif size >= LINEAR_MIN_MONTHS:
+        method = 'linear'
+        x = np.arange(size, dtype=np.float64)
+        centered = x - x.mean()
+        slope = matrix @ centered / (centered @ centered)
+        forecast = matrix.mean(axis=1) + slope * (size - 1 + horizon - x.mean())
+    else:
+        method = 'mean'
+        forecast = matrix.mean(axis=1)
+    forecast = np.maximum(forecast, 0)
+
+    order = np.argsort(-forecast, kind='stable')
+    return {
+        'month': _month_label(target),
+        'method': method,
+        'total': round(float(forecast.sum()), 2),
+        'categories': [
+            {
+                'category': category_names.get(int(categories[index])),
+                'forecast': round(float(forecast[index]), 2),
+                'last_month': round(float(matrix[index, -1]), 2),
+                'average': round(float(matrix[index].mean()), 2),
+            }
+            for index in order
+        ],
+    }
+
+
+def find_outliers(series, in_period):
+    """
+    Аномальные операции периода: z-оценка суммы внутри группы
+    (тип, категория). Возвращает [(id, z), ...] по убыванию |z|
+    """
+    amounts = series['amounts'][in_period]
+    if not len(amounts):
+        return []
+    # Группа — (категория, тип) одним целым ключом
+    keys = series['categories'][in_period] * 2 + series['is_income'][in_period]
+    _, group = np.unique(keys, return_inverse=True)
+    counts = np.bincount(group)
+    means = np.bincount(group, weights=amounts) / counts
+    variances = np.bincount(group, weights=amounts ** 2) / counts - means ** 2
+    stds = np.sqrt(np.maximum(variances, 0))
+
+    valid = (counts[group] >= OUTLIER_MIN_GROUP) & (stds[group] > 0)
+    z = np.zeros_like(amounts)
+    z[valid] = (amounts[valid] - means[group][valid]) / stds[group][valid]
+    flagged = np.flatnonzero(np.abs(z) >= Z_SCORE_THRESHOLD)
+    flagged = flagged[np.argsort(-np.abs(z[flagged]), kind='stable')][:OUTLIERS_LIMIT]
+    ids = series['ids'][in_period]
+    return [(int(ids[index]), round(float(z[index]), 2)) for index in flagged]
+
+
+def _outlier_details(outliers, date_from):
+    if not outliers:
+        return []
+    transactions = transaction_source(date_from).objects.select_related('category').in_bulk(
+        [pk for pk, _ in outliers]
+    )
+    return [
+        {
+            'id': pk,
+            'date': transactions[pk].date.isoformat(),
+            'type': transactions[pk].type,
+            'amount': decimal_to_float(transactions[pk].amount),
+            'currency': transactions[pk].currency,
+            'category': transactions[pk].category.name if transactions[pk].category else None,
+            'description': transactions[pk].description,
+            'z_score': z,
+        }
+        for pk, z in outliers
+        if pk in transactions
+    ]
+
+
+def compute_analytics(user, date_from, date_to, currency=None):
+    """Вся аналитика за период: один запрос рядов + имена категорий и детали аномалий"""
+    currency = currency or get_base_currency(user)
+    forecast_from = _month_start(forecast_history(date_to)[0])
+    load_from = min(date_from - timedelta(days=max(ROLLING_WINDOWS) - 1), forecast_from)
+    series = load_series(user, load_from, date_to, currency)
+
+    category_names = dict(
+        Category.objects.filter(pk__in=set(series['categories'].tolist()) - {UNCATEGORIZED})
+        .values_list('pk', 'name')
+    )
+    in_period = series['dates'] >= np.datetime64(date_from, 'D')
+
+    return {
+        'date_range': {'from': date_from.isoformat(), 'to': date_to.isoformat()},
+        'currency': currency,
+        'daily': daily_series(series, load_from, date_from, date_to),
+        'monthly': monthly_growth(series, date_from, date_to),
+        'forecast': forecast_expenses(series, date_to, category_names),
+        'outliers': _outlier_details(find_outliers(series, in_period), date_from),
+    }
+
+
+def get_analytics(user, date_from, date_to, currency=None):
+    """
+    Аналитика пользователя за период в валюте currency (None — базовая
+    валюта пользователя) через кэш, см. cache.py
+    """
+    return get_or_compute(
+        'analytics', user.pk, [date_from, date_to, currency],
+        lambda: compute_analytics(user, date_from, date_to, currency),
+    )
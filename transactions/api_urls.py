@@ -1,12 +1,36 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import CategoryViewSet, TransactionViewSet, StatisticsView
+from .views import (
+    AccountViewSet,
+    BudgetViewSet,
+    CategoryViewSet,
+    TransactionViewSet,
+    StatisticsView,
+    AnalyticsView,
+    ProfileView,
+    SyncView,
+    JobViewSet,
+    RecurringRuleViewSet,
+    AsyncStatisticsView,
+    AsyncTransactionListView,
+)
 
 router = DefaultRouter()
+router.register(r'accounts', AccountViewSet, basename='account')
+router.register(r'budgets', BudgetViewSet, basename='budget')
 router.register(r'categories', CategoryViewSet, basename='category')
 router.register(r'transactions', TransactionViewSet, basename='transaction')
+router.register(r'jobs', JobViewSet, basename='job')
+router.register(r'recurring', RecurringRuleViewSet, basename='recurring-rule')
 # API
 urlpatterns = [
     path('', include(router.urls)),
     path('statistics/', StatisticsView.as_view(), name='statistics_api'),
+    path('analytics/', AnalyticsView.as_view(), name='analytics_api'),
+    path('profile/', ProfileView.as_view(), name='profile_api'),
+    path('sync/', SyncView.as_view(), name='sync_api'),
+
+    # Async (ASGI) варианты списка и статистики
+    path('async/statistics/', AsyncStatisticsView.as_view(), name='statistics_async_api'),
+    path('async/transactions/', AsyncTransactionListView.as_view(), name='transaction_list_async_api'),
 ]
\ No newline at end of file
@@ -2,4 +2,13 @@ from django.apps import AppConfig
 
 
 class TransactionsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
     name = 'transactions'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from . import checks, signals  # noqa: F401
+        from .db import configure_sqlite
+
+        connection_created.connect(configure_sqlite, dispatch_uid='transactions_configure_sqlite')
@@ -0,0 +1,107 @@
+"""
+Архив старых операций.
+
+Операции старше горизонта переносятся из transactions_transaction
+в transactions_archivedtransaction (manage.py archive_transactions),
+чтобы горячая таблица, ее индексы и FTS-индекс поиска оставались
+небольшими. Горизонт — начало года, в который попадает дата
+ARCHIVE['AFTER_DAYS'] дней назад, поэтому в архиве только целые годы.
+
+Сводки (rollups.py) и остатки счетов при переносе не меняются — они уже
+учитывают эти операции, поэтому статистика и бюджеты видят всю историю
+без обращения к архиву. Операции там, где нужны сами строки (список,
+фильтры, выгрузка, аналитика, крупные операции), читаются через
+transaction_source: если период начинается не раньше горизонта — из
+горячей таблицы, иначе — из представления transactions_ledger (UNION ALL
+обеих таблиц, модель LedgerTransaction). Архивные операции доступны
+только для чтения.
+
+Если горизонт сдвинуть назад (увеличить AFTER_DAYS), команду нужно
+запустить снова: она вернет в горячую таблицу операции не старше нового
+горизонта.
+"""
+from collections import Counter
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import connection, transaction as db_transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .cache import bump_data_version
+from .models import ArchivedTransaction, LedgerTransaction, Transaction
+
+
+def archive_horizon(today=None):
+    """Первый день, операции которого остаются в горячей таблице"""
+    today = today or timezone.localdate()
+    return date((today - timedelta(days=settings.ARCHIVE['AFTER_DAYS'])).year, 1, 1)
+
+
+def transaction_source(date_from=None):
+    """
+    Модель для чтения операций с date_from (None — за все время):
+    Transaction, если период не захватывает архив, иначе LedgerTransaction
+    """
+    if date_from is not None and date_from >= archive_horizon():
+        return Transaction
+    return LedgerTransaction
+
+
+def params_source(params):
+    """transaction_source по параметру date_from фильтров (TransactionFilter)"""
+    try:
+        date_from = parse_date(params.get('date_from') or '')
+    except ValueError:
+        date_from = None
+    return transaction_source(date_from)
+
+
+def _move(source, target, condition, batch_size):
+    """
+    Перенос строк source, подходящих под condition, в target пачками
+    по batch_size: INSERT ... SELECT и DELETE в одной транзакции на пачку.
+    Запросы в обход ORM — без сигналов (сводки, остатки и отметки
+    синхронизации не меняются) и с исходными id и отметками времени.
+    FTS-индекс поиска поддерживают триггеры горячей таблицы, версию
+    данных пользователей (признак archived в списках) — bump_data_version.
+    Возвращает число перенесенных строк по годам
+    """
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(field.column) for field in Transaction._meta.concrete_fields)
+    source_table, target_table = quote(source._meta.db_table), quote(target._meta.db_table)
+    years = Counter()
+    while True:
+        with db_transaction.atomic():
+            batch = list(
+                source.objects.filter(condition).order_by('pk').values_list('pk', 'date', 'user_id')[:batch_size]
+            )
+            if not batch:
+                return years
+            ids = [pk for pk, _, _ in batch]
+            placeholders = ', '.join(['%s'] * len(ids))
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'INSERT INTO {target_table} ({columns}) '
+                    f'SELECT {columns} FROM {source_table} WHERE id IN ({placeholders})',
+                    ids,
+                )
+                cursor.execute(f'DELETE FROM {source_table} WHERE id IN ({placeholders})', ids)
+            bump_data_version(*{user_id for _, _, user_id in batch})
+        years.update(day.year for _, day, _ in batch)
+
+
+def archive_transactions(batch_size=None):
+    """
+    Перенести в архив операции старше горизонта и вернуть из архива
+    операции не старше его. Повторный запуск безопасен. Возвращает
+    горизонт и число перенесенных операций по годам
+    """
+    horizon = archive_horizon()
+    batch_size = batch_size or settings.ARCHIVE['BATCH_SIZE']
+    return {
+        'horizon': horizon,
+        'archived': _move(Transaction, ArchivedTransaction, Q(date__lt=horizon), batch_size),
+        'restored': _move(ArchivedTransaction, Transaction, Q(date__gte=horizon), batch_size),
+    }
@@ -0,0 +1,32 @@
+"""
+Параллельные запросы к БД из async-представлений.
+
+Асинхронные методы ORM (aaggregate, acount, ...) выполняются по одному
+в общем потоке sync_to_async(thread_sensitive=True). Независимые запросы
+здесь запускаются в отдельных потоках, каждый со своим соединением,
+и выполняются одновременно.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+
+def _run_closing(func, *args):
+    close_old_connections()
+    try:
+        return func(*args)
+    finally:
+        # Соединение потока пула закрывается по тем же правилам, что и
+        # соединение запроса (CONN_MAX_AGE)
+        close_old_connections()
+
+
+async def run_in_thread(func, *args):
+    """func(*args) в потоке пула со своим соединением с БД"""
+    return await sync_to_async(_run_closing, thread_sensitive=False)(func, *args)
+
+
+async def gather_in_threads(*calls):
+    """Одновременное выполнение вызовов (func, *args); результаты — в том же порядке"""
+    return await asyncio.gather(*(run_in_thread(*call) for call in calls))
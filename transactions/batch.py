@@ -0,0 +1,248 @@
+"""
+Пакетные операции над транзакциями (создание, частичное изменение, удаление).
+
+Все операции пакета проверяются вместе и применяются в одной транзакции БД
+через bulk_create/bulk_update, а сводки обновляются одним проходом.
+"""
+from django.db import transaction as db_transaction
+from rest_framework import serializers
+
+from .models import Account, Category, Transaction
+from .rollups import ROLLUP_FIELDS, apply_transactions, defer_rollups
+from .serializers import TransactionSerializer
+from .sync import defer_tombstones
+
+
+MAX_BATCH_OPERATIONS = 1000
+
+
+def _collect_category_ids(items):
+    ids = set()
+    for item in items:
+        value = item.get('category') if isinstance(item, dict) else None
+        if value not in (None, ''):
+            try:
+                ids.add(int(value))
+            except (TypeError, ValueError):
+                pass
+    return ids
+
+
+def _is_id(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _result(index, status, data=None, errors=None, pk=None):
+    result = {'index': index, 'status': status}
+    if pk is not None:
+        result['id'] = pk
+    if data is not None:
+        result['data'] = data
+    if errors is not None:
+        result['errors'] = errors
+    return result
+
+
+class TransactionBatch:
+    """Разбор, проверка и применение пакета {create, update, delete}"""
+
+    def __init__(self, request, payload):
+        self.request = request
+        self.user = request.user
+        self.create_items = payload.get('create') or []
+        self.update_items = payload.get('update') or []
+        self.delete_ids = payload.get('delete') or []
+
+    def validate_shape(self):
+        for name, value in (('create', self.create_items),
+                            ('update', self.update_items),
+                            ('delete', self.delete_ids)):
+            if not isinstance(value, list):
+                raise serializers.ValidationError({name: ['Ожидался список']})
+        # id — ключи словарей и множеств при проверке: только целые числа
+        errors = {}
+        for name, ids in (('update', [item.get('id') if isinstance(item, dict) else None
+                                      for item in self.update_items]),
+                          ('delete', self.delete_ids)):
+            invalid = {index: {'id': ['Ожидался целочисленный id']}
+                       for index, pk in enumerate(ids) if not _is_id(pk)}
+            if invalid:
+                errors[name] = invalid
+        if errors:
+            raise serializers.ValidationError(errors)
+        total = len(self.create_items) + len(self.update_items) + len(self.delete_ids)
+        if total > MAX_BATCH_OPERATIONS:
+            raise serializers.ValidationError(
+                {'non_field_errors': [f'Не более {MAX_BATCH_OPERATIONS} операций в пакете']}
+            )
+
+    def get_context(self):
+        category_ids = _collect_category_ids(self.create_items + self.update_items)
+        categories = Category.objects.filter(user=self.user, pk__in=category_ids)
+        # Счетов у пользователя единицы — берутся все сразу
+        accounts = Account.objects.filter(user=self.user)
+        return {
+            'request': self.request,
+            'categories': {category.pk: category for category in categories},
+            'accounts': {account.pk: account for account in accounts},
+        }
+
+    def validate(self):
+        """Проверка всех операций. Возвращает True, если ошибок нет"""
+        self.validate_shape()
+        context = self.get_context()
+        self.valid = True
+
+        # Создание: одна проверка many=True
+        create_serializer = TransactionSerializer(
+            data=self.create_items, many=True, context=context
+        )
+        if create_serializer.is_valid():
+            validated = list(create_serializer.validated_data)
+            errors = [{}] * len(self.create_items)
+        else:
+            validated = [None] * len(self.create_items)
+            errors = create_serializer.errors
+            if isinstance(errors, dict):
+                # Ошибки только по некорректным элементам: {индекс: ошибки}
+                errors = [errors.get(index, {}) for index in range(len(self.create_items))]
+        self.create_results = []
+        self.create_valid = []
+        for index, item_errors in enumerate(errors):
+            if item_errors:
+                self.valid = False
+                self.create_results.append(_result(index, 400, errors=item_errors))
+                continue
+            data = validated[index]
+            if data is None:
+                # Список целиком не прошел проверку — данные корректных
+                # элементов нужно получить отдельно
+                data = create_serializer.child.run_validation(self.create_items[index])
+            self.create_results.append(None)
+            self.create_valid.append((index, data))
+
+        # Изменение: все объекты пакета — одним запросом
+        update_ids = [item['id'] for item in self.update_items]
+        instances = Transaction.objects.filter(user=self.user, pk__in=update_ids).in_bulk()
+        self.update_results = []
+        self.update_valid = []
+        seen = set()
+        deleted = set(self.delete_ids)
+        for index, item in enumerate(self.update_items):
+            pk = item['id']
+            instance = instances.get(pk)
+            if pk in seen or pk in deleted:
+                self.valid = False
+                self.update_results.append(_result(index, 400, pk=pk, errors={
+                    'id': ['Объект уже изменяется или удаляется в этом пакете']
+                }))
+                continue
+            seen.add(pk)
+            if instance is None:
+                self.valid = False
+                self.update_results.append(_result(index, 404, pk=pk, errors={'id': ['Не найдено']}))
+                continue
+            serializer = TransactionSerializer(instance, data=item, partial=True, context=context)
+            if serializer.is_valid():
+                self.update_results.append(None)
+                self.update_valid.append((index, instance, serializer.validated_data))
+            else:
+                self.valid = False
+                self.update_results.append(_result(index, 400, pk=pk, errors=serializer.errors))
+
+        # Удаление
+        existing = set(Transaction.objects.filter(
+            user=self.user, pk__in=self.delete_ids
+        ).values_list('pk', flat=True))
+        self.delete_results = []
+        self.delete_valid = []
+        for index, pk in enumerate(self.delete_ids):
+            if pk in existing:
+                existing.discard(pk)
+                self.delete_results.append(None)
+                self.delete_valid.append((index, pk))
+            else:
+                self.valid = False
+                self.delete_results.append(_result(index, 404, pk=pk, errors={'id': ['Не найдено']}))
+        return self.valid
+
+    def apply(self):
+        with db_transaction.atomic(), defer_rollups(), defer_tombstones():
+            self._apply_creates()
+            self._apply_updates()
+            self._apply_deletes()
+
+    def _apply_creates(self):
+        if not self.create_valid:
+            return
+        objects = [
+            Transaction(user=self.user, **data) for _, data in self.create_valid
+        ]
+        Transaction.objects.bulk_create(objects)
+        apply_transactions(objects)
+        for (index, _), obj in zip(self.create_valid, objects):
+            self.create_results[index] = _result(
+                index, 201, pk=obj.pk, data=TransactionSerializer(obj).data
+            )
+
+    def _apply_updates(self):
+        if not self.update_valid:
+            return
+        # Прежние значения (основа изменений сводок) — из строк, заблокированных
+        # в этой транзакции: проверка шла вне ее, и строки могли измениться
+        locked = Transaction.objects.select_for_update().filter(
+            user=self.user, pk__in=[instance.pk for _, instance, _ in self.update_valid]
+        ).in_bulk()
+        update_valid = []
+        for index, instance, data in self.update_valid:
+            if instance.pk in locked:
+                update_valid.append((index, locked[instance.pk], data))
+            else:
+                self.update_results[index] = _result(index, 404, pk=instance.pk, errors={'id': ['Не найдено']})
+        self.update_valid = update_valid
+        if not self.update_valid:
+            return
+        previous = [
+            {field: getattr(instance, field) for field in ROLLUP_FIELDS}
+            for _, instance, _ in self.update_valid
+        ]
+        fields = set()
+        for _, instance, data in self.update_valid:
+            for field, value in data.items():
+                setattr(instance, field, value)
+                fields.add(field)
+        instances = [instance for _, instance, _ in self.update_valid]
+        Transaction.objects.bulk_update(instances, sorted(fields))
+        apply_transactions(previous, sign=-1)
+        apply_transactions(instances)
+        for index, instance, _ in self.update_valid:
+            self.update_results[index] = _result(
+                index, 200, pk=instance.pk, data=TransactionSerializer(instance).data
+            )
+
+    def _apply_deletes(self):
+        if not self.delete_valid:
+            return
+        # Сигналы post_delete обновят сводки (отложенно, одним проходом)
+        Transaction.objects.filter(
+            user=self.user, pk__in=[pk for _, pk in self.delete_valid]
+        ).delete()
+        for index, pk in self.delete_valid:
+            self.delete_results[index] = _result(index, 204, pk=pk)
+
+    def mark_skipped(self):
+        """Корректные операции, не примененные из-за ошибок в пакете"""
+        errors = {'non_field_errors': ['Не применено: в пакете есть ошибки']}
+        for index, _ in self.create_valid:
+            self.create_results[index] = _result(index, 424, errors=errors)
+        for index, instance, _ in self.update_valid:
+            self.update_results[index] = _result(index, 424, pk=instance.pk, errors=errors)
+        for index, pk in self.delete_valid:
+            self.delete_results[index] = _result(index, 424, pk=pk, errors=errors)
+
+    def results(self):
+        return {
+            'create': self.create_results,
+            'update': self.update_results,
+            'delete': self.delete_results,
+        }
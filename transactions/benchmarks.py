@@ -0,0 +1,155 @@
+"""
+Бенчмарк представлений операций на синтетических данных (synthetic.py).
+
+Для каждого объема данных генерируются операции, затем каждый сценарий
+ENDPOINTS выполняется через django.test.Client в этом же процессе:
+прогрев, requests замеров времени и несколько инструментированных
+запросов — число SQL-запросов (счетчик InstrumentationMiddleware,
+учитывает и потоки async-представлений) и пик выделенной памяти
+(tracemalloc). Кэш статистики пользователя сбрасывается перед каждым
+запросом, поэтому замеряется расчет, а не чтение из кэша.
+
+Результаты — словарь, пригодный для JSON; compare_results сравнивает
+два прогона и возвращает регрессии сверх порога.
+"""
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.test import Client, override_settings
+from django.utils import timezone
+
+from .cache import bump_data_version
+from .instrumentation import registry
+from .management.commands.loadtest import summarize
+from .synthetic import delete_synthetic_users, generate_ledger
+
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+INSTRUMENTED_REQUESTS = 3
+
+# Сценарий: (метод, URL)
+ENDPOINTS = {
+    'transaction-list': ('get', '/'),
+    'api-transactions-list': ('get', '/api/transactions/?pagination=cursor'),
+    'api-transactions-page-1000': ('get', '/api/transactions/?pagination=cursor&page_size=1000'),
+    'category-list': ('get', '/categories/'),
+    'statistics-page': ('get', '/statistics/'),
+    'api-statistics': ('get', '/api/statistics/'),
+    # Последним: созданные операции не должны влиять на остальные замеры
+    'api-transactions-create': ('post', '/api/transactions/'),
+}
+
+# Сравниваемые метрики и минимальная абсолютная разница, ниже которой
+# изменение считается шумом
+GATED_METRICS = {
+    'p50_ms': 1.0,
+    'p95_ms': 2.0,
+    'queries': 0,
+    'peak_kb': 64,
+}
+
+
+def measure_endpoint(client, user, method, url, requests):
+    """Время ответа (requests замеров), число SQL-запросов и пик памяти одного запроса"""
+    if method == 'post':
+        payload = {
+            'type': 'expense',
+            'amount': '123.45',
+            'category': user.category_set.order_by('pk').values_list('pk', flat=True).first(),
+            'date': timezone.localdate().isoformat(),
+            'description': 'Бенчмарк',
+        }
+
+        def request():
+            return client.post(url, payload, content_type='application/json')
+    else:
+        def request():
+            return client.get(url)
+
+    bump_data_version(user.pk)
+    request()
+
+    latencies, errors = [], 0
+    start = time.perf_counter()
+    for _ in range(requests):
+        bump_data_version(user.pk)
+        request_start = time.perf_counter()
+        response = request()
+        latencies.append(time.perf_counter() - request_start)
+        errors += response.status_code >= 400
+    result = summarize(latencies, errors, time.perf_counter() - start)
+
+    # Минимум по нескольким запросам: async-представления иногда открывают
+    # новые соединения в потоках, и их настройка тоже попадает в счетчик
+    queries, peaks = [], []
+    for _ in range(INSTRUMENTED_REQUESTS):
+        bump_data_version(user.pk)
+        registry.reset()
+        tracemalloc.start()
+        try:
+            request()
+            peaks.append(tracemalloc.get_traced_memory()[1])
+        finally:
+            tracemalloc.stop()
+        views = registry.snapshot().values()
+        if views:
+            queries.append(sum(view['queries'] for view in views))
+    result['queries'] = min(queries) if queries else None
+    result['peak_kb'] = min(peaks) // 1024
+    return result
+
+
+def run_benchmark(sizes=DEFAULT_SIZES, users=10, categories=12, requests=20, seed=0,
+                  endpoints=None, progress=None):
+    """
+    Прогон по объемам sizes (всего операций на всех users пользователей).
+    Замеры — от имени первого пользователя. Синтетические данные
+    удаляются перед каждым объемом и после прогона
+    """
+    endpoints = endpoints or list(ENDPOINTS)
+    results = {}
+    try:
+        for size in sizes:
+            delete_synthetic_users()
+            per_user = max(size // users, 1)
+            start = time.perf_counter()
+            user = generate_ledger(users, categories, per_user, seed=seed)[0]
+            if progress:
+                progress(f'{size} операций сгенерировано за {time.perf_counter() - start:.1f} с')
+
+            client = Client()
+            client.force_login(user)
+            results[str(size)] = {}
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                for name in endpoints:
+                    method, url = ENDPOINTS[name]
+                    results[str(size)][name] = measure_endpoint(client, user, method, url, requests)
+                    if progress:
+                        progress(f"  {name}: p50 {results[str(size)][name]['p50_ms']} мс")
+    finally:
+        delete_synthetic_users()
+    return results
+
+
+def compare_results(baseline, current, threshold):
+    """
+    Регрессии current относительно baseline: метрика выросла больше чем
+    в 1 + threshold раз и больше минимальной разницы GATED_METRICS.
+    Сравниваются только объемы и сценарии, которые есть в обоих прогонах
+    """
+    regressions = []
+    for size, endpoints in current.items():
+        for name, metrics in endpoints.items():
+            before = baseline.get(size, {}).get(name)
+            if before is None:
+                continue
+            for metric, min_delta in GATED_METRICS.items():
+                old, new = before.get(metric), metrics.get(metric)
+                if old is None or new is None:
+                    continue
+                if new > old * (1 + threshold) and new - old > min_delta:
+                    regressions.append({
+                        'size': size, 'endpoint': name, 'metric': metric, 'baseline': old, 'current': new,
+                    })
+    return regressions
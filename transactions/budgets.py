@@ -0,0 +1,129 @@
+"""
+Месячные бюджеты по категориям.
+
+Потраченное за месяц не суммируется по операциям: расходы категории
+по месяцам и валютам поддерживаются инкрементально в SpendingRollup
+(rollups.py), поэтому статус бюджетов пользователя — два запроса по
+индексам (бюджеты и строки сводки месяца). Расходы в других валютах
+переводятся в валюту бюджета по курсу дня проверки (currency.convert,
+курсы кэшируются в процессе).
+
+Уровни оповещения (в пределах / прогноз выше лимита / превышен)
+пересчитываются пакетным проходом по всем бюджетам (manage.py
+check_budgets): по одному запросу сводок на пачку бюджетов и одному
+bulk_update изменившихся.
+"""
+import calendar
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .cache import get_or_compute
+from .currency import convert
+from .models import Budget, SpendingRollup
+
+
+BATCH_SIZE = 1000
+CENT = Decimal('0.01')
+
+
+def _month_start(day):
+    return day.replace(day=1)
+
+
+def _spending(budgets, month):
+    """{(пользователь, категория): [(валюта, сумма), ...]} за месяц — один запрос"""
+    spending = defaultdict(list)
+    rows = SpendingRollup.objects.filter(
+        user_id__in={budget.user_id for budget in budgets},
+        category_id__in={budget.category_id for budget in budgets},
+        month=month,
+    ).values_list('user_id', 'category_id', 'currency', 'total')
+    for user_id, category_id, currency, total in rows:
+        spending[user_id, category_id].append((currency, total))
+    return spending
+
+
+def budget_status(budget, rows, day):
+    """
+    Потрачено, остаток и прогноз на конец месяца (линейно по прошедшим
+    дням) в валюте бюджета; projected_overspend — на сколько прогноз
+    превышает лимит, status — текущий уровень оповещения
+    """
+    spent = sum(
+        (convert(total, currency, day, budget.currency) or Decimal('0') for currency, total in rows),
+        Decimal('0'),
+    ).quantize(CENT)
+    days_in_month = calendar.monthrange(day.year, day.month)[1]
+    projected = (spent * days_in_month / day.day).quantize(CENT)
+    if spent > budget.limit:
+        status = Budget.EXCEEDED
+    elif projected > budget.limit:
+        status = Budget.WARNING
+    else:
+        status = Budget.OK
+    return {
+        'spent': spent,
+        'remaining': budget.limit - spent,
+        'projected': projected,
+        'projected_overspend': max(projected - budget.limit, Decimal('0')),
+        'status': status,
+    }
+
+
+def compute_budget_statuses(user, day):
+    statuses = {}
+    budgets = list(Budget.objects.filter(user=user))
+    if budgets:
+        spending = _spending(budgets, _month_start(day))
+        for budget in budgets:
+            statuses[budget.pk] = budget_status(budget, spending[budget.user_id, budget.category_id], day)
+    return statuses
+
+
+def get_budget_statuses(user, day=None):
+    """{id бюджета: статус} на день day (по умолчанию сегодня) через кэш, см. cache.py"""
+    day = day or timezone.localdate()
+    return get_or_compute('budgets', user.pk, [day], lambda: compute_budget_statuses(user, day))
+
+
+def attach_statuses(budgets, statuses):
+    """Проставить бюджетам поля статуса (для сериализатора и шаблона)"""
+    budgets = list(budgets)
+    for budget in budgets:
+        for field, value in statuses.get(budget.pk, {}).items():
+            setattr(budget, field, value)
+    return budgets
+
+
+def check_budgets(as_of=None, batch_size=BATCH_SIZE):
+    """
+    Пересчет уровней оповещения всех бюджетов на дату as_of (по умолчанию
+    сегодня) пачками по batch_size. Возвращает число проверенных бюджетов
+    и бюджетов, у которых уровень изменился
+    """
+    as_of = as_of or timezone.localdate()
+    month = _month_start(as_of)
+    report = {'budgets': 0, 'changed': 0}
+    last = Q()
+    while True:
+        batch = list(Budget.objects.filter(last).order_by('user_id', 'pk')[:batch_size])
+        if not batch:
+            return report
+        last_user_id, last_pk = batch[-1].user_id, batch[-1].pk
+        last = Q(user_id__gt=last_user_id) | Q(user_id=last_user_id, pk__gt=last_pk)
+
+        spending = _spending(batch, month)
+        now = timezone.now()
+        changed = []
+        for budget in batch:
+            alert = budget_status(budget, spending[budget.user_id, budget.category_id], as_of)['status']
+            if alert != budget.alert or budget.alert_month != month:
+                budget.alert, budget.alert_month, budget.alerted_at = alert, month, now
+                changed.append(budget)
+        # Без save(): сигналы и auto_now не нужны, кэш статистики не сбрасывается
+        Budget.objects.bulk_update(changed, ['alert', 'alert_month', 'alerted_at'], batch_size=batch_size)
+        report['budgets'] += len(batch)
+        report['changed'] += len(changed)
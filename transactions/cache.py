@@ -0,0 +1,174 @@
+"""
+Кэш вычисленных данных пользователя (статистика, итоги).
+
+Ключ кэша включает версию данных пользователя. Версия меняется при любой
+записи Transaction или Category — через сигналы и через массовые операции
+QuerySet (см. models.py), поэтому устаревшие результаты не отдаются,
+а старые записи просто вытесняются по TTL/LRU бэкенда. Суммы в разных
+валютах зависят и от курсов, поэтому в ключе есть и общая версия курсов
+(меняется при загрузке курсов, см. currency.py).
+
+Вместе с версией хранится время последнего изменения — по ним
+conditional.py отвечает на условные запросы (ETag/Last-Modified).
+
+Версии должны быть общими для всех процессов, которые пишут и читают
+данные: с кэшем в памяти процесса (locmem, по умолчанию — для разработки)
+запись в одном воркере не сбросит кэш в других, и они будут отдавать
+устаревшую статистику. В продакшене — STATISTICS_CACHE_BACKEND=redis
+(или file на одном сервере); manage.py check --deploy предупреждает
+о кэше в памяти процесса (transactions.W001).
+"""
+import hashlib
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction as db_transaction
+
+
+VERSION_KEY = 'data-version:{user_id}'
+MODIFIED_KEY = 'data-modified:{user_id}'
+# Версия курсов хранится как версия данных «пользователя» rates
+RATES_SCOPE = 'rates'
+HITS_KEY = 'cache-stats:hits'
+MISSES_KEY = 'cache-stats:misses'
+
+
+def get_cache():
+    alias = getattr(settings, 'STATISTICS_CACHE_ALIAS', 'statistics')
+    if alias not in settings.CACHES:
+        alias = 'default'
+    return caches[alias]
+
+
+def get_data_version(user_id):
+    cache = get_cache()
+    key = VERSION_KEY.format(user_id=user_id)
+    version = cache.get(key)
+    if version is None:
+        # Начальная версия от времени: если ключ версии был вытеснен,
+        # новая версия не совпадет ни с одной из старых записей
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def get_data_modified(user_id):
+    """Время (Unix) последнего изменения данных пользователя"""
+    cache = get_cache()
+    key = MODIFIED_KEY.format(user_id=user_id)
+    modified = cache.get(key)
+    if modified is None:
+        # Как и версия: если ключ вытеснен, считаем, что данные изменились сейчас
+        cache.add(key, time.time(), timeout=None)
+        modified = cache.get(key)
+    return modified
+
+
+def _bump(user_ids):
+    cache = get_cache()
+    now = time.time()
+    for user_id in user_ids:
+        key = VERSION_KEY.format(user_id=user_id)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), timeout=None)
+        cache.set(MODIFIED_KEY.format(user_id=user_id), now, timeout=None)
+
+
+def bump_data_version(*user_ids):
+    """
+    Инвалидация кэша пользователей. Версия меняется сразу и еще раз после
+    коммита, чтобы результат, посчитанный по незакоммиченным данным
+    конкурентным запросом, тоже не остался в кэше.
+    """
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if not user_ids:
+        return
+    _bump(user_ids)
+    db_transaction.on_commit(lambda: _bump(user_ids))
+
+
+def get_rates_version():
+    return get_data_version(RATES_SCOPE)
+
+
+def bump_rates_version():
+    """Инвалидация всего, что посчитано по курсам валют"""
+    bump_data_version(RATES_SCOPE)
+
+
+def make_key(namespace, user_id, params):
+    signature = hashlib.sha1(
+        json.dumps(params, sort_keys=True, default=str).encode()
+    ).hexdigest()
+    return f'{namespace}:{user_id}:{get_data_version(user_id)}:{get_rates_version()}:{signature}'
+
+
+def _count(key):
+    cache = get_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+
+
+def peek(namespace, user_id, params):
+    """Значение из кэша без расчета и без учета в счетчиках"""
+    return get_cache().get(make_key(namespace, user_id, params))
+
+
+def store(namespace, user_id, params, value):
+    """Сохранить значение, посчитанное вне get_or_compute (фоновые задачи)"""
+    get_cache().set(make_key(namespace, user_id, params), value)
+
+
+def _lookup(namespace, user_id, params):
+    """(ключ, значение из кэша или None) с учетом попаданий и промахов"""
+    key = make_key(namespace, user_id, params)
+    value = get_cache().get(key)
+    _count(HITS_KEY if value is not None else MISSES_KEY)
+    return key, value
+
+
+def get_or_compute(namespace, user_id, params, compute):
+    """Значение из кэша или compute() с сохранением в кэш"""
+    key, value = _lookup(namespace, user_id, params)
+    if value is not None:
+        return value
+
+    value = compute()
+    get_cache().set(key, value)
+    return value
+
+
+async def aget_or_compute(namespace, user_id, params, compute):
+    """get_or_compute для async-кода: compute() возвращает корутину"""
+    key, value = await sync_to_async(_lookup)(namespace, user_id, params)
+    if value is not None:
+        return value
+
+    value = await compute()
+    await sync_to_async(get_cache().set)(key, value)
+    return value
+
+
+def get_cache_stats():
+    """Счетчики попаданий и промахов"""
+    cache = get_cache()
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': hits / total if total else 0,
+    }
+
+
+def reset_cache_stats():
+    get_cache().delete_many([HITS_KEY, MISSES_KEY])
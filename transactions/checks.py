@@ -0,0 +1,25 @@
+"""
+Проверки конфигурации (manage.py check --deploy).
+"""
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Tags, Warning, register
+
+from .cache import get_cache
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_statistics_cache(app_configs, **kwargs):
+    """
+    Версии данных пользователей (cache.py) должны быть общими для всех
+    процессов: с кэшем в памяти процесса запись, обработанная одним
+    воркером, не сбросит кэш статистики и ETag в других воркерах
+    """
+    if not isinstance(get_cache(), (LocMemCache, DummyCache)):
+        return []
+    return [Warning(
+        'Кэш статистики хранится в памяти процесса: при нескольких воркерах '
+        'они могут отдавать устаревшую статистику и ответы 304.',
+        hint='Задайте STATISTICS_CACHE_BACKEND=redis (или file на одном сервере).',
+        id='transactions.W001',
+    )]
@@ -0,0 +1,86 @@
+"""
+Условные запросы (ETag/Last-Modified) к спискам и статистике.
+
+Валидаторы ответа считаются без запросов к БД: версия данных
+пользователя и версия курсов (cache.py) меняются при любой записи,
+к ним добавляются полный URL, заголовок Accept и текущая дата (период
+статистики по умолчанию зависит от сегодняшнего дня). Если клиент
+прислал совпадающий If-None-Match или If-Modified-Since не раньше
+Last-Modified, представление не вызывается: ответ 304 без запросов
+списка или статистики и без сериализации.
+
+ETag слабый — ответы с одним ETag равнозначны, но не обязательно
+совпадают побайтно. Last-Modified точен до секунды, поэтому If-None-Match
+надежнее (если он есть, If-Modified-Since не проверяется). Валидаторы
+ставятся только на ответы 200: ошибки и 202 фоновых задач не кэшируются.
+"""
+import hashlib
+from datetime import datetime, time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from .cache import RATES_SCOPE, get_data_modified, get_data_version, get_rates_version
+
+
+def response_validators(request, user):
+    """(ETag, Last-Modified — Unix-время) ответа пользователю; None — без валидаторов"""
+    if request.method not in ('GET', 'HEAD') or not user.is_authenticated:
+        return None
+    today = timezone.localdate()
+    signature = hashlib.sha1(repr((
+        user.pk,
+        get_data_version(user.pk),
+        get_rates_version(),
+        today.isoformat(),
+        request.build_absolute_uri(),
+        request.META.get('HTTP_ACCEPT', ''),
+    )).encode()).hexdigest()
+    midnight = timezone.make_aware(datetime.combine(today, time.min)).timestamp()
+    last_modified = max(get_data_modified(user.pk), get_data_modified(RATES_SCOPE), midnight)
+    return f'W/"{signature}"', int(last_modified)
+
+
+def _finish(response, validators):
+    etag, last_modified = validators
+    if response.status_code in (200, 304):
+        response.headers.setdefault('ETag', etag)
+        response.headers.setdefault('Last-Modified', http_date(last_modified))
+        # Ответ личный, а браузер должен каждый раз сверяться с сервером
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def conditional(view):
+    """
+    Декоратор GET-представления (sync или async): 304 по валидаторам
+    запроса без вызова представления, ETag и Last-Modified в ответах 200
+    """
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            user = await request.auser()
+            validators = await sync_to_async(response_validators)(request, user)
+            if validators is None:
+                return await view(request, *args, **kwargs)
+            response = get_conditional_response(request, *validators)
+            if response is None:
+                response = await view(request, *args, **kwargs)
+            return _finish(response, validators)
+
+        return wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        validators = response_validators(request, request.user)
+        if validators is None:
+            return view(request, *args, **kwargs)
+        response = get_conditional_response(request, *validators)
+        if response is None:
+            response = view(request, *args, **kwargs)
+        return _finish(response, validators)
+
+    return wrapper
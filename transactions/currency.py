@@ -0,0 +1,199 @@
+"""
+Валюты и курсы.
+
+Курсы хранятся в ExchangeRate (рублей за единицу валюты) и загружаются
+из CSV без доступа к сети (manage.py import_rates). Пропущенные дни
+(выходные, праздники) при загрузке заполняются последним известным
+курсом, поэтому курс операции находится соединением по (валюта, дата)
+и суммы переводятся в базовую валюту внутри запроса агрегации
+(converted). Для дат после последнего загруженного курса берется
+последний известный; суммы в валюте без единого курса в итоги
+не попадают.
+
+Отдельные суммы в Python переводит convert(): курсы на день кэшируются
+в процессе (lru_cache) с версией курсов в ключе, поэтому загрузка курсов
+в любом процессе сбрасывает и кэш статистики, и эти курсы.
+"""
+import csv
+import io
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+
+from django.db import transaction as db_transaction
+from django.db.models import Case, DecimalField, F, FloatField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Cast, Coalesce
+from django.utils.dateparse import parse_date
+
+from .cache import bump_rates_version, get_rates_version
+from .models import CURRENCY_CHOICES, DEFAULT_CURRENCY, RUB, ExchangeRate, Profile
+
+
+# Валюта, в которой заданы курсы
+PIVOT_CURRENCY = RUB
+CURRENCIES = tuple(code for code, _ in CURRENCY_CHOICES)
+RATE_CACHE_SIZE = 4096
+BATCH_SIZE = 1000
+
+AMOUNT_FIELD = DecimalField(max_digits=20, decimal_places=8)
+
+
+class InvalidRates(ValueError):
+    pass
+
+
+class UnknownCurrency(ValueError):
+    pass
+
+
+def parse_currency(value):
+    """Код валюты из параметра запроса; пустое значение — None (базовая валюта)"""
+    if not value:
+        return None
+    currency = value.strip().upper()
+    if currency not in CURRENCIES:
+        raise UnknownCurrency(f'Неизвестная валюта: {value}')
+    return currency
+
+
+def get_base_currency(user):
+    """Базовая валюта пользователя (без профиля — DEFAULT_CURRENCY)"""
+    currency = Profile.objects.filter(user=user).values_list('base_currency', flat=True).first()
+    return currency or DEFAULT_CURRENCY
+
+
+def _latest_rate(currency, day):
+    """Подзапрос: последний курс валюты не позже day"""
+    return Subquery(
+        ExchangeRate.objects.filter(currency=currency, date__lte=day).order_by('-date').values('rate')[:1]
+    )
+
+
+def rate_to_pivot(prefix=''):
+    """
+    Курс валюты строки на ее дату (строка с полями currency, date и связью
+    rate; prefix — путь к строке через связи, например 'dailyrollup__')
+    """
+    return Case(
+        When(**{f'{prefix}currency': PIVOT_CURRENCY}, then=Value(Decimal('1'))),
+        # Последний известный курс — только если соединение не нашло курс дня
+        default=Coalesce(
+            F(f'{prefix}rate__rate'),
+            _latest_rate(OuterRef(f'{prefix}currency'), OuterRef(f'{prefix}date')),
+        ),
+        output_field=AMOUNT_FIELD,
+    )
+
+
+def conversion_factor(base, prefix=''):
+    """Множитель перевода суммы строки в валюту base"""
+    if base == PIVOT_CURRENCY:
+        return rate_to_pivot(prefix)
+    # Делитель — с плавающей точкой: целые курсы SQLite хранит как INTEGER,
+    # и деление было бы целочисленным
+    base_rate = Cast(_latest_rate(base, OuterRef(f'{prefix}date')), FloatField())
+    return Case(
+        When(**{f'{prefix}currency': base}, then=Value(Decimal('1'))),
+        default=rate_to_pivot(prefix) / base_rate,
+        output_field=AMOUNT_FIELD,
+    )
+
+
+def converted(field, base, prefix=''):
+    """Сумма поля field в валюте base (для Sum(...) внутри запроса)"""
+    return Case(
+        # Строки в базовой валюте — без умножения
+        When(**{f'{prefix}currency': base}, then=F(f'{prefix}{field}')),
+        default=F(f'{prefix}{field}') * conversion_factor(base, prefix),
+        output_field=AMOUNT_FIELD,
+    )
+
+
+@lru_cache(maxsize=RATE_CACHE_SIZE)
+def _rate_on(currency, day, version):
+    if currency == PIVOT_CURRENCY:
+        return Decimal('1')
+    return ExchangeRate.objects.filter(
+        currency=currency, date__lte=day,
+    ).order_by('-date').values_list('rate', flat=True).first()
+
+
+def rate_on(currency, day):
+    """Курс валюты на день (рублей за единицу) или None, если курсов нет"""
+    return _rate_on(currency, day, get_rates_version())
+
+
+def convert(amount, currency, day, base):
+    """Сумма в валюте base по курсам дня day (None — нет курса)"""
+    if currency == base:
+        return amount
+    rate, base_rate = rate_on(currency, day), rate_on(base, day)
+    if rate is None or base_rate is None:
+        return None
+    return amount * rate / base_rate
+
+
+def parse_rates(stream):
+    """
+    Строки CSV «date,currency,rate» (с заголовком) -> {валюта: {дата: курс}}.
+    Ошибки — InvalidRates с номером строки
+    """
+    if isinstance(stream, (bytes, bytearray)):
+        stream = io.StringIO(stream.decode('utf-8-sig'))
+    rates = {}
+    reader = csv.DictReader(stream)
+    missing = {'date', 'currency', 'rate'} - set(reader.fieldnames or ())
+    if missing:
+        raise InvalidRates(f'Нет столбцов: {", ".join(sorted(missing))}')
+    for line, row in enumerate(reader, 2):
+        currency = (row['currency'] or '').strip().upper()
+        day = parse_date((row['date'] or '').strip())
+        try:
+            rate = Decimal((row['rate'] or '').strip().replace(',', '.'))
+        except InvalidOperation:
+            rate = None
+        if currency not in CURRENCIES or currency == PIVOT_CURRENCY:
+            raise InvalidRates(f'Строка {line}: неизвестная валюта {row["currency"]!r}')
+        if day is None or rate is None or rate <= 0:
+            raise InvalidRates(f'Строка {line}: ожидаются дата YYYY-MM-DD и положительный курс')
+        rates.setdefault(currency, {})[day] = rate
+    return rates
+
+
+def _filled(currency, rates):
+    """
+    Курсы валюты по всем дням от первой даты файла до последней: пропуски —
+    последним известным курсом (и от последнего курса в БД до первой даты)
+    """
+    days = sorted(rates)
+    previous = ExchangeRate.objects.filter(
+        currency=currency, date__lt=days[0],
+    ).order_by('-date').values_list('date', 'rate').first()
+    if previous is not None:
+        day, rate = previous[0] + timedelta(days=1), previous[1]
+    else:
+        day, rate = days[0], rates[days[0]]
+    while day <= days[-1]:
+        rate = rates.get(day, rate)
+        yield ExchangeRate(currency=currency, date=day, rate=rate)
+        day += timedelta(days=1)
+
+
+def import_rates(stream):
+    """Загрузка курсов из CSV с заполнением пропусков; возвращает {валюта: дней}"""
+    rates = parse_rates(stream)
+    report = {}
+    with db_transaction.atomic():
+        for currency, currency_rates in rates.items():
+            rows = list(_filled(currency, currency_rates))
+            ExchangeRate.objects.bulk_create(
+                rows,
+                batch_size=BATCH_SIZE,
+                update_conflicts=True,
+                unique_fields=['currency', 'date'],
+                update_fields=['rate'],
+            )
+            report[currency] = len(rows)
+    bump_rates_version()
+    _rate_on.cache_clear()
+    return report
@@ -0,0 +1,32 @@
+"""
+Настройка соединений с БД.
+
+SQLite: PRAGMA из settings.SQLITE_PRAGMAS применяются к каждому новому
+соединению (сигнал connection_created). WAL позволяет читать во время
+записи, synchronous=NORMAL в режиме WAL не теряет целостности при сбое
+процесса, busy_timeout заставляет ждать блокировку, а не сразу падать
+с "database is locked"; mmap_size и cache_size уменьшают чтение с диска.
+"""
+from django.conf import settings
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def sqlite_pragmas(connection):
+    """Текущие значения PRAGMA соединения (для отчетов бенчмарков)"""
+    if connection.vendor != 'sqlite':
+        return {}
+    pragmas = {}
+    with connection.cursor() as cursor:
+        for name in getattr(settings, 'SQLITE_PRAGMAS', {}):
+            cursor.execute(f'PRAGMA {name}')
+            # БД в памяти не отдает, например, mmap_size
+            row = cursor.fetchone()
+            pragmas[name] = row[0] if row else None
+    return pragmas
@@ -0,0 +1,190 @@
+"""
+Потоковая выгрузка транзакций в CSV, JSON Lines и XLSX.
+
+Строки читаются через values_list(...).iterator(chunk_size=...), без
+создания объектов моделей, и сразу отдаются клиенту через
+StreamingHttpResponse — память процесса не растет с размером выгрузки.
+"""
+import csv
+import json
+import zipfile
+from xml.sax.saxutils import escape
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+
+EXPORT_FIELDS = ('id', 'date', 'type', 'amount', 'currency', 'category__name', 'description', 'created_at')
+EXPORT_HEADERS = ('id', 'date', 'type', 'amount', 'currency', 'category', 'description', 'created_at')
+CHUNK_SIZE = 2000
+# Сколько строк склеивать в один отдаваемый кусок
+ROWS_PER_CHUNK = 500
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+def export_rows(queryset):
+    return queryset.values_list(*EXPORT_FIELDS).iterator(chunk_size=CHUNK_SIZE)
+
+
+def _format_value(value):
+    if value is None:
+        return ''
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+class _Echo:
+    """Псевдо-файл для csv.writer: возвращает записанную строку"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    writer = csv.writer(_Echo())
+    # BOM, чтобы Excel правильно открыл UTF-8
+    buffer = ['\ufeff' + writer.writerow(EXPORT_HEADERS)]
+    for row in rows:
+        buffer.append(writer.writerow([_format_value(value) for value in row]))
+        if len(buffer) >= ROWS_PER_CHUNK:
+            yield ''.join(buffer)
+            buffer = []
+    yield ''.join(buffer)
+
+
+def stream_jsonl(rows):
+    buffer = []
+    for row in rows:
+        item = dict(zip(EXPORT_HEADERS, (_format_value(value) for value in row)))
+        item['id'] = row[0]
+        buffer.append(json.dumps(item, ensure_ascii=False) + '\n')
+        if len(buffer) >= ROWS_PER_CHUNK:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+class _ZipStream:
+    """Приемник для zipfile без seek: накопленные байты забираются drain()"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+XLSX_STATIC_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Транзакции" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+# Числовые колонки: id и amount
+XLSX_NUMERIC_COLUMNS = {0, 3}
+
+
+def _xlsx_row(values, numeric=XLSX_NUMERIC_COLUMNS):
+    cells = []
+    for index, value in enumerate(values):
+        if index in numeric and value is not None:
+            cells.append(f'<c t="n"><v>{value}</v></c>')
+        else:
+            text = escape(''.join(ch for ch in _format_value(value) if ch >= ' ' or ch in '\t\n'))
+            cells.append(f'<c t="inlineStr"><is><t>{text}</t></is></c>')
+    return f'<row>{"".join(cells)}</row>'
+
+
+def stream_xlsx(rows):
+    """
+    XLSX без сторонних библиотек: zip пишется в поток, лист — построчно
+    (строки с inlineStr, без таблицы общих строк)
+    """
+    stream = _ZipStream()
+    with zipfile.ZipFile(stream, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in XLSX_STATIC_PARTS.items():
+            archive.writestr(name, content)
+        yield stream.drain()
+
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                '<sheetData>' + _xlsx_row(EXPORT_HEADERS, numeric=())
+            ).encode())
+            buffer = []
+            for row in rows:
+                buffer.append(_xlsx_row(row))
+                if len(buffer) >= ROWS_PER_CHUNK:
+                    sheet.write(''.join(buffer).encode())
+                    buffer = []
+                    yield stream.drain()
+            sheet.write((''.join(buffer) + '</sheetData></worksheet>').encode())
+    yield stream.drain()
+
+
+STREAMERS = {
+    'csv': stream_csv,
+    'jsonl': stream_jsonl,
+    'xlsx': stream_xlsx,
+}
+
+
+def export_filename(file_format):
+    return f'transactions-{timezone.localdate():%Y-%m-%d}.{file_format}'
+
+
+def export_response(queryset, file_format):
+    response = StreamingHttpResponse(
+        STREAMERS[file_format](export_rows(queryset)),
+        content_type=EXPORT_FORMATS[file_format],
+    )
+    response['Content-Disposition'] = f'attachment; filename="{export_filename(file_format)}"'
+    return response
@@ -0,0 +1,81 @@
+"""Фильтрация транзакций по параметрам запроса (список, API, экспорт)"""
+import django_filters
+from django_filters.widgets import QueryArrayWidget
+
+from .models import Transaction
+from .pagination import DEFAULT_ORDERING, ORDERINGS
+from .search import search_transactions
+
+
+ORDERING_CHOICES = [
+    ('-date', 'Сначала новые'),
+    ('date', 'Сначала старые'),
+    ('amount', 'По сумме ↑'),
+    ('-amount', 'По сумме ↓'),
+]
+
+
+class CategoryListWidget(QueryArrayWidget):
+    """Несколько категорий: ?category=1&category=2 или ?category=1,2"""
+
+    def value_from_datadict(self, data, files, name):
+        values = super().value_from_datadict(data, files, name)
+        return sorted({part.strip() for value in values for part in value.split(',') if part.strip()})
+
+
+class NumberInFilter(django_filters.BaseInFilter, django_filters.NumberFilter):
+    pass
+
+
+class TransactionFilter(django_filters.FilterSet):
+    """
+    Общие фильтры HTML-списка, API и экспорта. Некорректные значения
+    в API дают 400, в HTML-списке просто не применяются
+    """
+    type = django_filters.ChoiceFilter(choices=Transaction.TYPE_CHOICES)
+    category = NumberInFilter(field_name='category_id', widget=CategoryListWidget)
+    account = django_filters.NumberFilter(field_name='account_id')
+    date_from = django_filters.DateFilter(field_name='date', lookup_expr='gte')
+    date_to = django_filters.DateFilter(field_name='date', lookup_expr='lte')
+    amount_min = django_filters.NumberFilter(field_name='amount', lookup_expr='gte')
+    amount_max = django_filters.NumberFilter(field_name='amount', lookup_expr='lte')
+    search = django_filters.CharFilter(method='filter_search')
+    ordering = django_filters.ChoiceFilter(choices=ORDERING_CHOICES, method='filter_ordering')
+
+    class Meta:
+        # Модель не задана: фильтруются и Transaction, и LedgerTransaction
+        # (горячие и архивные операции, см. archive.py)
+        model = None
+        fields = []
+
+    def filter_search(self, queryset, name, value):
+        return search_transactions(queryset, value)
+
+    def filter_ordering(self, queryset, name, value):
+        return queryset
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        # Сортировка только из белого списка, с id для однозначного порядка
+        ordering = self.form.cleaned_data.get('ordering') or DEFAULT_ORDERING
+        return queryset.order_by(*ORDERINGS[ordering])
+
+
+def filter_transactions(queryset, params):
+    """Фильтры TransactionFilter (некорректные значения пропускаются)"""
+    return TransactionFilter(params, queryset=queryset).qs
+
+
+# Параметры, от которых зависит состав выборки (без сортировки и пагинации)
+FILTER_PARAMS = tuple(name for name in TransactionFilter.base_filters if name != 'ordering')
+
+
+def filter_signature(params):
+    """Значения фильтров без сортировки и пагинации — ключ кэша итогов"""
+    signature = {}
+    for name in FILTER_PARAMS:
+        values = params.getlist(name) if hasattr(params, 'getlist') else [params.get(name)]
+        values = sorted(value for value in values if value)
+        if values:
+            signature[name] = values
+    return signature
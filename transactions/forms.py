@@ -1,11 +1,18 @@
 from django.utils import timezone
 from django import forms
-from .models import Transaction, Category
+from .models import Account, Budget, RecurringRule, Transaction, Category
 
 class TransactionForm(forms.ModelForm):
+    # Только при создании: операция становится первой по новому правилу
+    repeat = forms.ChoiceField(
+        choices=[('', 'Не повторять')] + RecurringRule.FREQUENCY_CHOICES,
+        required=False,
+        label='Повторять',
+    )
+
     class Meta:
         model = Transaction
-        fields = ['type', 'category', 'amount', 'description', 'date']
+        fields = ['type', 'category', 'account', 'amount', 'currency', 'description', 'date']
         widgets = {
             'date': forms.DateInput(attrs={'type': 'date'}),
             'description': forms.Textarea(attrs={'rows': 3}),
@@ -17,6 +24,20 @@ class TransactionForm(forms.ModelForm):
         
         if user:
             self.fields['category'].queryset = Category.objects.filter(user=user)
+            self.fields['account'].queryset = Account.objects.filter(user=user)
+        if self.instance.pk:
+            del self.fields['repeat']
+        # Без валюты — валюта счета (или текущая валюта операции)
+        self.fields['currency'].required = False
+
+    def clean(self):
+        cleaned_data = super().clean()
+        account, currency = cleaned_data.get('account'), cleaned_data.get('currency')
+        if not currency:
+            cleaned_data['currency'] = account.currency if account else self.instance.currency
+        elif account and account.currency != currency:
+            self.add_error('currency', f'Валюта счета — {account.currency}')
+        return cleaned_data
         
 
 
@@ -48,4 +69,24 @@ class CategoryForm(forms.ModelForm):
             instance.user = self.user
         if commit:
             instance.save()
-        return instance
\ No newline at end of file
+        return instance
+
+
+class BudgetForm(forms.ModelForm):
+    class Meta:
+        model = Budget
+        fields = ['category', 'limit', 'currency']
+        labels = {
+            'category': 'Категория',
+            'limit': 'Лимит в месяц',
+            'currency': 'Валюта',
+        }
+
+    def __init__(self, *args, **kwargs):
+        self.user = kwargs.pop('user', None)
+        super().__init__(*args, **kwargs)
+        if self.user:
+            # Категории, для которых бюджета еще нет
+            self.fields['category'].queryset = Category.objects.filter(user=self.user).exclude(
+                budget__isnull=False
+            )
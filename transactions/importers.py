@@ -0,0 +1,148 @@
+"""
+Потоковый импорт транзакций из CSV и JSON Lines.
+
+Файл читается построчно (без загрузки целиком в память), каждая строка
+проверяется по правилам TransactionSerializer, а вставка идет пачками
+bulk_create внутри транзакций БД.
+"""
+import csv
+import json
+
+from django.db import transaction as db_transaction
+from rest_framework import serializers
+
+from .models import Category, Transaction
+from .rollups import apply_transactions
+from .serializers import TransactionImportSerializer
+
+
+FORMATS = ('csv', 'jsonl')
+BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 1000
+
+
+def detect_format(name='', content_type=''):
+    """Формат по расширению файла или Content-Type"""
+    name = (name or '').lower()
+    content_type = (content_type or '').lower()
+    if name.endswith(('.jsonl', '.ndjson', '.json')) or 'json' in content_type:
+        return 'jsonl'
+    return 'csv'
+
+
+def _text_stream(fileobj):
+    """Построчное чтение файла, загруженного файла или тела запроса"""
+    first = True
+    for line in fileobj:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        if first:
+            line = line.lstrip('\ufeff')
+            first = False
+        yield line
+
+
+def iter_csv_rows(fileobj):
+    for row in csv.DictReader(_text_stream(fileobj)):
+        # Пустые ячейки — как отсутствующие поля (действуют значения по умолчанию)
+        yield {key: value for key, value in row.items() if key and value not in ('', None)}
+
+
+def iter_jsonl_rows(fileobj):
+    for line in _text_stream(fileobj):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield {'__error__': f'Некорректный JSON: {e}'}
+            continue
+        yield row if isinstance(row, dict) else {'__error__': 'Ожидался JSON-объект'}
+
+
+def iter_rows(fileobj, file_format):
+    if file_format == 'jsonl':
+        return iter_jsonl_rows(fileobj)
+    return iter_csv_rows(fileobj)
+
+
+class TransactionImporter:
+    """Импорт строк в транзакции пользователя с отчетом об ошибках по строкам"""
+
+    def __init__(self, user, batch_size=BATCH_SIZE, create_categories=True):
+        self.user = user
+        self.batch_size = batch_size
+        self.create_categories = create_categories
+        self.serializer = TransactionImportSerializer()
+        self._categories = None
+        self.created = 0
+        self.total = 0
+        self.errors = []
+
+    def resolve_category(self, name):
+        """id категории по названию (кэш на время импорта)"""
+        if not name:
+            return None
+        if self._categories is None:
+            self._categories = {
+                category_name.strip().lower(): pk
+                for pk, category_name in Category.objects.filter(
+                    user=self.user
+                ).values_list('id', 'name')
+            }
+        key = name.strip().lower()
+        if key not in self._categories:
+            if not self.create_categories:
+                raise serializers.ValidationError(
+                    {'category': [f'Категория «{name}» не найдена']}
+                )
+            category = Category.objects.create(user=self.user, name=name.strip())
+            self._categories[key] = category.pk
+        return self._categories[key]
+
+    def build(self, row):
+        if '__error__' in row:
+            raise serializers.ValidationError({'non_field_errors': [row['__error__']]})
+        data = self.serializer.run_validation(row)
+        category_name = data.pop('category', None)
+        return Transaction(
+            user=self.user,
+            category_id=self.resolve_category(category_name),
+            **data
+        )
+
+    def add_error(self, line, detail):
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': line, 'errors': detail})
+
+    def flush(self, batch):
+        if not batch:
+            return
+        with db_transaction.atomic():
+            Transaction.objects.bulk_create(batch)
+            apply_transactions(batch)
+        self.created += len(batch)
+
+    def run(self, rows):
+        batch = []
+        for line, row in enumerate(rows, start=1):
+            self.total += 1
+            try:
+                batch.append(self.build(row))
+            except serializers.ValidationError as e:
+                self.add_error(line, e.detail)
+                continue
+            if len(batch) >= self.batch_size:
+                self.flush(batch)
+                batch = []
+        self.flush(batch)
+        return self.report()
+
+    def report(self):
+        return {
+            'total': self.total,
+            'created': self.created,
+            'failed': self.total - self.created,
+            'errors': self.errors,
+        }
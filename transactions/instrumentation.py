@@ -0,0 +1,275 @@
+"""
+Инструментирование запросов: время ответа, время в БД и число SQL-запросов
+по каждому представлению, поиск повторов и N+1.
+
+Агрегаты хранятся в памяти процесса и отдаются в формате Prometheus
+(см. MetricsView), а по каждому ответу — в заголовке Server-Timing.
+"""
+import logging
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    'ENABLED': True,
+    'SERVER_TIMING': True,
+    # Один и тот же SQL (с разными параметрами) N и более раз — вероятный N+1
+    'N_PLUS_ONE_THRESHOLD': 5,
+    'DURATION_BUCKETS': (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+}
+
+
+def get_settings():
+    return {**DEFAULT_SETTINGS, **getattr(settings, 'INSTRUMENTATION', {})}
+
+
+class QueryRecorder:
+    """
+    Счетчик запросов и времени в БД одного HTTP-запроса. Запросы могут
+    идти из нескольких потоков (async-представления, см. async_utils.py)
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.count = 0
+        self.duration = 0.0
+        self.templates = Counter()
+        self.exact = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            try:
+                key = (sql, repr(params))
+            except Exception:
+                key = None
+            with self.lock:
+                self.duration += duration
+                self.count += 1
+                self.templates[sql] += 1
+                if key is not None:
+                    self.exact[key] += 1
+
+    def duplicates(self):
+        """Запросы, выполненные несколько раз с одинаковыми параметрами"""
+        return {sql: count for (sql, _), count in self.exact.items() if count > 1}
+
+    def n_plus_one(self, threshold):
+        """Шаблоны SQL, повторенные threshold и более раз"""
+        return {sql: count for sql, count in self.templates.items() if count >= threshold}
+
+
+class ViewStats:
+    def __init__(self, buckets):
+        self.requests = 0
+        self.duration = 0.0
+        self.db_duration = 0.0
+        self.queries = 0
+        self.max_queries = 0
+        self.duplicate_requests = 0
+        self.n_plus_one_requests = 0
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+
+
+class MetricsRegistry:
+    """Агрегаты по представлениям (в памяти процесса)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+
+    def record(self, view, duration, db_duration, queries, duplicates, n_plus_one):
+        buckets = get_settings()['DURATION_BUCKETS']
+        with self.lock:
+            stats = self.views.get(view)
+            if stats is None:
+                stats = self.views[view] = ViewStats(buckets)
+            stats.requests += 1
+            stats.duration += duration
+            stats.db_duration += db_duration
+            stats.queries += queries
+            stats.max_queries = max(stats.max_queries, queries)
+            stats.duplicate_requests += bool(duplicates)
+            stats.n_plus_one_requests += bool(n_plus_one)
+            for index, bound in enumerate(stats.buckets):
+                if duration <= bound:
+                    stats.bucket_counts[index] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                view: {
+                    'requests': stats.requests,
+                    'duration': stats.duration,
+                    'db_duration': stats.db_duration,
+                    'queries': stats.queries,
+                    'max_queries': stats.max_queries,
+                    'duplicate_requests': stats.duplicate_requests,
+                    'n_plus_one_requests': stats.n_plus_one_requests,
+                    'buckets': list(zip(stats.buckets, stats.bucket_counts)),
+                }
+                for view, stats in self.views.items()
+            }
+
+    def reset(self):
+        with self.lock:
+            self.views = {}
+
+
+registry = MetricsRegistry()
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _metric(lines, name, kind, help_text, samples):
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} {kind}')
+    for labels, value in samples:
+        label_text = ','.join(f'{key}="{_label(val)}"' for key, val in labels.items())
+        lines.append(f'{name}{{{label_text}}} {value}' if label_text else f'{name} {value}')
+
+
+def render_prometheus(snapshot, extra=None):
+    """Агрегаты в текстовом формате Prometheus"""
+    lines = []
+    views = sorted(snapshot.items())
+    counters = (
+        ('finance_view_requests_total', 'requests', 'Число запросов'),
+        ('finance_view_db_seconds_total', 'db_duration', 'Суммарное время в БД, с'),
+        ('finance_view_queries_total', 'queries', 'Суммарное число SQL-запросов'),
+        ('finance_view_duplicate_query_requests_total', 'duplicate_requests',
+         'Запросы с повторяющимся SQL (одинаковые параметры)'),
+        ('finance_view_n_plus_one_requests_total', 'n_plus_one_requests',
+         'Запросы с признаками N+1'),
+    )
+    for name, key, help_text in counters:
+        _metric(lines, name, 'counter', help_text,
+                [({'view': view}, stats[key]) for view, stats in views])
+
+    _metric(lines, 'finance_view_max_queries', 'gauge', 'Максимум SQL-запросов за один запрос',
+            [({'view': view}, stats['max_queries']) for view, stats in views])
+
+    name = 'finance_view_duration_seconds'
+    lines.append(f'# HELP {name} Время ответа, с')
+    lines.append(f'# TYPE {name} histogram')
+    for view, stats in views:
+        for bound, count in stats['buckets']:
+            lines.append(f'{name}_bucket{{view="{_label(view)}",le="{bound}"}} {count}')
+        lines.append(f'{name}_bucket{{view="{_label(view)}",le="+Inf"}} {stats["requests"]}')
+        lines.append(f'{name}_sum{{view="{_label(view)}"}} {stats["duration"]}')
+        lines.append(f'{name}_count{{view="{_label(view)}"}} {stats["requests"]}')
+
+    for name, kind, help_text, value in extra or ():
+        _metric(lines, name, kind, help_text, [({}, value)])
+    return '\n'.join(lines) + '\n'
+
+
+# Счетчик текущего HTTP-запроса. Переменная контекста видна и в потоках
+# sync_to_async, поэтому учитываются запросы из всех соединений
+_recorder = ContextVar('instrumentation_recorder', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """Постоянная обертка соединений: пишет в счетчик текущего запроса"""
+    recorder = _recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def install_wrapper(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return '<unresolved>'
+    return match.view_name or match._func_path
+
+
+class InstrumentationMiddleware:
+    """
+    Замер времени ответа, времени в БД и числа запросов для каждого
+    представления (WSGI и ASGI). Настройки — INSTRUMENTATION в settings.py
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.config = get_settings()
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        if self.config['ENABLED']:
+            # Соединения, открытые позже (в том числе в других потоках)
+            connection_created.connect(install_wrapper, dispatch_uid=__name__)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not self.config['ENABLED']:
+            return self.get_response(request)
+
+        recorder, token, start = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _recorder.reset(token)
+        return self.finish(request, response, recorder, start)
+
+    async def __acall__(self, request):
+        if not self.config['ENABLED']:
+            return await self.get_response(request)
+
+        recorder, token, start = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _recorder.reset(token)
+        return self.finish(request, response, recorder, start)
+
+    def start(self):
+        for connection in connections.all():
+            install_wrapper(connection)
+        recorder = QueryRecorder()
+        return recorder, _recorder.set(recorder), time.perf_counter()
+
+    def finish(self, request, response, recorder, start):
+        duration = time.perf_counter() - start
+
+        view = view_name(request)
+        duplicates = recorder.duplicates()
+        n_plus_one = recorder.n_plus_one(self.config['N_PLUS_ONE_THRESHOLD'])
+        registry.record(view, duration, recorder.duration, recorder.count, duplicates, n_plus_one)
+
+        if n_plus_one:
+            worst_sql, worst_count = max(n_plus_one.items(), key=lambda item: item[1])
+            logger.warning(
+                'Вероятный N+1 в %s: %d запросов, шаблон повторен %d раз: %s',
+                view, recorder.count, worst_count, worst_sql[:200],
+            )
+
+        if self.config['SERVER_TIMING']:
+            response['Server-Timing'] = (
+                f'total;dur={duration * 1000:.1f}, '
+                f'db;dur={recorder.duration * 1000:.1f};desc="{recorder.count} queries"'
+            )
+        return response
@@ -0,0 +1,240 @@
+"""
+Фоновые задачи: постановка в очередь, захват воркером, выполнение, очистка.
+
+Очередь — таблица Job, других зависимостей нет. Воркер (manage.py run_jobs)
+захватывает задачу условным UPDATE ... WHERE status = 'pending', поэтому
+несколько воркеров не возьмут одну задачу и на SQLite, без SELECT FOR UPDATE.
+Брошенные задачи (нет heartbeat) возвращаются в очередь.
+"""
+import logging
+import os
+import socket
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import DatabaseError
+from django.db.models import F
+from django.utils import timezone
+from django.utils.datastructures import MultiValueDict
+
+from .cache import store
+from .currency import UnknownCurrency, get_base_currency, parse_currency
+from .exports import EXPORT_FORMATS, STREAMERS, export_filename, export_rows
+from .filters import TransactionFilter
+from .archive import params_source
+from .models import Job, Transaction
+from .statistics import (
+    get_period, split_period, statistics_buckets, statistics_response_data, summarize_accounts,
+    summarize_buckets,
+)
+
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = (Job.PENDING, Job.RUNNING)
+# Прогресс выгрузки обновляется раз в столько строк
+EXPORT_PROGRESS_ROWS = 5000
+
+
+class InvalidJobParams(ValueError):
+    pass
+
+
+def statistics_params(date_from, date_to, currency=None):
+    """currency=None — базовая валюта пользователя на момент расчета"""
+    return {'from_date': date_from.isoformat(), 'to_date': date_to.isoformat(), 'currency': currency}
+
+
+def export_params(file_format, query_params):
+    """Формат и фильтры выгрузки (только параметры TransactionFilter)"""
+    filters = {
+        name: [value for value in query_params.getlist(name) if value]
+        for name in TransactionFilter.base_filters
+        if name in query_params
+    }
+    return {'file_format': file_format, 'filters': {name: values for name, values in filters.items() if values}}
+
+
+def validate_params(kind, params):
+    """Проверка параметров задачи из API. Возвращает нормализованные параметры"""
+    if not isinstance(params, dict):
+        raise InvalidJobParams('Ожидался объект')
+    if kind == Job.STATISTICS:
+        date_from, date_to = get_period(params.get('from_date'), params.get('to_date'))
+        if date_from > date_to:
+            raise InvalidJobParams('from_date позже to_date')
+        try:
+            currency = parse_currency(params.get('currency'))
+        except UnknownCurrency as error:
+            raise InvalidJobParams(str(error))
+        return statistics_params(date_from, date_to, currency)
+    if kind == Job.EXPORT:
+        file_format = params.get('file_format', 'csv')
+        if file_format not in EXPORT_FORMATS:
+            raise InvalidJobParams(f'Неизвестный формат: {file_format}')
+        filters = params.get('filters') or {}
+        if not isinstance(filters, dict):
+            raise InvalidJobParams('filters: ожидался объект')
+        query_params = MultiValueDict({
+            name: value if isinstance(value, list) else [value]
+            for name, value in filters.items()
+        })
+        filterset = TransactionFilter(query_params, queryset=Transaction.objects.none())
+        if not filterset.is_valid():
+            raise InvalidJobParams(filterset.errors.as_text())
+        return export_params(file_format, query_params)
+    raise InvalidJobParams(f'Неизвестный тип задачи: {kind}')
+
+
+def submit_job(user, kind, params):
+    """
+    Постановка задачи. Если такая же задача пользователя уже в очереди
+    или выполняется — возвращается она. Возвращает (задача, создана ли)
+    """
+    for job in Job.objects.filter(user=user, kind=kind, status__in=ACTIVE_STATUSES):
+        if job.params == params:
+            return job, False
+    return Job.objects.create(user=user, kind=kind, params=params), True
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def claim_job(worker):
+    """Захват самой старой задачи из очереди. Возвращает id или None"""
+    candidates = Job.objects.filter(status=Job.PENDING).order_by('created_at', 'pk')
+    for pk in candidates.values_list('pk', flat=True)[:10]:
+        now = timezone.now()
+        claimed = Job.objects.filter(pk=pk, status=Job.PENDING).update(
+            status=Job.RUNNING,
+            worker=worker,
+            started_at=now,
+            heartbeat_at=now,
+            attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return pk
+    return None
+
+
+def requeue_stale_jobs(now=None):
+    """
+    Задачи без heartbeat дольше STALE_AFTER_SECONDS (воркер упал) —
+    обратно в очередь или в failed после MAX_ATTEMPTS попыток
+    """
+    now = now or timezone.now()
+    stale = Job.objects.filter(
+        status=Job.RUNNING,
+        heartbeat_at__lt=now - timedelta(seconds=settings.JOBS['STALE_AFTER_SECONDS']),
+    )
+    failed = stale.filter(attempts__gte=settings.JOBS['MAX_ATTEMPTS']).update(
+        status=Job.FAILED, error='Воркер не завершил задачу', finished_at=now,
+    )
+    requeued = stale.update(status=Job.PENDING, worker='', progress=0)
+    return requeued, failed
+
+
+def prune_jobs(now=None):
+    """Удаление завершенных задач старше RETENTION_DAYS вместе с файлами"""
+    now = now or timezone.now()
+    old = Job.objects.filter(
+        status__in=[Job.DONE, Job.FAILED],
+        finished_at__lt=now - timedelta(days=settings.JOBS['RETENTION_DAYS']),
+    )
+    for job in old.exclude(file=''):
+        job.file.delete(save=False)
+    return old.delete()[0]
+
+
+class Progress:
+    """
+    Обновление прогресса и heartbeat задачи (только при изменении процента).
+    Запись необязательная: на SQLite она может упереться в блокировку,
+    пока другой процесс пишет, — тогда обновится при следующем вызове
+    """
+
+    def __init__(self, job):
+        self.job = job
+        self.percent = None
+
+    def __call__(self, done, total):
+        percent = min(99, done * 100 // total) if total else 0
+        if percent == self.percent:
+            return
+        try:
+            Job.objects.filter(pk=self.job.pk).update(progress=percent, heartbeat_at=timezone.now())
+        except DatabaseError as e:
+            logger.warning('Задача %s: прогресс не сохранен: %s', self.job.pk, e)
+            return
+        self.percent = percent
+
+
+def run_statistics_job(job, progress):
+    """Статистика по годам периода — с прогрессом по мере расчета"""
+    date_from, date_to = get_period(job.params.get('from_date'), job.params.get('to_date'))
+    requested = job.params.get('currency')
+    currency = requested or get_base_currency(job.user)
+    parts = split_period(date_from, date_to)
+    buckets = []
+    for index, (start, end) in enumerate(parts, 1):
+        buckets.extend(statistics_buckets(job.user, start, end, currency))
+        progress(index, len(parts))
+
+    statistics = summarize_buckets(buckets)
+    statistics.update(summarize_accounts(job.user, date_to, currency))
+    statistics['currency'] = currency
+    # Готовый результат — в кэш статистики (при общем кэше, file/redis,
+    # следующий синхронный запрос за тот же период его получит)
+    store('statistics', job.user.pk, [date_from, date_to, requested], statistics)
+    job.result = statistics_response_data(statistics, date_from, date_to)
+
+
+def _counted(rows, progress, total):
+    for index, row in enumerate(rows, 1):
+        yield row
+        if index % EXPORT_PROGRESS_ROWS == 0:
+            progress(index, total)
+
+
+def run_export_job(job, progress):
+    """Выгрузка во временный файл, затем в хранилище результатов задач"""
+    file_format = job.params['file_format']
+    filters = MultiValueDict(job.params.get('filters') or {})
+    queryset = params_source(filters).objects.filter(user=job.user)
+    queryset = TransactionFilter(filters, queryset=queryset).qs
+    total = queryset.count()
+
+    with tempfile.TemporaryFile() as output:
+        for chunk in STREAMERS[file_format](_counted(export_rows(queryset), progress, total)):
+            output.write(chunk.encode() if isinstance(chunk, str) else chunk)
+        output.seek(0)
+        job.file.save(export_filename(file_format), File(output), save=False)
+    job.result = {'rows': total, 'file_format': file_format}
+
+
+JOB_HANDLERS = {
+    Job.STATISTICS: run_statistics_job,
+    Job.EXPORT: run_export_job,
+}
+
+
+def run_job(job_id):
+    """Выполнение захваченной задачи (в процессе пула воркера)"""
+    job = Job.objects.select_related('user').get(pk=job_id)
+    try:
+        JOB_HANDLERS[job.kind](job, Progress(job))
+    except Exception as e:
+        logger.exception('Задача %s завершилась ошибкой', job_id)
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.FAILED, error=f'{type(e).__name__}: {e}', finished_at=timezone.now(),
+        )
+        return Job.FAILED
+
+    job.status = Job.DONE
+    job.progress = 100
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'progress', 'result', 'file', 'finished_at'])
+    return Job.DONE
@@ -0,0 +1,125 @@
+"""
+Быстрое чтение списков операций для API.
+
+Строки выбираются через values() — без создания моделей и без
+TransactionSerializer, — и форматируются так же, как их отдал бы
+сериализатор (суммы строками с двумя знаками, даты в ISO, время
+в текущем часовом поясе). Поля ответа:
+- ?fields=id,amount,date — только перечисленные поля (по умолчанию —
+  все поля TransactionSerializer);
+- ?embed=category — название категории (category_name) тем же
+  запросом через JOIN, без отдельных запросов.
+Нарастающий остаток (running_balance) считается, только если он запрошен.
+"""
+from functools import partial
+
+from django.db.models import BooleanField, F, Value
+from django.utils import timezone
+
+from .ledger import running_balances
+from .models import LedgerTransaction
+
+
+def _decimal(value):
+    return None if value is None else f'{value:.2f}'
+
+
+def _date(value):
+    return None if value is None else value.isoformat()
+
+
+def _datetime(value, tz):
+    # Как serializers.DateTimeField: часовой пояс tz, UTC — с суффиксом Z
+    if value is None:
+        return None
+    value = value.astimezone(tz).isoformat()
+    return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+
+# Поле ответа: (поле values(), форматирование)
+COLUMNS = {
+    'id': ('id', None),
+    'type': ('type', None),
+    'amount': ('amount', _decimal),
+    'currency': ('currency', None),
+    'category': ('category_id', None),
+    'account': ('account_id', None),
+    'description': ('description', None),
+    'date': ('date', _date),
+    'recurring_rule': ('recurring_rule_id', None),
+    'running_balance': ('running_balance', _decimal),
+    'archived': ('archived', None),
+    'created_at': ('created_at', _datetime),
+    'updated_at': ('updated_at', _datetime),
+    'category_name': ('category_name', None),
+}
+# Порядок полей TransactionSerializer
+DEFAULT_FIELDS = [
+    'id', 'type', 'amount', 'currency', 'category', 'account', 'description', 'date',
+    'recurring_rule', 'running_balance', 'archived', 'created_at', 'updated_at',
+]
+EMBEDS = {
+    'category': 'category_name',
+}
+# Всегда выбираются: id и поля сортировки нужны для курсора страниц
+REQUIRED_COLUMNS = ('id', 'date', 'amount')
+
+
+class InvalidFields(ValueError):
+    pass
+
+
+def parse_fields(params):
+    """Поля ответа из ?fields= и ?embed= (неизвестные — InvalidFields)"""
+    value = params.get('fields')
+    fields = DEFAULT_FIELDS
+    if value:
+        fields = list(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+    embeds = [name.strip() for value in params.getlist('embed') for name in value.split(',') if name.strip()]
+
+    unknown = [name for name in fields if name not in COLUMNS]
+    unknown += [name for name in embeds if name not in EMBEDS]
+    if unknown:
+        raise InvalidFields(f"Неизвестные поля: {', '.join(unknown)}")
+    return fields + [EMBEDS[name] for name in embeds if EMBEDS[name] not in fields]
+
+
+def lean_queryset(queryset, fields):
+    """values() выборки операций: только столбцы полей fields (и REQUIRED_COLUMNS)"""
+    columns = {COLUMNS[name][0] for name in fields} | set(REQUIRED_COLUMNS)
+    expressions = {}
+    if 'running_balance' in columns:
+        columns.discard('running_balance')
+        columns |= {'account_id', 'date'}
+    if 'category_name' in columns:
+        columns.discard('category_name')
+        expressions['category_name'] = F('category__name')
+    if 'archived' in columns and queryset.model is not LedgerTransaction:
+        # Горячая таблица: столбца нет, все строки не архивные
+        columns.discard('archived')
+        expressions['archived'] = Value(False, output_field=BooleanField())
+    return queryset.values(*sorted(columns), **expressions)
+
+
+def lean_rows(rows, fields):
+    """Строки values() -> словари ответа с полями fields в порядке fields"""
+    rows = list(rows)
+    if 'running_balance' in fields:
+        balances = running_balances((row['id'], row['account_id'], row['date']) for row in rows)
+        for row in rows:
+            row['running_balance'] = balances.get(row['id'])
+    # Текущий часовой пояс — один раз на страницу, а не в каждой строке
+    tz = timezone.get_current_timezone()
+    columns = []
+    for name in fields:
+        column, format_value = COLUMNS[name]
+        if format_value is _datetime:
+            format_value = partial(_datetime, tz=tz)
+        columns.append((name, column, format_value))
+    return [
+        {
+            name: row[column] if format_value is None else format_value(row[column])
+            for name, column, format_value in columns
+        }
+        for row in rows
+    ]
@@ -0,0 +1,93 @@
+"""
+Остатки счетов: текущий, на дату и нарастающий по операциям.
+
+Текущий остаток хранится в Account.balance, а итоги операций счета
+по дням — в AccountRollup; и то и другое поддерживается инкрементально
+вместе со сводками (rollups.py). Поэтому остаток на конец дня — это
+текущий остаток минус итоги более поздних дней: поиск по индексу
+(счет, дата) в сводке, без суммирования всей истории операций.
+Нарастающий остаток строк списка считается оконными функциями: по дням —
+по сводке счета, внутри дня — по операциям только дат страницы.
+"""
+from decimal import Decimal
+
+from django.db.models import F, Sum, Window
+
+from .archive import transaction_source
+from .models import Account, AccountRollup
+from .rollups import account_rollup_sum, signed_amount_expression
+
+
+CENT = Decimal('0.01')
+
+
+def balances_as_of(user, day):
+    """Счета пользователя с остатком на конец дня day (balance_as_of)"""
+    return Account.objects.filter(user=user).annotate(
+        balance_as_of=F('balance') - account_rollup_sum(date__gt=day),
+    ).order_by('pk')
+
+
+def attach_running_balances(transactions):
+    """
+    Проставить running_balance (остаток счета после операции) строкам
+    страницы (см. running_balances); операциям без счета — None
+    """
+    transactions = list(transactions)
+    balances = running_balances(
+        (transaction.pk, transaction.account_id, transaction.date) for transaction in transactions
+    )
+    for transaction in transactions:
+        transaction.running_balance = balances.get(transaction.pk)
+    return transactions
+
+
+def running_balances(rows):
+    """
+    Остаток счета после каждой операции страницы, rows — (id, счет, дата);
+    {id: остаток} двумя запросами:
+    - сумма итогов счета с дня операции и позже (окно по AccountRollup,
+      от новых дней к старым) вместе с текущим остатком;
+    - накопленная сумма операций счета за день до операции включительно
+      (окно по операциям дат страницы, в порядке id).
+    Остаток после операции = текущий − итоги с ее дня + накопленное за день.
+    Операций без счета в результате нет
+    """
+    with_account = [(pk, account_id, day) for pk, account_id, day in rows if account_id is not None]
+    if not with_account:
+        return {}
+    account_ids = {account_id for _, account_id, _ in with_account}
+    dates = {day for _, _, day in with_account}
+
+    days = AccountRollup.objects.filter(
+        account_id__in=account_ids,
+        date__gte=min(dates),
+    ).annotate(
+        since=Window(
+            Sum('total'),
+            partition_by=[F('account_id')],
+            order_by=[F('date').desc()],
+        ),
+    ).order_by().values_list('account_id', 'date', 'since', 'account__balance')
+    before_day = {
+        (account_id, day): balance - since
+        for account_id, day, since, balance in days
+        if day in dates
+    }
+
+    running = dict(transaction_source(min(dates)).objects.filter(
+        account_id__in=account_ids,
+        date__in=dates,
+    ).annotate(
+        running=Window(
+            Sum(signed_amount_expression()),
+            partition_by=[F('account_id'), F('date')],
+            order_by=[F('id').asc()],
+        ),
+    ).order_by().values_list('pk', 'running'))
+
+    return {
+        pk: (before_day[account_id, day] + running[pk]).quantize(CENT)
+        for pk, account_id, day in with_account
+        if (account_id, day) in before_day and pk in running
+    }
@@ -0,0 +1,29 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from transactions.archive import archive_transactions
+
+
+class Command(BaseCommand):
+    help = 'Перенос операций старше горизонта в архив (запуск по расписанию, повторный запуск безопасен)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.ARCHIVE['BATCH_SIZE'],
+                            help='Операций в одной пачке')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть положительным')
+
+        start = time.perf_counter()
+        report = archive_transactions(batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - start
+        for label, key in (('В архив', 'archived'), ('Из архива', 'restored')):
+            for year, count in sorted(report[key].items()):
+                self.stdout.write(f'{label}: {year} — {count}')
+        self.stdout.write(self.style.SUCCESS(
+            f"Горизонт {report['horizon']:%Y-%m-%d}: в архив {report['archived'].total()}, "
+            f"из архива {report['restored'].total()} за {elapsed:.1f} с"
+        ))
@@ -0,0 +1,117 @@
+"""
+Пропускная способность конкурентной записи для текущего профиля БД.
+
+Потоки одновременно создают операции через POST /api/transactions/
+(TransactionViewSet: валидация, сохранение, сводки и остатки в сигналах),
+у каждого потока свое соединение с БД. Профили сравниваются запуском
+с разным DATABASE_PROFILE, например:
+
+    DATABASE_PROFILE=sqlite-default python manage.py bench_writes
+    DATABASE_PROFILE=sqlite python manage.py bench_writes
+
+Данные пишутся во временного пользователя, который удаляется в конце.
+"""
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client, override_settings
+
+from transactions.db import sqlite_pragmas
+from transactions.models import Category
+
+from .loadtest import summarize
+
+
+BENCH_USERNAME = 'bench-writes'
+
+
+def run_writes(user, categories, writes, concurrency):
+    def worker(index, count):
+        client = Client()
+        client.force_login(user)
+        latencies, errors = [], 0
+        try:
+            for number in range(count):
+                payload = {
+                    'type': 'expense' if number % 4 else 'income',
+                    'amount': f'{100 + number % 900}.50',
+                    'category': categories[(index + number) % len(categories)],
+                    'date': (date(2025, 1, 1) + timedelta(days=(index * count + number) % 365)).isoformat(),
+                }
+                start = time.perf_counter()
+                try:
+                    response = client.post('/api/transactions/', payload, content_type='application/json')
+                    errors += response.status_code != 201
+                except Exception:
+                    # "database is locked" и т.п. — ошибка записи, а не бенчмарка
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+        finally:
+            connections.close_all()
+        return latencies, errors
+
+    counts = [writes // concurrency + (index < writes % concurrency) for index in range(concurrency)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(worker, range(concurrency), counts))
+    elapsed = time.perf_counter() - start
+    return summarize(
+        [latency for latencies, _ in results for latency in latencies],
+        sum(errors for _, errors in results),
+        elapsed,
+    )
+
+
+class Command(BaseCommand):
+    help = 'Пропускная способность конкурентной записи операций для текущего профиля БД'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writes', type=int, default=2000, help='Всего операций')
+        parser.add_argument('--concurrency', type=int, action='append',
+                            help='Потоков записи (можно несколько; по умолчанию 1, 4 и 16)')
+        parser.add_argument('--json', action='store_true', help='Вывод в JSON')
+
+    def handle(self, *args, **options):
+        concurrency_levels = options['concurrency'] or [1, 4, 16]
+        if options['writes'] < 1 or min(concurrency_levels) < 1:
+            raise CommandError('--writes и --concurrency должны быть положительными')
+
+        User.objects.filter(username=BENCH_USERNAME).delete()
+        user = User.objects.create_user(BENCH_USERNAME)
+        categories = [
+            Category.objects.create(user=user, name=f'Категория {number}').pk for number in range(10)
+        ]
+        results = {}
+        try:
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                for concurrency in concurrency_levels:
+                    results[concurrency] = run_writes(user, categories, options['writes'], concurrency)
+        finally:
+            user.delete()
+
+        report = {
+            'profile': settings.DATABASE_PROFILE,
+            'database': settings.DATABASES['default']['ENGINE'],
+            'pragmas': sqlite_pragmas(connection),
+            'writes': options['writes'],
+            'results': results,
+        }
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(f"Профиль: {report['profile']} ({report['database']})")
+        for name, value in report['pragmas'].items():
+            self.stdout.write(f'  {name} = {value}')
+        self.stdout.write(f"{'потоки':>6} {'записей/с':>10} {'p50, мс':>9} {'p95, мс':>9} {'ошибки':>7}")
+        for concurrency, result in results.items():
+            self.stdout.write(
+                f"{concurrency:>6} {result['rps']:>10} {result['p50_ms']:>9} "
+                f"{result['p95_ms']:>9} {result['errors']:>7}"
+            )
@@ -0,0 +1,91 @@
+"""
+Бенчмарк представлений операций на синтетических данных
+(transactions/benchmarks.py, transactions/synthetic.py).
+
+    python manage.py benchmark --output bench.json
+    python manage.py benchmark --rows 10000 --baseline bench.json --threshold 0.2
+
+С --baseline прогон сравнивается с сохраненным JSON; если сценарий
+стал хуже больше чем на порог, команда завершается с ошибкой.
+Синтетические пользователи создаются в текущей БД и удаляются в конце.
+"""
+import json
+import platform
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from transactions.benchmarks import DEFAULT_SIZES, ENDPOINTS, compare_results, run_benchmark
+
+
+class Command(BaseCommand):
+    help = 'Время ответа, число запросов и пик памяти представлений операций на синтетических данных'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, action='append',
+                            help='Всего операций (можно несколько; по умолчанию 10k, 100k и 1M)')
+        parser.add_argument('--users', type=int, default=10, help='Пользователей')
+        parser.add_argument('--categories', type=int, default=12, help='Категорий у пользователя')
+        parser.add_argument('--requests', type=int, default=20, help='Замеров на сценарий')
+        parser.add_argument('--seed', type=int, default=0, help='Seed генератора данных')
+        parser.add_argument('--endpoint', action='append', choices=list(ENDPOINTS),
+                            help='Только эти сценарии (можно несколько)')
+        parser.add_argument('--output', help='Сохранить результаты в JSON')
+        parser.add_argument('--baseline', help='JSON прошлого прогона для сравнения')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Допустимое ухудшение относительно baseline (0.2 — 20%%)')
+
+    def handle(self, *args, **options):
+        sizes = options['rows'] or list(DEFAULT_SIZES)
+        if min(sizes) < 1 or options['users'] < 1 or options['categories'] < 1 or options['requests'] < 1:
+            raise CommandError('--rows, --users, --categories и --requests должны быть положительными')
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline'], encoding='utf-8') as baseline_file:
+                    baseline = json.load(baseline_file)['results']
+            except (OSError, ValueError, KeyError) as error:
+                raise CommandError(f'Не удалось прочитать baseline: {error}')
+
+        results = run_benchmark(
+            sizes=sizes,
+            users=options['users'],
+            categories=options['categories'],
+            requests=options['requests'],
+            seed=options['seed'],
+            endpoints=options['endpoint'],
+            progress=self.stdout.write,
+        )
+        report = {
+            'created_at': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'database': settings.DATABASES['default']['ENGINE'],
+            'profile': settings.DATABASE_PROFILE,
+            'params': {name: options[name] for name in ('users', 'categories', 'requests', 'seed')},
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump(report, output, indent=2, ensure_ascii=False)
+
+        self.stdout.write(
+            f"{'операций':>9} {'сценарий':<25} {'p50, мс':>9} {'p95, мс':>9} {'запросов':>9} {'пик, КБ':>9}"
+        )
+        for size, endpoints in results.items():
+            for name, result in endpoints.items():
+                self.stdout.write(
+                    f"{size:>9} {name:<25} {result['p50_ms']:>9} {result['p95_ms']:>9} "
+                    f"{result['queries'] if result['queries'] is not None else '—':>9} {result['peak_kb']:>9}"
+                )
+
+        if baseline is not None:
+            regressions = compare_results(baseline, results, options['threshold'])
+            for regression in regressions:
+                self.stderr.write(
+                    f"Регрессия {regression['endpoint']} ({regression['size']} операций): "
+                    f"{regression['metric']} {regression['baseline']} → {regression['current']}"
+                )
+            if regressions:
+                raise CommandError(f'Регрессий: {len(regressions)} (порог {options["threshold"]:.0%})')
+            self.stdout.write(self.style.SUCCESS('Регрессий относительно baseline нет'))
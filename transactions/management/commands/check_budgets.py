@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from transactions.budgets import BATCH_SIZE, check_budgets
+
+
+class Command(BaseCommand):
+    help = 'Пересчет уровней оповещения бюджетов (запуск по расписанию, повторный запуск безопасен)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Дата проверки, YYYY-MM-DD (по умолчанию сегодня)')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Бюджетов в одной пачке')
+
+    def handle(self, *args, **options):
+        as_of = None
+        if options['date']:
+            as_of = parse_date(options['date'])
+            if as_of is None:
+                raise CommandError(f"Некорректная дата: {options['date']}")
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть положительным')
+
+        start = time.perf_counter()
+        report = check_budgets(as_of=as_of, batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"Бюджетов: {report['budgets']}, изменился уровень: {report['changed']} за {elapsed:.1f} с"
+        ))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from transactions.currency import InvalidRates, import_rates
+
+
+class Command(BaseCommand):
+    help = 'Загрузка курсов валют из CSV (date,currency,rate — рублей за единицу)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к CSV-файлу')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], encoding='utf-8-sig', newline='') as f:
+                report = import_rates(f)
+        except (OSError, InvalidRates) as e:
+            raise CommandError(str(e))
+
+        for currency, days in sorted(report.items()):
+            self.stdout.write(f'{currency}: {days} дн.')
+        self.stdout.write(self.style.SUCCESS('Курсы загружены, кэш статистики сброшен'))
@@ -0,0 +1,39 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from transactions.importers import BATCH_SIZE, FORMATS, TransactionImporter, detect_format, iter_rows
+
+
+class Command(BaseCommand):
+    help = 'Импорт транзакций пользователя из CSV или JSON Lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к файлу')
+        parser.add_argument('--user', required=True, help='Имя пользователя')
+        parser.add_argument('--format', choices=FORMATS, help='Формат (по умолчанию — по расширению)')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--no-create-categories', action='store_true',
+                            help='Не создавать отсутствующие категории')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"Пользователь {options['user']} не найден")
+
+        file_format = options['format'] or detect_format(options['path'])
+        importer = TransactionImporter(
+            user,
+            batch_size=options['batch_size'],
+            create_categories=not options['no_create_categories'],
+        )
+        with open(options['path'], 'rb') as f:
+            report = importer.run(iter_rows(f, file_format))
+
+        for error in report['errors']:
+            self.stderr.write(f"Строка {error['row']}: {json.dumps(error['errors'], ensure_ascii=False)}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Импортировано {report['created']} из {report['total']}, ошибок: {report['failed']}"
+        ))
@@ -0,0 +1,148 @@
+"""
+Нагрузочное сравнение sync (WSGI) и async (ASGI) представлений.
+
+Запросы идут через обработчики Django в этом же процессе: WSGI —
+django.test.Client из пула потоков, ASGI — AsyncClient в одном event loop.
+Данные — текущая БД из настроек (SQLite или Postgres), пользователь
+должен существовать.
+"""
+import asyncio
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client, override_settings
+
+
+# Сценарий: (sync URL, async URL)
+SCENARIOS = {
+    'statistics': ('/api/statistics/', '/api/async/statistics/'),
+    'transactions': ('/api/transactions/?pagination=cursor', '/api/async/transactions/?pagination=cursor'),
+    'statistics-page': ('/statistics/', '/statistics/'),
+}
+
+
+def summarize(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'seconds': round(elapsed, 3),
+        'rps': round(len(latencies) / elapsed, 1) if elapsed else 0,
+        'p50_ms': round(quantiles[49] * 1000, 1),
+        'p95_ms': round(quantiles[94] * 1000, 1),
+        'max_ms': round(latencies[-1] * 1000, 1),
+    }
+
+
+def run_wsgi(user, url, requests, concurrency):
+    def worker(count):
+        client = Client()
+        client.force_login(user)
+        latencies, errors = [], 0
+        for _ in range(count):
+            start = time.perf_counter()
+            response = client.get(url)
+            latencies.append(time.perf_counter() - start)
+            errors += response.status_code != 200
+        return latencies, errors
+
+    counts = [requests // concurrency + (index < requests % concurrency) for index in range(concurrency)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(worker, counts))
+    elapsed = time.perf_counter() - start
+    return summarize(
+        [latency for latencies, _ in results for latency in latencies],
+        sum(errors for _, errors in results),
+        elapsed,
+    )
+
+
+def run_asgi(user, url, requests, concurrency):
+    async def main():
+        client = AsyncClient()
+        await client.aforce_login(user)
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies, errors = [], 0
+
+        async def one():
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get(url)
+                latencies.append(time.perf_counter() - start)
+                errors += response.status_code != 200
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        return summarize(latencies, errors, time.perf_counter() - start)
+
+    return asyncio.run(main())
+
+
+class Command(BaseCommand):
+    help = 'Сравнение пропускной способности sync (WSGI) и async (ASGI) представлений'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', required=True, help='Пользователь, от имени которого идут запросы')
+        parser.add_argument('--scenario', choices=sorted(SCENARIOS), action='append',
+                            help='Сценарий (можно несколько; по умолчанию все)')
+        parser.add_argument('--requests', type=int, default=200, help='Запросов на сценарий и режим')
+        parser.add_argument('--concurrency', type=int, default=10, help='Одновременных запросов')
+        parser.add_argument('--cache', action='store_true',
+                            help='Использовать кэш статистики (по умолчанию каждый запрос считается заново)')
+        parser.add_argument('--json', action='store_true', help='Вывод в JSON')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"Пользователь {options['username']} не найден")
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--requests и --concurrency должны быть положительными')
+
+        overrides = {'ALLOWED_HOSTS': [*settings.ALLOWED_HOSTS, 'testserver']}
+        if not options['cache']:
+            # Отдельный кэш с нулевым TTL: значения не сохраняются
+            overrides['CACHES'] = {
+                **settings.CACHES,
+                'loadtest': {
+                    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                    'LOCATION': 'loadtest',
+                    'TIMEOUT': 0,
+                },
+            }
+            overrides['STATISTICS_CACHE_ALIAS'] = 'loadtest'
+
+        results = {}
+        with override_settings(**overrides):
+            for name in options['scenario'] or sorted(SCENARIOS):
+                sync_url, async_url = SCENARIOS[name]
+                results[name] = {
+                    'wsgi': run_wsgi(user, sync_url, options['requests'], options['concurrency']),
+                    'asgi': run_asgi(user, async_url, options['requests'], options['concurrency']),
+                }
+
+        if options['json']:
+            self.stdout.write(json.dumps({
+                'database': settings.DATABASES['default']['ENGINE'],
+                'requests': options['requests'],
+                'concurrency': options['concurrency'],
+                'cache': options['cache'],
+                'results': results,
+            }, indent=2))
+            return
+
+        self.stdout.write(f"{'сценарий':<16} {'режим':<5} {'rps':>8} {'p50, мс':>9} {'p95, мс':>9} {'ошибки':>7}")
+        for name, modes in results.items():
+            for mode, result in modes.items():
+                self.stdout.write(
+                    f"{name:<16} {mode:<5} {result['rps']:>8} {result['p50_ms']:>9} "
+                    f"{result['p95_ms']:>9} {result['errors']:>7}"
+                )
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from transactions.recurring import BATCH_SIZE, materialize_rules
+
+
+class Command(BaseCommand):
+    help = 'Создание операций по повторяющимся правилам (запуск раз в сутки, повторный запуск безопасен)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Создать операции по эту дату, YYYY-MM-DD (по умолчанию сегодня)')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Правил в одной пачке')
+
+    def handle(self, *args, **options):
+        as_of = None
+        if options['date']:
+            as_of = parse_date(options['date'])
+            if as_of is None:
+                raise CommandError(f"Некорректная дата: {options['date']}")
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть положительным')
+
+        start = time.perf_counter()
+        report = materialize_rules(as_of=as_of, batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"Правил: {report['rules']}, создано операций: {report['transactions']} за {elapsed:.1f} с"
+        ))
+        if report['conflicts']:
+            self.stdout.write(self.style.WARNING(
+                f"Пропущено правил (уже обработаны параллельным запуском): {report['conflicts']}"
+            ))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from transactions.sync import prune_tombstones
+
+
+class Command(BaseCommand):
+    help = 'Удаление устаревших отметок об удалении (для синхронизации)'
+
+    def handle(self, *args, **options):
+        deleted = prune_tombstones()
+        self.stdout.write(self.style.SUCCESS(f'Удалено отметок: {deleted}'))
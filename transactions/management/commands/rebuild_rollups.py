@@ -0,0 +1,22 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from transactions.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Полный пересчет дневных и месячных сводок по транзакциям'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Имя пользователя (по умолчанию — все)')
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"Пользователь {options['user']} не найден")
+
+        created = rebuild_rollups(user)
+        self.stdout.write(self.style.SUCCESS(f'Создано строк сводок: {created}'))
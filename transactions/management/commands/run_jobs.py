@@ -0,0 +1,87 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connections
+
+from transactions.jobs import claim_job, prune_jobs, requeue_stale_jobs, run_job, worker_name
+
+
+# Как часто возвращать брошенные задачи в очередь и удалять старые, с
+MAINTENANCE_INTERVAL = 60
+
+
+class Command(BaseCommand):
+    help = 'Воркер фоновых задач (очередь — таблица Job, выполнение — в пуле процессов)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=os.cpu_count() or 2,
+                            help='Размер пула процессов')
+        parser.add_argument('--poll', type=float, default=1.0,
+                            help='Интервал опроса очереди, с')
+        parser.add_argument('--once', action='store_true',
+                            help='Выполнить задачи из очереди и завершиться')
+
+    def handle(self, *args, **options):
+        processes = max(1, options['processes'])
+        worker = worker_name()
+        self.stdout.write(f'Воркер {worker}: {processes} процесс(ов)')
+
+        # spawn: дочерние процессы не наследуют открытые соединения с БД
+        context = multiprocessing.get_context('spawn')
+        connections.close_all()
+        running = {}
+        self.last_maintenance = 0.0
+        with ProcessPoolExecutor(max_workers=processes, mp_context=context,
+                                 initializer=django.setup) as pool:
+            try:
+                while True:
+                    try:
+                        self.dispatch(pool, worker, running, processes)
+                        busy = False
+                    except DatabaseError as e:
+                        # БД занята (блокировка SQLite) — повтор на следующем опросе
+                        self.stderr.write(f'Очередь недоступна: {e}')
+                        busy = True
+                    connections.close_all()
+
+                    if not running:
+                        if options['once'] and not busy:
+                            break
+                        time.sleep(options['poll'])
+                    else:
+                        wait(running, timeout=options['poll'], return_when=FIRST_COMPLETED)
+            except KeyboardInterrupt:
+                # Незавершенные задачи вернутся в очередь по таймауту heartbeat
+                self.stdout.write('Остановка воркера')
+
+    def dispatch(self, pool, worker, running, processes):
+        """Отчет о завершенных задачах, обслуживание очереди, захват новых задач"""
+        for future in [future for future in running if future.done()]:
+            self.report(running.pop(future), future)
+
+        if time.monotonic() - self.last_maintenance > MAINTENANCE_INTERVAL:
+            requeued, failed = requeue_stale_jobs()
+            pruned = prune_jobs()
+            if requeued or failed or pruned:
+                self.stdout.write(
+                    f'Возвращено в очередь: {requeued}, отменено: {failed}, удалено: {pruned}'
+                )
+            self.last_maintenance = time.monotonic()
+
+        while len(running) < processes:
+            job_id = claim_job(worker)
+            if job_id is None:
+                break
+            running[pool.submit(run_job, job_id)] = job_id
+
+    def report(self, job_id, future):
+        try:
+            status = future.result()
+        except Exception as e:
+            self.stderr.write(f'Задача {job_id}: процесс завершился с ошибкой: {e}')
+            return
+        self.stdout.write(f'Задача {job_id}: {status}')
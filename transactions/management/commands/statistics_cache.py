@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from transactions.cache import get_cache, get_cache_stats, reset_cache_stats
+
+
+class Command(BaseCommand):
+    help = 'Счетчики попаданий/промахов кэша статистики'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Обнулить счетчики')
+        parser.add_argument('--clear', action='store_true', help='Очистить кэш целиком')
+
+    def handle(self, *args, **options):
+        stats = get_cache_stats()
+        self.stdout.write(
+            f"Попадания: {stats['hits']}, промахи: {stats['misses']}, "
+            f"доля попаданий: {stats['hit_ratio']:.1%}"
+        )
+        if options['clear']:
+            get_cache().clear()
+            self.stdout.write(self.style.SUCCESS('Кэш очищен'))
+        elif options['reset']:
+            reset_cache_stats()
+            self.stdout.write(self.style.SUCCESS('Счетчики обнулены'))
@@ -0,0 +1,74 @@
+# Generated by Django 6.0.1 on 2026-10-17 04:29
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import ExtractWeekDay, TruncMonth
+
+
+def build_rollups(apps, schema_editor):
+    """Начальное заполнение сводок из уже существующих транзакций"""
+    Transaction = apps.get_model('transactions', 'Transaction')
+    DailyRollup = apps.get_model('transactions', 'DailyRollup')
+    MonthlyRollup = apps.get_model('transactions', 'MonthlyRollup')
+
+    daily = Transaction.objects.values(
+        'user_id', 'category_id', 'type', 'date'
+    ).annotate(total=Sum('amount'), count=Count('id')).order_by()
+    DailyRollup.objects.bulk_create(
+        (DailyRollup(**row) for row in daily.iterator()), batch_size=1000
+    )
+
+    monthly = Transaction.objects.annotate(
+        month=TruncMonth('date'),
+        weekday=ExtractWeekDay('date'),
+    ).values(
+        'user_id', 'category_id', 'type', 'month', 'weekday'
+    ).annotate(total=Sum('amount'), count=Count('id')).order_by()
+    MonthlyRollup.objects.bulk_create(
+        (MonthlyRollup(**row) for row in monthly.iterator()), batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type', models.CharField(choices=[('income', 'Доход'), ('expense', 'Расход')], max_length=7)),
+                ('date', models.DateField()),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('count', models.IntegerField(default=0)),
+                ('category', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='transactions.category')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'date'], name='dailyrollup_user_date_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='MonthlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type', models.CharField(choices=[('income', 'Доход'), ('expense', 'Расход')], max_length=7)),
+                ('month', models.DateField()),
+                ('weekday', models.PositiveSmallIntegerField()),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('count', models.IntegerField(default=0)),
+                ('category', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='transactions.category')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'month'], name='monthlyrollup_user_month_idx')],
+            },
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
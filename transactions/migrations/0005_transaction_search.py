@@ -0,0 +1,82 @@
+# Generated by Django 6.0.1 on 2026-10-17 07:40
+
+from django.db import migrations
+
+
+# Внешний FTS5-индекс по description: сам текст хранится только в
+# transactions_transaction, индекс синхронизируют триггеры — они
+# срабатывают и для bulk_create, QuerySet.update() и каскадных удалений,
+# которые обходят сигналы Django
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE transactions_transaction_fts USING fts5(
+        description,
+        content='transactions_transaction',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER transactions_transaction_fts_ai
+    AFTER INSERT ON transactions_transaction BEGIN
+        INSERT INTO transactions_transaction_fts(rowid, description)
+        VALUES (new.id, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER transactions_transaction_fts_ad
+    AFTER DELETE ON transactions_transaction BEGIN
+        INSERT INTO transactions_transaction_fts(transactions_transaction_fts, rowid, description)
+        VALUES ('delete', old.id, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER transactions_transaction_fts_au
+    AFTER UPDATE OF description ON transactions_transaction BEGIN
+        INSERT INTO transactions_transaction_fts(transactions_transaction_fts, rowid, description)
+        VALUES ('delete', old.id, old.description);
+        INSERT INTO transactions_transaction_fts(rowid, description)
+        VALUES (new.id, new.description);
+    END
+    """,
+    "INSERT INTO transactions_transaction_fts(transactions_transaction_fts) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    'DROP TRIGGER IF EXISTS transactions_transaction_fts_au',
+    'DROP TRIGGER IF EXISTS transactions_transaction_fts_ad',
+    'DROP TRIGGER IF EXISTS transactions_transaction_fts_ai',
+    'DROP TABLE IF EXISTS transactions_transaction_fts',
+]
+
+
+def fts5_available(schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+def create_search_index(apps, schema_editor):
+    # Только SQLite с FTS5; иначе поиск работает через icontains
+    if schema_editor.connection.vendor != 'sqlite' or not fts5_available(schema_editor):
+        return
+    for sql in CREATE_SQL:
+        schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in DROP_SQL:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0004_sync'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,105 @@
+# Generated by Django 6.0.1 on 2026-10-17 09:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Case, Count, F, OuterRef, Subquery, Sum, When
+from django.utils import timezone
+
+
+DEFAULT_ACCOUNT_NAME = 'Основной счет'
+
+
+def create_default_accounts(apps, schema_editor):
+    """
+    Пользователям с операциями — счет по умолчанию со всеми их
+    операциями, дневными итогами и посчитанным остатком
+    """
+    Account = apps.get_model('transactions', 'Account')
+    AccountRollup = apps.get_model('transactions', 'AccountRollup')
+    Transaction = apps.get_model('transactions', 'Transaction')
+
+    user_ids = Transaction.objects.values_list('user_id', flat=True).distinct().order_by()
+    Account.objects.bulk_create(
+        (Account(user_id=user_id, name=DEFAULT_ACCOUNT_NAME) for user_id in user_ids.iterator()),
+        batch_size=1000,
+    )
+    # Операции меняются — синхронизация (sync.py) отдаст их заново
+    Transaction.objects.update(
+        account=Subquery(Account.objects.filter(user=OuterRef('user')).values('pk')[:1]),
+        updated_at=timezone.now(),
+    )
+
+    signed = Case(When(type='income', then=F('amount')), default=-F('amount'))
+    daily = Transaction.objects.values(
+        'user_id', 'account_id', 'date'
+    ).annotate(total=Sum(signed), count=Count('id')).order_by()
+    AccountRollup.objects.bulk_create(
+        (AccountRollup(**row) for row in daily.iterator()), batch_size=1000
+    )
+    Account.objects.update(balance=Subquery(
+        AccountRollup.objects.filter(account=OuterRef('pk')).order_by().values('account')
+        .annotate(total=Sum('total')).values('total')
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0007_recurring_rule'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Account',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('kind', models.CharField(choices=[('cash', 'Наличные'), ('card', 'Карта'), ('savings', 'Накопительный')], default='card', max_length=7)),
+                ('opening_balance', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('balance', models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=14)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='recurringrule',
+            name='account',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='transactions.account'),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='account',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='transactions.account'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['account', 'date', 'id'], name='transaction_account_date_idx'),
+        ),
+        migrations.AddField(
+            model_name='accountrollup',
+            name='account',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='transactions.account'),
+        ),
+        migrations.AddField(
+            model_name='accountrollup',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='accountrollup',
+            index=models.Index(fields=['account', 'date'], name='accountrollup_account_date_idx'),
+        ),
+        migrations.RunPython(create_default_accounts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,96 @@
+# Generated by Django 6.0.1 on 2026-10-17 09:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0008_account'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExchangeRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(choices=[('RUB', 'Рубль'), ('USD', 'Доллар США'), ('EUR', 'Евро')], max_length=3)),
+                ('date', models.DateField()),
+                ('rate', models.DecimalField(decimal_places=8, max_digits=18)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Profile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('base_currency', models.CharField(choices=[('RUB', 'Рубль'), ('USD', 'Доллар США'), ('EUR', 'Евро')], default='RUB', max_length=3)),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name='dailyrollup',
+            name='dailyrollup_user_date_idx',
+        ),
+        migrations.AddField(
+            model_name='account',
+            name='currency',
+            field=models.CharField(choices=[('RUB', 'Рубль'), ('USD', 'Доллар США'), ('EUR', 'Евро')], default='RUB', max_length=3),
+        ),
+        migrations.AddField(
+            model_name='dailyrollup',
+            name='currency',
+            field=models.CharField(choices=[('RUB', 'Рубль'), ('USD', 'Доллар США'), ('EUR', 'Евро')], default='RUB', max_length=3),
+        ),
+        migrations.AddField(
+            model_name='monthlyrollup',
+            name='currency',
+            field=models.CharField(choices=[('RUB', 'Рубль'), ('USD', 'Доллар США'), ('EUR', 'Евро')], default='RUB', max_length=3),
+        ),
+        migrations.AddField(
+            model_name='recurringrule',
+            name='currency',
+            field=models.CharField(choices=[('RUB', 'Рубль'), ('USD', 'Доллар США'), ('EUR', 'Евро')], default='RUB', max_length=3),
+        ),
+        # ADD COLUMN вместо пересоздания таблицы: на SQLite пересоздание
+        # удалило бы триггеры полнотекстового индекса (0005)
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    "ALTER TABLE transactions_transaction ADD COLUMN currency varchar(3) DEFAULT 'RUB' NOT NULL",
+                    reverse_sql='ALTER TABLE transactions_transaction DROP COLUMN currency',
+                ),
+            ],
+            state_operations=[
+                migrations.AddField(
+                    model_name='transaction',
+                    name='currency',
+                    field=models.CharField(choices=[('RUB', 'Рубль'), ('USD', 'Доллар США'), ('EUR', 'Евро')], default='RUB', max_length=3),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='exchangerate',
+            constraint=models.UniqueConstraint(fields=('currency', 'date'), name='exchange_rate_currency_date_uniq'),
+        ),
+        migrations.AddField(
+            model_name='dailyrollup',
+            name='rate',
+            field=models.ForeignObject(from_fields=['currency', 'date'], null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='transactions.exchangerate', to_fields=['currency', 'date']),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='rate',
+            field=models.ForeignObject(from_fields=['currency', 'date'], null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='transactions.exchangerate', to_fields=['currency', 'date']),
+        ),
+        migrations.AddIndex(
+            model_name='dailyrollup',
+            index=models.Index(fields=['user', 'currency', 'date'], name='dailyrollup_user_cur_date_idx'),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='user',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='finance_profile', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 6.0.1 on 2026-10-17 10:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def build_spending_rollups(apps, schema_editor):
+    """Месячные расходы категорий по уже существующим операциям"""
+    SpendingRollup = apps.get_model('transactions', 'SpendingRollup')
+    Transaction = apps.get_model('transactions', 'Transaction')
+
+    monthly = Transaction.objects.filter(type='expense', category__isnull=False).annotate(
+        month=TruncMonth('date'),
+    ).values(
+        'user_id', 'category_id', 'currency', 'month'
+    ).annotate(total=Sum('amount'), count=Count('id')).order_by()
+    SpendingRollup.objects.bulk_create(
+        (SpendingRollup(**row) for row in monthly.iterator()), batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0009_currency'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Budget',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('limit', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('currency', models.CharField(choices=[('RUB', 'Рубль'), ('USD', 'Доллар США'), ('EUR', 'Евро')], default='RUB', max_length=3)),
+                ('alert', models.CharField(choices=[('ok', 'В пределах'), ('warning', 'Прогноз выше лимита'), ('exceeded', 'Превышен')], default='ok', max_length=8)),
+                ('alert_month', models.DateField(blank=True, null=True)),
+                ('alerted_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='transactions.category')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'category'), name='budget_user_category_uniq'), models.CheckConstraint(condition=models.Q(('limit__gt', 0)), name='budget_limit_positive')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SpendingRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(choices=[('RUB', 'Рубль'), ('USD', 'Доллар США'), ('EUR', 'Евро')], default='RUB', max_length=3)),
+                ('month', models.DateField()),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('count', models.IntegerField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='transactions.category')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'month'], name='spendingrollup_user_month_idx')],
+            },
+        ),
+        migrations.RunPython(build_spending_rollups, migrations.RunPython.noop),
+    ]
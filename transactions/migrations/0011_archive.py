@@ -0,0 +1,68 @@
+# Generated by Django 6.0.1 on 2026-10-17 10:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Горячие и архивные операции одним представлением (модель LedgerTransaction)
+LEDGER_COLUMNS = (
+    'id, user_id, category_id, account_id, type, amount, currency, description, '
+    'date, recurring_rule_id, created_at, updated_at'
+)
+CREATE_LEDGER_VIEW = f"""
+    CREATE VIEW transactions_ledger AS
+    SELECT {LEDGER_COLUMNS}, FALSE AS archived FROM transactions_transaction
+    UNION ALL
+    SELECT {LEDGER_COLUMNS}, TRUE AS archived FROM transactions_archivedtransaction
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0010_budget'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedTransaction',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('type', models.CharField(choices=[('income', 'Доход'), ('expense', 'Расход')], max_length=7)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('currency', models.CharField(choices=[('RUB', 'Рубль'), ('USD', 'Доллар США'), ('EUR', 'Евро')], default='RUB', max_length=3)),
+                ('description', models.TextField(blank=True)),
+                ('date', models.DateField()),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('account', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='transactions.account')),
+                ('category', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='transactions.category')),
+                ('recurring_rule', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='transactions.recurringrule')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'date'], name='archivedtx_user_date_idx'), models.Index(fields=['account', 'date', 'id'], name='archivedtx_account_date_idx')],
+            },
+        ),
+        migrations.RunSQL(CREATE_LEDGER_VIEW, 'DROP VIEW transactions_ledger'),
+        migrations.CreateModel(
+            name='LedgerTransaction',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('type', models.CharField(choices=[('income', 'Доход'), ('expense', 'Расход')], max_length=7)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('currency', models.CharField(choices=[('RUB', 'Рубль'), ('USD', 'Доллар США'), ('EUR', 'Евро')], max_length=3)),
+                ('description', models.TextField()),
+                ('date', models.DateField()),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived', models.BooleanField()),
+            ],
+            options={
+                'db_table': 'transactions_ledger',
+                'managed': False,
+            },
+        ),
+    ]
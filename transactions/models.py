@@ -1,11 +1,192 @@
-from django.db import models
+from django.db import models, transaction as db_transaction
 from django.contrib.auth.models import User
 from datetime import date
 
+from django.conf import settings
+from django.db.models.functions import Round
+from django.core.files.storage import FileSystemStorage
+from django.utils import timezone
+
+from .cache import bump_data_version
+
+
+# Валюты операций. Курсы (ExchangeRate) задаются в рублях за единицу
+# валюты; статистика переводится в базовую валюту пользователя (Profile)
+RUB = 'RUB'
+USD = 'USD'
+EUR = 'EUR'
+
+CURRENCY_CHOICES = [
+    (RUB, 'Рубль'),
+    (USD, 'Доллар США'),
+    (EUR, 'Евро'),
+]
+DEFAULT_CURRENCY = RUB
+
+
+class UserDataQuerySet(models.QuerySet):
+    """
+    Массовые операции, минуя сигналы, все равно сбрасывают
+    кэш данных затронутых пользователей и обновляют updated_at
+    (auto_now при update()/bulk_update() не срабатывает)
+    """
+
+    def update(self, **kwargs):
+        kwargs.setdefault('updated_at', timezone.now())
+        user_ids = set(self.values_list('user_id', flat=True).distinct())
+        rows = super().update(**kwargs)
+        bump_data_version(*user_ids)
+        return rows
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        bump_data_version(*{obj.user_id for obj in objs})
+        return objs
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        now = timezone.now()
+        for obj in objs:
+            obj.updated_at = now
+        fields = set(fields) | {'updated_at'}
+        rows = super().bulk_update(objs, fields, *args, **kwargs)
+        bump_data_version(*{obj.user_id for obj in objs})
+        return rows
+
+
+class CategoryQuerySet(UserDataQuerySet):
+    def with_usage(self, currency=DEFAULT_CURRENCY):
+        """
+        Число транзакций, суммы доходов и расходов в валюте currency
+        и дата последней транзакции по каждой категории — одним запросом
+        с GROUP BY по дневным сводкам (DailyRollup): они короче таблицы
+        операций и учитывают архивные операции (archive.py). Сводки
+        в других валютах переводятся по курсу дня, как в статистике
+        """
+        # currency.py импортирует модели
+        from .currency import converted
+
+        amount = converted('total', currency, prefix='dailyrollup__')
+
+        def total(kind):
+            return Round(
+                models.Sum(amount, filter=models.Q(dailyrollup__type=kind), default=0),
+                2,
+                output_field=models.DecimalField(max_digits=14, decimal_places=2),
+            )
+
+        return self.annotate(
+            transaction_count=models.Sum('dailyrollup__count', default=0),
+            total_income=total(Transaction.INCOME),
+            total_expense=total(Transaction.EXPENSE),
+            last_used=models.Max('dailyrollup__date'),
+        )
+
 
 class Category(models.Model):
     name = models.CharField(max_length=100)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = CategoryQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'updated_at'], name='category_user_updated_idx'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class Profile(models.Model):
+    """Настройки пользователя: базовая валюта статистики"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='finance_profile')
+    base_currency = models.CharField(max_length=3, choices=CURRENCY_CHOICES, default=DEFAULT_CURRENCY)
+
+    def __str__(self):
+        return f'{self.user} — {self.base_currency}'
+
+
+class ExchangeRate(models.Model):
+    """
+    Курс на дату: сколько рублей стоит единица валюты. Загружается
+    из CSV (manage.py import_rates) с заполнением пропущенных дней,
+    поэтому курс операции находится соединением по (валюта, дата)
+    """
+    currency = models.CharField(max_length=3, choices=CURRENCY_CHOICES)
+    date = models.DateField()
+    rate = models.DecimalField(max_digits=18, decimal_places=8)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['currency', 'date'], name='exchange_rate_currency_date_uniq'),
+        ]
+
+    def __str__(self):
+        return f'{self.date} {self.currency} — {self.rate}'
+
+
+def rate_relation():
+    """
+    Курс валюты строки на ее дату: соединение по (currency, date) без
+    отдельного столбца (LEFT JOIN; для рублей и дат без курса — NULL)
+    """
+    return models.ForeignObject(
+        ExchangeRate,
+        on_delete=models.DO_NOTHING,
+        from_fields=['currency', 'date'],
+        to_fields=['currency', 'date'],
+        null=True,
+        related_name='+',
+    )
+
+
+class Account(models.Model):
+    """
+    Счет (наличные, карта, накопительный). balance — остаток с учетом
+    всех операций счета: обновляется вместе со сводками (rollups.py)
+    через F(), поэтому save() его никогда не перезаписывает
+    """
+    CASH = 'cash'
+    CARD = 'card'
+    SAVINGS = 'savings'
+
+    KIND_CHOICES = [
+        (CASH, 'Наличные'),
+        (CARD, 'Карта'),
+        (SAVINGS, 'Накопительный'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    name = models.CharField(max_length=100)
+    kind = models.CharField(max_length=7, choices=KIND_CHOICES, default=CARD)
+    currency = models.CharField(max_length=3, choices=CURRENCY_CHOICES, default=DEFAULT_CURRENCY)
+    opening_balance = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    balance = models.DecimalField(max_digits=14, decimal_places=2, default=0, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            self.balance = self.opening_balance
+            super().save(*args, **kwargs)
+            return
+
+        update_fields = kwargs.pop('update_fields', None) or [
+            field.name for field in self._meta.concrete_fields if not field.primary_key
+        ]
+        with db_transaction.atomic():
+            previous = Account.objects.select_for_update().filter(pk=self.pk).values_list(
+                'opening_balance', flat=True
+            ).first()
+            super().save(*args, update_fields=[name for name in update_fields if name != 'balance'], **kwargs)
+            # Изменение начального остатка сдвигает текущий на разницу
+            if previous is not None and previous != self.opening_balance:
+                Account.objects.filter(pk=self.pk).update(
+                    balance=models.F('balance') + (self.opening_balance - previous)
+                )
+        self.refresh_from_db(fields=['balance'])
 
     def __str__(self):
         return self.name
@@ -22,13 +203,370 @@ class Transaction(models.Model):
 
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True)
+    account = models.ForeignKey(Account, on_delete=models.SET_NULL, null=True, blank=True)
     type = models.CharField(max_length=7, choices=TYPE_CHOICES)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
+    currency = models.CharField(max_length=3, choices=CURRENCY_CHOICES, default=DEFAULT_CURRENCY)
     description = models.TextField(blank=True)
     date = models.DateField(default=date.today)
+    rate = rate_relation()
+    recurring_rule = models.ForeignKey(
+        'RecurringRule', on_delete=models.SET_NULL, null=True, blank=True, related_name='transactions',
+    )
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = UserDataQuerySet.as_manager()
+
+    class Meta:
+        # Индексы под реальные запросы: список, API и статистика всегда
+        # фильтруют по пользователю, затем по типу/категории и периоду
+        indexes = [
+            models.Index(fields=['user', 'date'], name='transaction_user_date_idx'),
+            models.Index(fields=['user', 'type', 'date'], name='transaction_user_type_date_idx'),
+            models.Index(fields=['user', 'category', 'date'], name='transaction_user_cat_date_idx'),
+            models.Index(fields=['user', 'amount'], name='transaction_user_amount_idx'),
+            models.Index(fields=['user', 'updated_at'], name='transaction_user_updated_idx'),
+            # Остаток на дату и нарастающий остаток: операции счета по датам
+            models.Index(fields=['account', 'date', 'id'], name='transaction_account_date_idx'),
+        ]
+        constraints = [
+            # Не больше одной операции правила на дату: повторный запуск
+            # планировщика не создаст дубликатов. Частичный индекс только
+            # по операциям правил; в SQLite он создается без пересоздания
+            # таблицы (и ее FTS-триггеров)
+            models.UniqueConstraint(
+                fields=['recurring_rule', 'date'],
+                condition=models.Q(recurring_rule__isnull=False),
+                name='transaction_rule_date_uniq',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.type} — {self.amount}'
+
+
+class ArchivedTransaction(models.Model):
+    """
+    Операция старше горизонта архива (archive.py): те же столбцы и id,
+    что в Transaction, но только индексы для чтения по периоду.
+    Переносится командой manage.py archive_transactions, доступна
+    только для чтения; сводки и остатки ее уже учитывают
+    """
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, related_name='+')
+    account = models.ForeignKey(Account, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    type = models.CharField(max_length=7, choices=Transaction.TYPE_CHOICES)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    currency = models.CharField(max_length=3, choices=CURRENCY_CHOICES, default=DEFAULT_CURRENCY)
+    description = models.TextField(blank=True)
+    date = models.DateField()
+    recurring_rule = models.ForeignKey(
+        'RecurringRule', on_delete=models.SET_NULL, null=True, blank=True, related_name='+',
+    )
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'date'], name='archivedtx_user_date_idx'),
+            models.Index(fields=['account', 'date', 'id'], name='archivedtx_account_date_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.type} — {self.amount} ({self.date})'
+
+
+class LedgerTransaction(models.Model):
+    """
+    Все операции — горячие и архивные — через представление БД
+    transactions_ledger (UNION ALL двух таблиц, миграция 0011).
+    Условия запроса СУБД переносит в обе ветви, поэтому каждая читается
+    по своим индексам. Только для чтения; archived — строка из архива
+    """
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    category = models.ForeignKey(
+        Category, on_delete=models.DO_NOTHING, null=True, db_constraint=False, related_name='+',
+    )
+    account = models.ForeignKey(
+        Account, on_delete=models.DO_NOTHING, null=True, db_constraint=False, related_name='+',
+    )
+    type = models.CharField(max_length=7, choices=Transaction.TYPE_CHOICES)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    currency = models.CharField(max_length=3, choices=CURRENCY_CHOICES)
+    description = models.TextField()
+    date = models.DateField()
+    rate = rate_relation()
+    recurring_rule = models.ForeignKey(
+        'RecurringRule', on_delete=models.DO_NOTHING, null=True, db_constraint=False, related_name='+',
+    )
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived = models.BooleanField()
+
+    class Meta:
+        managed = False
+        db_table = 'transactions_ledger'
 
     def __str__(self):
         return f'{self.type} — {self.amount}'
 
 
+class RecurringRule(models.Model):
+    """
+    Повторяющаяся операция (зарплата, аренда, подписка): каждые interval
+    дней/недель/месяцев/лет с start_date до end_date.
+    next_date — водяной знак: первая дата, по которой операция еще не
+    создана (см. recurring.py, manage.py materialize_recurring)
+    """
+    DAILY = 'daily'
+    WEEKLY = 'weekly'
+    MONTHLY = 'monthly'
+    YEARLY = 'yearly'
+
+    FREQUENCY_CHOICES = [
+        (DAILY, 'Ежедневно'),
+        (WEEKLY, 'Еженедельно'),
+        (MONTHLY, 'Ежемесячно'),
+        (YEARLY, 'Ежегодно'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True)
+    account = models.ForeignKey(Account, on_delete=models.SET_NULL, null=True, blank=True)
+    type = models.CharField(max_length=7, choices=Transaction.TYPE_CHOICES)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    currency = models.CharField(max_length=3, choices=CURRENCY_CHOICES, default=DEFAULT_CURRENCY)
+    description = models.TextField(blank=True)
+    frequency = models.CharField(max_length=7, choices=FREQUENCY_CHOICES, default=MONTHLY)
+    interval = models.PositiveSmallIntegerField(default=1)
+    start_date = models.DateField(default=date.today)
+    end_date = models.DateField(null=True, blank=True)
+    next_date = models.DateField()
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Выборка правил, по которым пора создавать операции
+            models.Index(fields=['is_active', 'next_date'], name='recurring_active_next_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(condition=models.Q(interval__gte=1), name='recurring_interval_positive'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.next_date is None:
+            self.next_date = self.start_date
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f'{self.get_frequency_display()} {self.type} — {self.amount}'
+
+
+class Tombstone(models.Model):
+    """Отметка об удалении объекта — для синхронизации клиентов"""
+    TRANSACTION = 'transaction'
+    CATEGORY = 'category'
+
+    MODEL_CHOICES = [
+        (TRANSACTION, 'Транзакция'),
+        (CATEGORY, 'Категория'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    model = models.CharField(max_length=11, choices=MODEL_CHOICES)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'deleted_at'], name='tombstone_user_deleted_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.model} #{self.object_id}'
+
+
+class DailyRollup(models.Model):
+    """Итоги за день по пользователю, категории, типу и валюте"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True)
+    type = models.CharField(max_length=7, choices=Transaction.TYPE_CHOICES)
+    currency = models.CharField(max_length=3, choices=CURRENCY_CHOICES, default=DEFAULT_CURRENCY)
+    date = models.DateField()
+    rate = rate_relation()
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # Статистика читает сводки в базовой валюте и отдельно —
+            # в остальных валютах (их чаще всего нет)
+            models.Index(fields=['user', 'currency', 'date'], name='dailyrollup_user_cur_date_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.date} {self.type} — {self.total}'
+
+
+class MonthlyRollup(models.Model):
+    """
+    Итоги за месяц по пользователю, категории, типу и валюте.
+    Дополнительно разбиты по дню недели (1 — воскресенье, как ExtractWeekDay),
+    чтобы статистика по дням недели тоже читалась из сводки.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True)
+    type = models.CharField(max_length=7, choices=Transaction.TYPE_CHOICES)
+    currency = models.CharField(max_length=3, choices=CURRENCY_CHOICES, default=DEFAULT_CURRENCY)
+    month = models.DateField()
+    weekday = models.PositiveSmallIntegerField()
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'month'], name='monthlyrollup_user_month_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.month:%Y-%m} {self.type} — {self.total}'
+
+
+class AccountRollup(models.Model):
+    """
+    Итог операций счета за день со знаком (доход — плюс, расход — минус).
+    Остаток счета на конец дня — текущий остаток минус итоги более поздних
+    дней (ledger.py)
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    account = models.ForeignKey(Account, on_delete=models.CASCADE)
+    date = models.DateField()
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['account', 'date'], name='accountrollup_account_date_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.date} {self.account_id} — {self.total}'
+
+
+class SpendingRollup(models.Model):
+    """
+    Расходы категории за месяц в одной валюте — для бюджетов (budgets.py):
+    статус бюджета читается по индексу, без суммирования операций месяца
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    category = models.ForeignKey(Category, on_delete=models.CASCADE)
+    currency = models.CharField(max_length=3, choices=CURRENCY_CHOICES, default=DEFAULT_CURRENCY)
+    month = models.DateField()
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'month'], name='spendingrollup_user_month_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.month:%Y-%m} {self.category_id} — {self.total}'
+
+
+class Budget(models.Model):
+    """
+    Месячный лимит расходов по категории. Потраченное берется из
+    SpendingRollup, уровень оповещения пересчитывается пакетно
+    (manage.py check_budgets)
+    """
+    OK = 'ok'
+    WARNING = 'warning'
+    EXCEEDED = 'exceeded'
+
+    ALERT_CHOICES = [
+        (OK, 'В пределах'),
+        (WARNING, 'Прогноз выше лимита'),
+        (EXCEEDED, 'Превышен'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    category = models.ForeignKey(Category, on_delete=models.CASCADE)
+    limit = models.DecimalField(max_digits=14, decimal_places=2)
+    currency = models.CharField(max_length=3, choices=CURRENCY_CHOICES, default=DEFAULT_CURRENCY)
+    # Результат последней проверки: уровень и месяц, к которому он относится
+    alert = models.CharField(max_length=8, choices=ALERT_CHOICES, default=OK)
+    alert_month = models.DateField(null=True, blank=True)
+    alerted_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'category'], name='budget_user_category_uniq'),
+            models.CheckConstraint(condition=models.Q(limit__gt=0), name='budget_limit_positive'),
+        ]
+
+    def __str__(self):
+        return f'{self.category} — {self.limit} {self.currency}'
+
+
+def job_storage():
+    """Хранилище файлов результатов фоновых задач (JOBS['FILES_ROOT'])"""
+    return FileSystemStorage(location=settings.JOBS['FILES_ROOT'])
+
+
+class Job(models.Model):
+    """
+    Фоновая задача (тяжелая статистика, большая выгрузка).
+    Очередь — сама таблица: воркер (manage.py run_jobs) забирает задачи
+    в статусе pending
+    """
+    STATISTICS = 'statistics'
+    EXPORT = 'export'
+
+    KIND_CHOICES = [
+        (STATISTICS, 'Статистика'),
+        (EXPORT, 'Выгрузка'),
+    ]
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    STATUS_CHOICES = [
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Готово'),
+        (FAILED, 'Ошибка'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    params = models.JSONField(default=dict)
+    status = models.CharField(max_length=7, choices=STATUS_CHOICES, default=PENDING)
+    progress = models.PositiveSmallIntegerField(default=0)
+    result = models.JSONField(null=True, blank=True)
+    file = models.FileField(storage=job_storage, upload_to='%Y/%m/%d', blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    worker = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='job_status_created_idx'),
+            models.Index(fields=['user', 'created_at'], name='job_user_created_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.kind} #{self.pk} ({self.status})'
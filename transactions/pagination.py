@@ -0,0 +1,190 @@
+"""
+Keyset (cursor) пагинация транзакций.
+
+Страница выбирается условием WHERE по (поле сортировки, id) вместо OFFSET,
+а COUNT(*) не выполняется вовсе, поэтому время ответа не зависит
+от глубины прокрутки.
+"""
+import base64
+import binascii
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Q
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+# Поддерживаемые сортировки и их однозначные ключи (с id для ничьих)
+ORDERINGS = {
+    '-date': ('-date', '-id'),
+    'date': ('date', 'id'),
+    '-amount': ('-amount', '-id'),
+    'amount': ('amount', 'id'),
+}
+DEFAULT_ORDERING = '-date'
+
+CURSOR_PARSERS = {
+    'date': parse_date,
+    'amount': Decimal,
+}
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def get_ordering(value):
+    """Проверенная сортировка (неизвестные значения — сортировка по умолчанию)"""
+    return value if value in ORDERINGS else DEFAULT_ORDERING
+
+
+def encode_cursor(ordering, item):
+    field = ORDERINGS[ordering][0].lstrip('-')
+    value = item[field] if isinstance(item, dict) else getattr(item, field)
+    pk = item['id'] if isinstance(item, dict) else item.pk
+    payload = json.dumps({'o': ordering, 'v': str(value), 'id': pk})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(ordering, cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if payload['o'] != ordering:
+            raise InvalidCursor('Курсор получен для другой сортировки')
+        field = ORDERINGS[ordering][0].lstrip('-')
+        value = CURSOR_PARSERS[field](payload['v'])
+        pk = int(payload['id'])
+    except (binascii.Error, ValueError, KeyError, TypeError, InvalidOperation) as e:
+        raise InvalidCursor(str(e))
+    # NaN и бесконечность Decimal разбирает, но в БД их не бывает
+    if value is None or (isinstance(value, Decimal) and not value.is_finite()):
+        raise InvalidCursor('Некорректное значение курсора')
+    return value, pk
+
+
+def keyset_queryset(queryset, ordering, cursor=None, page_size=20):
+    """Выборка страницы после курсора (на одну запись больше размера страницы)"""
+    ordering = get_ordering(ordering)
+    field, pk_field = ORDERINGS[ordering]
+    queryset = queryset.order_by(field, pk_field)
+
+    if cursor:
+        value, pk = decode_cursor(ordering, cursor)
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        queryset = queryset.filter(
+            Q(**{f'{name}__{lookup}': value}) |
+            Q(**{name: value, f'id__{lookup}': pk})
+        )
+
+    # Берем на одну запись больше, чтобы узнать, есть ли следующая страница
+    return queryset[:page_size + 1]
+
+
+def finish_page(items, ordering, page_size):
+    """(объекты страницы, курсор следующей страницы или None)"""
+    ordering = get_ordering(ordering)
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        next_cursor = encode_cursor(ordering, items[-1])
+    return items, next_cursor
+
+
+def keyset_page(queryset, ordering, cursor=None, page_size=20):
+    """
+    Одна страница выборки после курсора.
+    Возвращает (объекты страницы, курсор следующей страницы или None).
+    """
+    items = list(keyset_queryset(queryset, ordering, cursor, page_size))
+    return finish_page(items, ordering, page_size)
+
+
+async def akeyset_page(queryset, ordering, cursor=None, page_size=20):
+    """keyset_page для async-представлений"""
+    items = [item async for item in keyset_queryset(queryset, ordering, cursor, page_size)]
+    return finish_page(items, ordering, page_size)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Курсорная пагинация для API (включается параметром ?pagination=cursor
+    или наличием ?cursor=). Без них список отдается как раньше — целиком.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = 50
+    max_page_size = 500
+
+    @staticmethod
+    def get_params(request):
+        # Запрос DRF или обычный HttpRequest (async-представления)
+        return getattr(request, 'query_params', request.GET)
+
+    def is_enabled(self, request):
+        params = self.get_params(request)
+        return params.get('pagination') == 'cursor' or self.cursor_query_param in params
+
+    def get_page_size(self, request):
+        try:
+            size = int(self.get_params(request).get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.is_enabled(request):
+            return None
+        self.request = request
+        self.ordering = get_ordering(request.query_params.get('ordering'))
+        # Итоги по всей выборке, если представление умеет их считать
+        get_totals = getattr(view, 'get_totals', None)
+        self.totals = get_totals(queryset) if get_totals else None
+        try:
+            items, self.next_cursor = keyset_page(
+                queryset,
+                self.ordering,
+                request.query_params.get(self.cursor_query_param),
+                self.get_page_size(request),
+            )
+        except InvalidCursor:
+            raise NotFound('Некорректный курсор')
+        return items
+
+    def get_next_link(self):
+        if not self.next_cursor:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, 'pagination', 'cursor')
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        response = {'next': self.get_next_link()}
+        if self.totals is not None:
+            response['totals'] = self.totals
+        response['results'] = data
+        return Response(response)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'totals': {
+                    'type': 'object',
+                    'properties': {
+                        'count': {'type': 'integer'},
+                        'total_income': {'type': 'number'},
+                        'total_expense': {'type': 'number'},
+                        'balance': {'type': 'number'},
+                    },
+                },
+                'results': schema,
+            },
+        }
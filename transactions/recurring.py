@@ -0,0 +1,157 @@
+"""
+Создание операций по повторяющимся правилам (RecurringRule).
+
+У каждого правила есть водяной знак next_date — первая дата, по которой
+операция еще не создана. Планировщик (manage.py materialize_recurring)
+выбирает правила с next_date <= даты запуска пачками, создает все
+пропущенные операции пачки одним bulk_create и сдвигает next_date
+в той же транзакции БД. Поэтому повторный запуск ничего не дублирует,
+а уникальный индекс (правило, дата) защищает от двух одновременных
+запусков.
+"""
+import calendar
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction as db_transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import RecurringRule, Transaction
+from .rollups import apply_transactions
+
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+
+
+def add_months(day, months, anchor_day):
+    """Дата через months месяцев; день месяца — anchor_day или последний"""
+    month_index = day.year * 12 + day.month - 1 + months
+    year, month = divmod(month_index, 12)
+    month += 1
+    return day.replace(year=year, month=month, day=min(anchor_day, calendar.monthrange(year, month)[1]))
+
+
+def next_occurrence(rule, day):
+    """Следующая дата правила после day (day — одна из дат правила)"""
+    if rule.frequency == RecurringRule.DAILY:
+        return day + timedelta(days=rule.interval)
+    if rule.frequency == RecurringRule.WEEKLY:
+        return day + timedelta(weeks=rule.interval)
+    months = rule.interval * (12 if rule.frequency == RecurringRule.YEARLY else 1)
+    # День месяца берется из start_date: 31-е в феврале — 28/29-е,
+    # а в марте снова 31-е
+    return add_months(day, months, rule.start_date.day)
+
+
+def occurrences(rule, until):
+    """Даты правила от next_date по until (и end_date) и новый водяной знак"""
+    if rule.end_date is not None:
+        until = min(until, rule.end_date)
+    dates = []
+    day = rule.next_date
+    while day <= until:
+        dates.append(day)
+        day = next_occurrence(rule, day)
+    return dates, day
+
+
+def rule_from_transaction(transaction, frequency, interval=1):
+    """
+    Новое правило по образцу операции: операция — его первая дата,
+    следующая создастся по расписанию
+    """
+    rule = RecurringRule(
+        user=transaction.user,
+        category=transaction.category,
+        account=transaction.account,
+        type=transaction.type,
+        amount=transaction.amount,
+        currency=transaction.currency,
+        description=transaction.description,
+        frequency=frequency,
+        interval=interval,
+        start_date=transaction.date,
+    )
+    rule.next_date = next_occurrence(rule, rule.start_date)
+    rule.save()
+    return rule
+
+
+def due_rules(as_of):
+    """Правила, по которым на дату as_of есть несозданные операции"""
+    return RecurringRule.objects.filter(
+        is_active=True,
+        next_date__lte=as_of,
+    ).filter(
+        Q(end_date__isnull=True) | Q(next_date__lte=F('end_date'))
+    )
+
+
+def _materialize_batch(rules, as_of):
+    """Операции пачки правил и сдвиг их водяных знаков (одна транзакция БД)"""
+    transactions = []
+    watermarks = defaultdict(list)
+    for rule in rules:
+        dates, next_date = occurrences(rule, as_of)
+        transactions.extend(
+            Transaction(
+                user_id=rule.user_id,
+                category_id=rule.category_id,
+                account_id=rule.account_id,
+                type=rule.type,
+                amount=rule.amount,
+                currency=rule.currency,
+                description=rule.description,
+                date=day,
+                recurring_rule=rule,
+            )
+            for day in dates
+        )
+        watermarks[next_date].append(rule.pk)
+
+    with db_transaction.atomic():
+        Transaction.objects.bulk_create(transactions, batch_size=BATCH_SIZE)
+        apply_transactions(transactions)
+        # Правила с одинаковым новым next_date (например, все ежемесячные
+        # на 1-е число) сдвигаются одним UPDATE
+        now = timezone.now()
+        for next_date, pks in watermarks.items():
+            RecurringRule.objects.filter(pk__in=pks).update(next_date=next_date, updated_at=now)
+    return len(transactions)
+
+
+def materialize_rules(rules=None, as_of=None, batch_size=BATCH_SIZE):
+    """
+    Создать все операции по правилам (по умолчанию — по всем) на дату
+    as_of (по умолчанию сегодня). Возвращает число обработанных правил,
+    созданных операций и правил, пропущенных из-за параллельного запуска
+    """
+    as_of = as_of or timezone.localdate()
+    due = due_rules(as_of)
+    if rules is not None:
+        due = due.filter(pk__in=rules.values('pk'))
+
+    report = {'rules': 0, 'transactions': 0, 'conflicts': 0}
+    # Пачки идут по (пользователь, id): правила пользователя попадают
+    # в одну пачку, и строки сводок каждой пачки в основном новые,
+    # а не обновляются заново каждой следующей пачкой
+    last = Q()
+    while True:
+        batch = list(due.filter(last).order_by('user_id', 'pk')[:batch_size])
+        if not batch:
+            return report
+        last_user_id, last_pk = batch[-1].user_id, batch[-1].pk
+        last = Q(user_id__gt=last_user_id) | Q(user_id=last_user_id, pk__gt=last_pk)
+        try:
+            report['transactions'] += _materialize_batch(batch, as_of)
+        except IntegrityError:
+            # Операции этих правил уже создал параллельный запуск:
+            # пачка откатывается целиком, водяные знаки он же и сдвинул
+            logger.warning('Пропущено %s правил: операции уже созданы параллельным запуском', len(batch))
+            report['conflicts'] += len(batch)
+            continue
+        report['rules'] += len(batch)
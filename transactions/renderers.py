@@ -0,0 +1,48 @@
+"""
+JSON для API на orjson (выбирается в settings.API_JSON_BACKEND).
+
+Вывод совпадает с JSONRenderer DRF: UTF-8 без экранирования,
+U+2028/U+2029 экранируются. Даты и время и типы, которых orjson не знает
+(Decimal, ленивые строки, QuerySet и т. п.), преобразуются кодировщиком
+DRF (у него время — с миллисекундами и суффиксом Z). Сериализаторы
+отдают строки и числа, поэтому в горячем пути работает только orjson.
+Модуль импортируется, только если выбран orjson.
+"""
+import orjson
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+_encoder = JSONEncoder()
+
+
+class ORJSONRenderer(BaseRenderer):
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        options = OPTIONS
+        # ?format=json с отступами (как у JSONRenderer: indent в Accept)
+        if accepted_media_type and 'indent=' in accepted_media_type:
+            options |= orjson.OPT_INDENT_2
+        content = orjson.dumps(data, default=_encoder.default, option=options)
+        # Как JSONRenderer: символы-разделители строк ломают JSONP и <script>
+        return content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class ORJSONParser(BaseParser):
+    media_type = 'application/json'
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as error:
+            raise ParseError(f'JSON parse error - {error}')
@@ -0,0 +1,367 @@
+"""
+Предрасчитанные дневные и месячные сводки по транзакциям,
+дневные итоги счетов (AccountRollup), остатки счетов (Account.balance)
+и месячные расходы категорий для бюджетов (SpendingRollup).
+
+Сводки и остатки обновляются инкрементально при каждой записи транзакции
+(см. signals.py) и могут быть полностью пересчитаны командой
+`manage.py rebuild_rollups`.
+"""
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction as db_transaction
+from django.db.models import (
+    Case, Count, DecimalField, F, IntegerField, OuterRef, Q, Subquery, Sum, Value, When,
+)
+from django.db.models.functions import Coalesce, ExtractWeekDay, TruncMonth
+from django.utils.dateparse import parse_date
+
+from .currency import CURRENCIES, converted
+from .models import (
+    DEFAULT_CURRENCY, Account, AccountRollup, DailyRollup, LedgerTransaction, MonthlyRollup, SpendingRollup,
+    Transaction,
+)
+
+
+ROLLUP_FIELDS = ('user_id', 'category_id', 'account_id', 'type', 'currency', 'date', 'amount')
+BATCH_SIZE = 1000
+
+
+def weekday_of(day):
+    """Номер дня недели в нумерации ExtractWeekDay (1 — воскресенье)"""
+    return day.isoweekday() % 7 + 1
+
+
+def _month_start(day):
+    return day.replace(day=1)
+
+
+def _next_month(day):
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def signed_amount(transaction_type, amount):
+    """Влияние операции на остаток счета: доход — плюс, расход — минус"""
+    return amount if transaction_type == Transaction.INCOME else -amount
+
+
+def signed_amount_expression():
+    """signed_amount в SQL"""
+    return Case(
+        When(type=Transaction.INCOME, then=F('amount')),
+        default=-F('amount'),
+        output_field=DecimalField(max_digits=14, decimal_places=2),
+    )
+
+
+def _empty_deltas():
+    return tuple(defaultdict(lambda: [Decimal('0'), 0]) for _ in range(4))
+
+
+def collect_deltas(rows, sign=1):
+    """
+    Сворачивание транзакций в изменения сводок:
+    (daily, monthly, accounts, spending).
+    rows — объекты Transaction или словари с полями ROLLUP_FIELDS.
+    """
+    daily, monthly, accounts, spending = _empty_deltas()
+    for row in rows:
+        if not isinstance(row, dict):
+            row = {field: getattr(row, field) for field in ROLLUP_FIELDS}
+        day = row['date']
+        if isinstance(day, str):
+            day = parse_date(day)
+        amount = Decimal(str(row['amount'])) * sign
+        daily_key = (row['user_id'], row['category_id'], row['type'], row['currency'], day)
+        monthly_key = (row['user_id'], row['category_id'], row['type'], row['currency'],
+                       _month_start(day), weekday_of(day))
+        daily[daily_key][0] += amount
+        daily[daily_key][1] += sign
+        monthly[monthly_key][0] += amount
+        monthly[monthly_key][1] += sign
+        if row['account_id'] is not None:
+            account_key = (row['user_id'], row['account_id'], day)
+            accounts[account_key][0] += signed_amount(row['type'], amount)
+            accounts[account_key][1] += sign
+        if row['type'] == Transaction.EXPENSE and row['category_id'] is not None:
+            spending_key = (row['user_id'], row['category_id'], row['currency'], _month_start(day))
+            spending[spending_key][0] += amount
+            spending[spending_key][1] += sign
+    return daily, monthly, accounts, spending
+
+
+def _apply_delta(model, key, total, count):
+    """Изменение одной строки сводки (создается при отсутствии)"""
+    rows = model.objects.filter(**key)
+    # Обновляем ровно одну строку: после удаления категории строки
+    # с category=NULL могут совпадать по ключу
+    updated = model.objects.filter(
+        pk__in=Subquery(rows.values('pk')[:1])
+    ).update(total=F('total') + total, count=F('count') + count)
+    if not updated and count > 0:
+        model.objects.create(total=total, count=count, **key)
+    elif count < 0:
+        rows.filter(count__lte=0).delete()
+
+
+# Накопленные изменения внутри defer_rollups()
+_pending = ContextVar('rollups_pending', default=None)
+
+
+@contextmanager
+def defer_rollups():
+    """
+    Откладывает запись сводок до выхода из блока: изменения от сигналов
+    и явных вызовов складываются по ключам и применяются одним проходом
+    """
+    if _pending.get() is not None:
+        yield
+        return
+    pending = _empty_deltas()
+    token = _pending.set(pending)
+    try:
+        yield
+    finally:
+        _pending.reset(token)
+    apply_deltas(*pending)
+
+
+def _merge(target, source):
+    for key, (total, count) in source.items():
+        target[key][0] += total
+        target[key][1] += count
+
+
+def merge_deltas(target, source):
+    """Добавить изменения source (daily, monthly, accounts, spending) к target"""
+    for target_deltas, source_deltas in zip(target, source):
+        _merge(target_deltas, source_deltas)
+
+
+DAILY_KEY = ('user_id', 'category_id', 'type', 'currency', 'date')
+MONTHLY_KEY = ('user_id', 'category_id', 'type', 'currency', 'month', 'weekday')
+ACCOUNT_KEY = ('user_id', 'account_id', 'date')
+SPENDING_KEY = ('user_id', 'category_id', 'currency', 'month')
+# До скольких ключей изменения применяются построчно
+SMALL_DELTA = 4
+
+
+def _apply_bulk(model, key_fields, date_field, deltas):
+    """
+    Изменения по многим ключам за фиксированное число запросов:
+    поиск существующих строк, один UPDATE с CASE, bulk_create новых
+    """
+    existing = {}
+    rows = model.objects.filter(**{
+        'user_id__in': {key[0] for key in deltas},
+        f'{date_field}__in': {key[key_fields.index(date_field)] for key in deltas},
+    }).values_list('pk', *key_fields)
+    for pk, *key in rows:
+        existing.setdefault(tuple(key), pk)
+
+    updates = [(existing[key], delta) for key, delta in deltas.items() if key in existing]
+    for start in range(0, len(updates), BATCH_SIZE):
+        chunk = updates[start:start + BATCH_SIZE]
+        model.objects.filter(pk__in=[pk for pk, _ in chunk]).update(
+            total=F('total') + Case(
+                *[When(pk=pk, then=Value(total)) for pk, (total, _) in chunk],
+                output_field=DecimalField(max_digits=14, decimal_places=2),
+            ),
+            count=F('count') + Case(
+                *[When(pk=pk, then=Value(count)) for pk, (_, count) in chunk],
+                output_field=IntegerField(),
+            ),
+        )
+
+    model.objects.bulk_create([
+        model(total=total, count=count, **dict(zip(key_fields, key)))
+        for key, (total, count) in deltas.items()
+        if key not in existing and count > 0
+    ], batch_size=BATCH_SIZE)
+
+    decreased = [pk for pk, (_, count) in updates if count < 0]
+    if decreased:
+        model.objects.filter(pk__in=decreased, count__lte=0).delete()
+
+
+def _apply_model_deltas(model, key_fields, date_field, deltas):
+    deltas = {key: delta for key, delta in deltas.items() if delta[0] or delta[1]}
+    if len(deltas) > SMALL_DELTA:
+        _apply_bulk(model, key_fields, date_field, deltas)
+        return
+    for key, (total, count) in deltas.items():
+        _apply_delta(model, dict(zip(key_fields, key)), total, count)
+
+
+def _apply_account_deltas(accounts):
+    """Дневные итоги счетов и остатки: один UPDATE на каждое различное изменение остатка"""
+    _apply_model_deltas(AccountRollup, ACCOUNT_KEY, 'date', accounts)
+    balances = defaultdict(Decimal)
+    for (_, account_id, _), (total, _) in accounts.items():
+        balances[account_id] += total
+    by_delta = defaultdict(list)
+    for account_id, delta in balances.items():
+        if delta:
+            by_delta[delta].append(account_id)
+    for delta, account_ids in by_delta.items():
+        Account.objects.filter(pk__in=account_ids).update(balance=F('balance') + delta)
+
+
+def apply_deltas(daily, monthly, accounts, spending):
+    pending = _pending.get()
+    if pending is not None:
+        merge_deltas(pending, (daily, monthly, accounts, spending))
+        return
+
+    with db_transaction.atomic():
+        _apply_model_deltas(DailyRollup, DAILY_KEY, 'date', daily)
+        _apply_model_deltas(MonthlyRollup, MONTHLY_KEY, 'month', monthly)
+        _apply_account_deltas(accounts)
+        _apply_model_deltas(SpendingRollup, SPENDING_KEY, 'month', spending)
+
+
+def apply_transactions(rows, sign=1):
+    """Учесть (sign=1) или вычесть (sign=-1) транзакции в сводках"""
+    apply_deltas(*collect_deltas(rows, sign))
+
+
+def rebuild_rollups(user=None):
+    """Полный пересчет сводок по горячим и архивным операциям (для одного пользователя или для всех)"""
+    transactions = LedgerTransaction.objects.all()
+    daily_rollups = DailyRollup.objects.all()
+    monthly_rollups = MonthlyRollup.objects.all()
+    account_rollups = AccountRollup.objects.all()
+    spending_rollups = SpendingRollup.objects.all()
+    if user is not None:
+        transactions = transactions.filter(user=user)
+        daily_rollups = daily_rollups.filter(user=user)
+        monthly_rollups = monthly_rollups.filter(user=user)
+        account_rollups = account_rollups.filter(user=user)
+        spending_rollups = spending_rollups.filter(user=user)
+
+    daily = transactions.values(
+        'user_id', 'category_id', 'type', 'currency', 'date'
+    ).annotate(total=Sum('amount'), count=Count('id')).order_by()
+    monthly = transactions.annotate(
+        month=TruncMonth('date'),
+        weekday=ExtractWeekDay('date'),
+    ).values(
+        'user_id', 'category_id', 'type', 'currency', 'month', 'weekday'
+    ).annotate(total=Sum('amount'), count=Count('id')).order_by()
+    account_daily = transactions.filter(account__isnull=False).values(
+        'user_id', 'account_id', 'date'
+    ).annotate(total=Sum(signed_amount_expression()), count=Count('id')).order_by()
+    spending = transactions.filter(type=Transaction.EXPENSE, category__isnull=False).annotate(
+        month=TruncMonth('date'),
+    ).values(
+        'user_id', 'category_id', 'currency', 'month'
+    ).annotate(total=Sum('amount'), count=Count('id')).order_by()
+
+    with db_transaction.atomic():
+        daily_rollups.delete()
+        monthly_rollups.delete()
+        account_rollups.delete()
+        spending_rollups.delete()
+        created = _bulk_insert(DailyRollup, daily)
+        created += _bulk_insert(MonthlyRollup, monthly)
+        created += _bulk_insert(AccountRollup, account_daily)
+        created += _bulk_insert(SpendingRollup, spending)
+        rebuild_account_balances(user)
+    return created
+
+
+def rebuild_account_balances(user=None):
+    """Пересчет остатков счетов по их дневным итогам"""
+    accounts = Account.objects.all()
+    if user is not None:
+        accounts = accounts.filter(user=user)
+    return accounts.update(balance=F('opening_balance') + account_rollup_sum())
+
+
+def account_rollup_sum(**filters):
+    """Подзапрос: сумма дневных итогов счета OuterRef('pk') (с фильтрами по дате)"""
+    return Coalesce(Subquery(
+        AccountRollup.objects.filter(account=OuterRef('pk'), **filters).order_by().values(
+            'account'
+        ).annotate(total=Sum('total')).values('total'),
+        output_field=DecimalField(max_digits=14, decimal_places=2),
+    ), Value(Decimal('0')), output_field=DecimalField(max_digits=14, decimal_places=2))
+
+
+def _bulk_insert(model, rows):
+    batch = []
+    created = 0
+    for row in rows.iterator(chunk_size=BATCH_SIZE):
+        batch.append(model(**row))
+        if len(batch) >= BATCH_SIZE:
+            model.objects.bulk_create(batch)
+            created += len(batch)
+            batch = []
+    if batch:
+        model.objects.bulk_create(batch)
+        created += len(batch)
+    return created
+
+
+def _bucket_aggregates(total=F('total')):
+    income = Q(type=Transaction.INCOME)
+    expense = Q(type=Transaction.EXPENSE)
+    return {
+        'income': Sum(total, filter=income),
+        'expense': Sum(total, filter=expense),
+        'income_count': Sum('count', filter=income, default=0),
+        'expense_count': Sum('count', filter=expense, default=0),
+    }
+
+
+def rollup_buckets(user, date_from, date_to, currency=DEFAULT_CURRENCY):
+    """
+    Строки для statistics.summarize_buckets из сводок в валюте currency:
+    полные месяцы периода читаются из MonthlyRollup, края — из DailyRollup.
+    Строки в других валютах переводятся по курсу каждого дня, поэтому
+    читаются из DailyRollup за весь период (соединение с курсами
+    в том же запросе, см. currency.py)
+    """
+    first_month = date_from if date_from.day == 1 else _next_month(date_from)
+    last_day = _next_month(date_to) - timedelta(days=1)
+    end_month = _next_month(date_to) if date_to == last_day else _month_start(date_to)
+
+    daily_rollups = DailyRollup.objects.filter(user=user, date__range=[date_from, date_to])
+    buckets = list(_daily_buckets(
+        daily_rollups.filter(currency__in=[code for code in CURRENCIES if code != currency]),
+        converted('total', currency),
+    ))
+    daily_rollups = daily_rollups.filter(currency=currency)
+
+    if first_month >= end_month:
+        buckets.extend(_daily_buckets(daily_rollups))
+        return buckets
+
+    buckets.extend(MonthlyRollup.objects.filter(
+        user=user,
+        currency=currency,
+        month__gte=first_month,
+        month__lt=end_month,
+    ).values(
+        'category__name', 'month', 'weekday'
+    ).annotate(**_bucket_aggregates()).order_by())
+
+    edges = daily_rollups.filter(
+        Q(date__lt=first_month) | Q(date__gte=end_month)
+    )
+    if date_from < first_month or end_month <= date_to:
+        buckets.extend(_daily_buckets(edges))
+    return buckets
+
+
+def _daily_buckets(daily_rollups, total=F('total')):
+    return daily_rollups.annotate(
+        month=TruncMonth('date'),
+        weekday=ExtractWeekDay('date'),
+    ).values(
+        'category__name', 'month', 'weekday'
+    ).annotate(**_bucket_aggregates(total)).order_by()
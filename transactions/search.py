@@ -0,0 +1,75 @@
+"""
+Полнотекстовый поиск по описанию транзакций.
+
+В SQLite используется внешний FTS5-индекс transactions_transaction_fts
+(content=transactions_transaction), который поддерживают триггеры из
+миграции 0005. На других СУБД или без FTS5 — icontains; по архивным операциям
+(archive.py) — тоже icontains, их в индексе нет.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import LedgerTransaction
+
+
+FTS_TABLE = 'transactions_transaction_fts'
+
+# Слова запроса: буквы, цифры, подчеркивание
+TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def fts_enabled():
+    """Есть ли FTS-индекс в текущей БД (проверяется один раз на соединение)"""
+    if connection.vendor != 'sqlite':
+        return False
+    enabled = getattr(connection, '_transactions_fts_enabled', None)
+    if enabled is None:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE]
+            )
+            enabled = cursor.fetchone() is not None
+        connection._transactions_fts_enabled = enabled
+    return enabled
+
+
+def build_match_query(text):
+    """
+    Строка запроса пользователя -> выражение MATCH: все слова обязательны,
+    последнее — по префиксу. Спецсимволы FTS5 не пропускаются
+    """
+    terms = TERM_RE.findall(text)
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def search_transactions(queryset, text):
+    text = (text or '').strip()
+    if not text:
+        return queryset
+    if not fts_enabled():
+        return queryset.filter(description__icontains=text)
+
+    match = build_match_query(text)
+    if match is None:
+        return queryset.none()
+    indexed = Q(id__in=RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match]
+    ))
+    if queryset.model is LedgerTransaction:
+        # Архивных операций в индексе нет — по ним поиск подстрокой
+        indexed |= Q(archived=True, description__icontains=text)
+    return queryset.filter(indexed)
+
+
+def rebuild_search_index():
+    """Полная перестройка индекса (после ручных правок таблицы в обход ORM)"""
+    if fts_enabled():
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
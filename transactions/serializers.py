@@ -1,22 +1,272 @@
+from django.urls import reverse
 from rest_framework import serializers
-from .models import Category, Transaction
+from .models import Account, Budget, Category, Job, Profile, RecurringRule, Transaction
 
 
 class CategorySerializer(serializers.ModelSerializer):
+    # Аннотации Category.objects.with_usage(); у только что созданной
+    # категории их нет — тогда отдаются значения по умолчанию
+    transaction_count = serializers.IntegerField(read_only=True, default=0)
+    total_income = serializers.DecimalField(
+        max_digits=14, decimal_places=2, read_only=True, default=0
+    )
+    total_expense = serializers.DecimalField(
+        max_digits=14, decimal_places=2, read_only=True, default=0
+    )
+    last_used = serializers.DateField(read_only=True, default=None)
+
     class Meta:
         model = Category
-        fields = ['id', 'name']
+        fields = ['id', 'name', 'transaction_count', 'total_income', 'total_expense', 'last_used']
+
+
+class UserCategoryField(serializers.PrimaryKeyRelatedField):
+    """
+    Категория текущего пользователя. Если в контексте передан словарь
+    categories ({id: Category}), поиск идет по нему без запросов к БД
+    """
+    model = Category
+    context_key = 'categories'
+
+    def get_queryset(self):
+        request = self.context.get('request')
+        if request is None:
+            return self.model.objects.all()
+        return self.model.objects.filter(user=request.user)
+
+    def to_internal_value(self, data):
+        objects = self.context.get(self.context_key)
+        if objects is None:
+            return super().to_internal_value(data)
+        try:
+            return objects[int(data)]
+        except KeyError:
+            self.fail('does_not_exist', pk_value=data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+
+class UserAccountField(UserCategoryField):
+    """Счет текущего пользователя (словарь в контексте — accounts)"""
+    model = Account
+    context_key = 'accounts'
+
+
+def _instance_account(instance, accounts):
+    """Счет изменяемого объекта: из словаря accounts контекста ({id: Account}), иначе из БД"""
+    account_id = getattr(instance, 'account_id', None)
+    if account_id is None:
+        return None
+    if accounts is not None and account_id in accounts:
+        return accounts[account_id]
+    return instance.account
+
+
+def validate_account_currency(attrs, instance, accounts=None):
+    """
+    Валюта операции (правила) совпадает с валютой счета; без явной
+    валюты новая операция по счету берет валюту счета
+    """
+    account = attrs['account'] if 'account' in attrs else _instance_account(instance, accounts)
+    if account is None:
+        return attrs
+    if 'currency' not in attrs:
+        if instance is None:
+            attrs['currency'] = account.currency
+            return attrs
+        if 'account' not in attrs:
+            return attrs
+    currency = attrs.get('currency', getattr(instance, 'currency', None))
+    if currency != account.currency:
+        raise serializers.ValidationError({'currency': [f'Валюта счета — {account.currency}']})
+    return attrs
+
+
+class ProfileSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Profile
+        fields = ['base_currency']
+
+
+class AccountSerializer(serializers.ModelSerializer):
+    # Остаток на дату (?as_of=) — аннотация ledger.balances_as_of()
+    balance_as_of = serializers.DecimalField(
+        max_digits=14, decimal_places=2, read_only=True, default=None
+    )
+
+    class Meta:
+        model = Account
+        fields = [
+            'id', 'name', 'kind', 'currency', 'opening_balance', 'balance', 'balance_as_of',
+            'created_at', 'updated_at',
+        ]
+        read_only_fields = ['balance']
 
 
 class TransactionSerializer(serializers.ModelSerializer):
+    category = UserCategoryField(allow_null=True, required=False)
+    account = UserAccountField(allow_null=True, required=False)
+    # Остаток счета после операции — только в списках (ledger.attach_running_balances)
+    running_balance = serializers.DecimalField(
+        max_digits=14, decimal_places=2, read_only=True, default=None
+    )
+    # Операция из архива (archive.py) — только для чтения
+    archived = serializers.BooleanField(read_only=True, default=False)
+
     class Meta:
         model = Transaction
         fields = [
             'id',
             'type',
             'amount',
+            'currency',
+            'category',
+            'account',
+            'description',
+            'date',
+            'recurring_rule',
+            'running_balance',
+            'archived',
+            'created_at',
+            'updated_at',
+        ]
+        read_only_fields = ['recurring_rule']
+
+    def validate(self, attrs):
+        return validate_account_currency(attrs, self.instance, self.context.get('accounts'))
+
+
+class TransactionImportSerializer(TransactionSerializer):
+    """Строка импорта: категория задается названием, а не id"""
+    category = serializers.CharField(
+        required=False, allow_blank=True, allow_null=True, max_length=100
+    )
+    account = None
+    running_balance = None
+    archived = None
+
+    class Meta(TransactionSerializer.Meta):
+        fields = [
+            'type',
+            'amount',
+            'currency',
             'category',
             'description',
             'date',
+        ]
+
+
+class RecurringRuleSerializer(serializers.ModelSerializer):
+    category = UserCategoryField(allow_null=True, required=False)
+    account = UserAccountField(allow_null=True, required=False)
+
+    # Расписание после создания не меняется: next_date посчитан по нему
+    SCHEDULE_FIELDS = ('frequency', 'interval', 'start_date')
+
+    class Meta:
+        model = RecurringRule
+        fields = [
+            'id',
+            'type',
+            'amount',
+            'currency',
+            'category',
+            'account',
+            'description',
+            'frequency',
+            'interval',
+            'start_date',
+            'end_date',
+            'next_date',
+            'is_active',
             'created_at',
+            'updated_at',
         ]
+        read_only_fields = ['next_date']
+        extra_kwargs = {'interval': {'min_value': 1}}
+
+    def validate(self, attrs):
+        if self.instance is not None:
+            errors = {
+                field: ['Расписание нельзя изменить — создайте новое правило']
+                for field in self.SCHEDULE_FIELDS
+                if field in attrs and attrs[field] != getattr(self.instance, field)
+            }
+            if errors:
+                raise serializers.ValidationError(errors)
+        start_date = attrs.get('start_date', getattr(self.instance, 'start_date', None))
+        end_date = attrs.get('end_date', getattr(self.instance, 'end_date', None))
+        if start_date and end_date and end_date < start_date:
+            raise serializers.ValidationError({'end_date': ['Раньше даты начала']})
+        return validate_account_currency(attrs, self.instance, self.context.get('accounts'))
+
+
+class BudgetSerializer(serializers.ModelSerializer):
+    category = UserCategoryField()
+    # Статус за текущий месяц — budgets.attach_statuses()
+    spent = serializers.DecimalField(max_digits=14, decimal_places=2, read_only=True, default=None)
+    remaining = serializers.DecimalField(max_digits=14, decimal_places=2, read_only=True, default=None)
+    projected = serializers.DecimalField(max_digits=14, decimal_places=2, read_only=True, default=None)
+    projected_overspend = serializers.DecimalField(
+        max_digits=14, decimal_places=2, read_only=True, default=None
+    )
+    status = serializers.ChoiceField(choices=Budget.ALERT_CHOICES, read_only=True, default=None)
+
+    class Meta:
+        model = Budget
+        fields = [
+            'id',
+            'category',
+            'limit',
+            'currency',
+            'spent',
+            'remaining',
+            'projected',
+            'projected_overspend',
+            'status',
+            'alert',
+            'alert_month',
+            'alerted_at',
+            'created_at',
+            'updated_at',
+        ]
+        read_only_fields = ['alert', 'alert_month', 'alerted_at']
+        extra_kwargs = {'currency': {'required': False}}
+
+    def validate_category(self, category):
+        budgets = Budget.objects.filter(user_id=category.user_id, category=category)
+        if self.instance is not None:
+            budgets = budgets.exclude(pk=self.instance.pk)
+        if budgets.exists():
+            raise serializers.ValidationError('Для категории уже есть бюджет')
+        return category
+
+
+class JobSerializer(serializers.ModelSerializer):
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Job
+        fields = [
+            'id',
+            'kind',
+            'params',
+            'status',
+            'progress',
+            'result',
+            'error',
+            'download_url',
+            'created_at',
+            'started_at',
+            'finished_at',
+        ]
+        read_only_fields = [
+            'status', 'progress', 'result', 'error', 'created_at', 'started_at', 'finished_at',
+        ]
+
+    def get_download_url(self, job):
+        if job.status != Job.DONE or not job.file:
+            return None
+        request = self.context.get('request')
+        url = reverse('job-download', kwargs={'pk': job.pk})
+        return request.build_absolute_uri(url) if request else url
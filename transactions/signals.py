@@ -0,0 +1,100 @@
+"""
+Обработчики сигналов моделей.
+
+Поддерживают сводки (rollups.py) и версию кэша (cache.py) в актуальном
+состоянии при любых записях через ORM: REST API, шаблонные представления
+и админку, а также пишут отметки об удалении для синхронизации (sync.py). Массовые операции (bulk_create/bulk_update) сигналов не
+вызывают — такие пути должны вызывать rollups.apply_transactions сами,
+а версию кэша сбрасывает UserDataQuerySet.
+"""
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .cache import bump_data_version
+from .models import Account, Budget, Category, Profile, Tombstone, Transaction
+from .rollups import ROLLUP_FIELDS, apply_deltas, collect_deltas, merge_deltas
+from .sync import record_deletion
+
+
+@receiver(pre_save, sender=Transaction)
+def remember_previous_state(sender, instance, raw=False, **kwargs):
+    """Запоминаем значения до изменения, чтобы вычесть их из сводок"""
+    instance._rollup_previous = None
+    if raw or instance.pk is None or instance._state.adding:
+        return
+    instance._rollup_previous = Transaction.objects.filter(
+        pk=instance.pk
+    ).values(*ROLLUP_FIELDS).first()
+
+
+@receiver(post_save, sender=Transaction)
+def update_rollups_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_rollup_previous', None)
+    deltas = collect_deltas([instance])
+    if previous:
+        merge_deltas(deltas, collect_deltas([previous], sign=-1))
+    apply_deltas(*deltas)
+    instance._rollup_previous = None
+
+
+@receiver(post_delete, sender=Transaction)
+def update_rollups_on_delete(sender, instance, **kwargs):
+    apply_deltas(*collect_deltas([instance], sign=-1))
+
+
+@receiver(post_save, sender=Transaction)
+@receiver(post_delete, sender=Transaction)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Account)
+@receiver(post_delete, sender=Account)
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+@receiver(post_save, sender=Budget)
+@receiver(post_delete, sender=Budget)
+def invalidate_user_cache(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    bump_data_version(instance.user_id)
+
+
+def _deleting_user(origin):
+    """
+    Удаление — каскад от удаления пользователя: объектом или запросом
+    (User.objects.filter(...).delete(), массовое действие админки).
+    Синхронизировать и отмечать тогда уже некого
+    """
+    return isinstance(origin, User) or getattr(origin, 'model', None) is User
+
+
+@receiver(post_delete, sender=Transaction)
+def record_transaction_deletion(sender, instance, origin=None, **kwargs):
+    if _deleting_user(origin):
+        return
+    record_deletion(Tombstone.TRANSACTION, instance)
+
+
+@receiver(post_delete, sender=Category)
+def record_category_deletion(sender, instance, origin=None, **kwargs):
+    if _deleting_user(origin):
+        return
+    record_deletion(Tombstone.CATEGORY, instance)
+
+
+@receiver(pre_delete, sender=Category)
+def touch_category_transactions(sender, instance, origin=None, **kwargs):
+    """Транзакции удаляемой категории получат category=NULL — отмечаем их измененными"""
+    if _deleting_user(origin):
+        return
+    Transaction.objects.filter(category=instance).update()
+
+
+@receiver(pre_delete, sender=Account)
+def touch_account_transactions(sender, instance, origin=None, **kwargs):
+    """Транзакции удаляемого счета получат account=NULL — отмечаем их измененными"""
+    if _deleting_user(origin):
+        return
+    Transaction.objects.filter(account=instance).update()
@@ -0,0 +1,367 @@
+"""
+Движок статистики по транзакциям.
+
+Все показатели (итоги, категории, месяцы, дни недели, количество)
+считаются из одного сгруппированного запроса с условной агрегацией
+(Sum(..., filter=Q(type=...))) и затем сворачиваются в Python.
+Используется и HTML-страницей статистики, и /api/statistics/.
+Те же строки умеют отдавать и предрасчитанные сводки (rollups.py).
+Остатки счетов на конец периода берутся из ledger.py.
+Суммы в других валютах переводятся в валюту отчета внутри тех же
+запросов (currency.converted); без явной валюты — в базовую валюту
+пользователя (смена ее в профиле сбрасывает кэш, как и любые данные).
+"""
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import ExtractWeekDay, TruncMonth
+from django.utils.dateparse import parse_date
+
+from .archive import transaction_source
+from .async_utils import gather_in_threads, run_in_thread
+from .cache import aget_or_compute, get_or_compute
+from .currency import convert, converted, get_base_currency
+from .ledger import balances_as_of
+from .models import DEFAULT_CURRENCY, Transaction
+from .rollups import rollup_buckets
+
+
+DEFAULT_PERIOD_DAYS = 30
+
+WEEKDAY_NAMES = {
+    1: 'Воскресенье',
+    2: 'Понедельник',
+    3: 'Вторник',
+    4: 'Среда',
+    5: 'Четверг',
+    6: 'Пятница',
+    7: 'Суббота'
+}
+
+
+# Денежные суммы округляются до копеек: SUM по decimal в SQLite считается
+# во float, и сумма зависит от порядка сложения
+CENT = Decimal('0.01')
+
+
+def decimal_to_float(value):
+    """Преобразование Decimal в float для JSON сериализации"""
+    if isinstance(value, Decimal):
+        return float(value.quantize(CENT))
+    return value
+
+
+def _parse_date(value):
+    """Дата из параметра; пустая, некорректная или несуществующая (2024-02-30) — None"""
+    try:
+        return parse_date(value) if value else None
+    except ValueError:
+        return None
+
+
+def get_period(from_date=None, to_date=None, default_days=DEFAULT_PERIOD_DAYS):
+    """Разбор периода из GET-параметров (по умолчанию последние 30 дней)"""
+    today = datetime.now().date()
+    date_from = _parse_date(from_date)
+    date_to = _parse_date(to_date)
+    if date_from is None:
+        date_from = today - timedelta(days=default_days)
+    if date_to is None:
+        date_to = today
+    return date_from, date_to
+
+
+def transaction_totals(transactions, currency=DEFAULT_CURRENCY):
+    """Количество, доходы, расходы и баланс выборки в валюте currency — одним запросом"""
+    amount = converted('amount', currency)
+    totals = transactions.order_by().aggregate(
+        count=Count('id'),
+        total_income=Sum(amount, filter=Q(type=Transaction.INCOME), default=Decimal('0')),
+        total_expense=Sum(amount, filter=Q(type=Transaction.EXPENSE), default=Decimal('0')),
+    )
+    totals['total_income'] = totals['total_income'].quantize(CENT)
+    totals['total_expense'] = totals['total_expense'].quantize(CENT)
+    totals['balance'] = totals['total_income'] - totals['total_expense']
+    totals['currency'] = currency
+    return totals
+
+
+def get_totals(user, transactions, signature):
+    """
+    Итоги отфильтрованного списка в базовой валюте пользователя с кэшем
+    по сигнатуре фильтров (см. filters.filter_signature)
+    """
+    return get_or_compute(
+        'totals', user.pk, signature,
+        lambda: transaction_totals(transactions, get_base_currency(user)),
+    )
+
+
+def bucket_aggregates(currency=DEFAULT_CURRENCY):
+    amount = converted('amount', currency)
+    return {
+        'income': Sum(amount, filter=Q(type=Transaction.INCOME)),
+        'expense': Sum(amount, filter=Q(type=Transaction.EXPENSE)),
+        'income_count': Count('id', filter=Q(type=Transaction.INCOME)),
+        'expense_count': Count('id', filter=Q(type=Transaction.EXPENSE)),
+    }
+
+
+def aggregate_buckets(transactions, group_by=('category__name', 'month', 'weekday'), currency=DEFAULT_CURRENCY):
+    """
+    Один запрос: суммы (в валюте currency) и количества доходов/расходов,
+    сгруппированные по (категория, месяц, день недели)
+    или по части этих полей
+    """
+    if not group_by:
+        # Без группировки — одна строка итогов
+        return [transactions.aggregate(**bucket_aggregates(currency))]
+    return transactions.annotate(
+        month=TruncMonth('date'),
+        weekday=ExtractWeekDay('date'),
+    ).values(
+        *group_by
+    ).annotate(
+        **bucket_aggregates(currency)
+    ).order_by()
+
+
+def _sorted_by_total(totals):
+    items = [
+        {'category__name': name, 'total': decimal_to_float(total)}
+        for name, total in totals.items()
+    ]
+    return sorted(items, key=lambda item: item['total'], reverse=True)
+
+
+def summarize_totals(buckets):
+    """Итоги, количество и средний расход"""
+    total_income = Decimal('0')
+    total_expense = Decimal('0')
+    income_count = 0
+    expense_count = 0
+    for bucket in buckets:
+        total_income += bucket['income'] or Decimal('0')
+        total_expense += bucket['expense'] or Decimal('0')
+        income_count += bucket['income_count']
+        expense_count += bucket['expense_count']
+
+    total_income = decimal_to_float(total_income)
+    total_expense = decimal_to_float(total_expense)
+    return {
+        'total_income': total_income,
+        'total_expense': total_expense,
+        'balance': total_income - total_expense,
+        'transaction_count': income_count + expense_count,
+        'expense_count': expense_count,
+        'avg_transaction': total_expense / expense_count if expense_count else 0,
+    }
+
+
+def summarize_categories(buckets):
+    """Доходы, расходы и обороты по категориям"""
+    income_by_category = {}
+    expense_by_category = {}
+    category_summary = {}
+    for bucket in buckets:
+        name = bucket['category__name']
+        income = bucket['income'] or Decimal('0')
+        expense = bucket['expense'] or Decimal('0')
+        if bucket['income_count']:
+            income_by_category[name] = income_by_category.get(name, 0) + income
+        if bucket['expense_count']:
+            expense_by_category[name] = expense_by_category.get(name, 0) + expense
+        category_summary[name] = category_summary.get(name, 0) + income + expense
+
+    return {
+        'expense_by_category': _sorted_by_total(expense_by_category),
+        'income_by_category': _sorted_by_total(income_by_category),
+        'category_summary': _sorted_by_total(category_summary),
+    }
+
+
+def summarize_monthly(buckets):
+    """Динамика по месяцам"""
+    monthly = {}
+    for bucket in buckets:
+        month = monthly.setdefault(bucket['month'], {'income': 0, 'expense': 0})
+        if bucket['income_count']:
+            month['income'] += bucket['income'] or Decimal('0')
+        if bucket['expense_count']:
+            month['expense'] += bucket['expense'] or Decimal('0')
+
+    monthly_trend = OrderedDict()
+    for month in sorted(monthly):
+        monthly_trend[month.strftime('%Y-%m')] = {
+            'income': decimal_to_float(monthly[month]['income']),
+            'expense': decimal_to_float(monthly[month]['expense']),
+        }
+    return {'monthly_trend': monthly_trend}
+
+
+def summarize_weekdays(buckets):
+    """Обороты и количество по дням недели"""
+    weekdays = {}
+    for bucket in buckets:
+        weekday = weekdays.setdefault(bucket['weekday'], {'total': 0, 'count': 0})
+        weekday['total'] += (bucket['income'] or Decimal('0')) + (bucket['expense'] or Decimal('0'))
+        weekday['count'] += bucket['income_count'] + bucket['expense_count']
+
+    weekday_data = [
+        {
+            'weekday': WEEKDAY_NAMES.get(day, f"День {day}"),
+            'total': decimal_to_float(weekdays[day]['total']),
+            'count': weekdays[day]['count'],
+        }
+        for day in sorted(weekdays)
+    ]
+    return {'weekday_data': weekday_data}
+
+
+def summarize_accounts(user, date_to, currency=DEFAULT_CURRENCY):
+    """
+    Остатки счетов на конец периода (в валюте счета) и их сумма в валюте
+    currency по курсам последнего дня периода
+    """
+    accounts = []
+    closing_balance = Decimal('0')
+    for account in balances_as_of(user, date_to):
+        accounts.append({
+            'id': account.pk,
+            'name': account.name,
+            'kind': account.kind,
+            'currency': account.currency,
+            'balance': decimal_to_float(account.balance_as_of),
+        })
+        closing_balance += convert(account.balance_as_of, account.currency, date_to, currency) or 0
+    return {
+        'accounts': accounts,
+        'closing_balance': decimal_to_float(closing_balance),
+    }
+
+
+# Части статистики: (группировка строк, свертка)
+STATISTICS_PARTS = (
+    ((), summarize_totals),
+    (('category__name',), summarize_categories),
+    (('month',), summarize_monthly),
+    (('weekday',), summarize_weekdays),
+)
+
+
+def summarize_buckets(buckets):
+    """Свертка сгруппированных строк во все показатели статистики"""
+    buckets = list(buckets)
+    statistics = {}
+    for _, summarize in STATISTICS_PARTS:
+        statistics.update(summarize(buckets))
+    return statistics
+
+
+def get_statistics(user, date_from, date_to, currency=None):
+    """
+    Статистика пользователя за период в валюте currency (None — базовая
+    валюта пользователя) через кэш, см. cache.py
+    """
+    return get_or_compute(
+        'statistics', user.pk, [date_from, date_to, currency],
+        lambda: compute_statistics(user, date_from, date_to, currency),
+    )
+
+
+def statistics_buckets(user, date_from, date_to, currency=DEFAULT_CURRENCY):
+    """
+    Сгруппированные строки статистики за период в валюте currency.
+    По умолчанию читаются из сводок (rollups.py), а не из транзакций.
+    """
+    if getattr(settings, 'STATISTICS_USE_ROLLUPS', True):
+        return rollup_buckets(user, date_from, date_to, currency)
+
+    transactions = transaction_source(date_from).objects.filter(
+        user=user,
+        date__range=[date_from, date_to]
+    )
+    return aggregate_buckets(transactions, currency=currency)
+
+
+def compute_statistics(user, date_from, date_to, currency=None):
+    """Расчет статистики пользователя за период"""
+    currency = currency or get_base_currency(user)
+    statistics = summarize_buckets(statistics_buckets(user, date_from, date_to, currency))
+    statistics.update(summarize_accounts(user, date_to, currency))
+    statistics['currency'] = currency
+    return statistics
+
+
+def split_period(date_from, date_to):
+    """Период по календарным годам: [(начало, конец), ...]"""
+    parts = []
+    start = date_from
+    while start <= date_to:
+        end = min(date(start.year, 12, 31), date_to)
+        parts.append((start, end))
+        start = end + timedelta(days=1)
+    return parts
+
+
+def statistics_response_data(statistics, date_from, date_to):
+    """Ответ /api/statistics/ (и результат фоновой задачи статистики)"""
+    return {
+        "currency": statistics['currency'],
+        "total_income": statistics['total_income'],
+        "total_expense": statistics['total_expense'],
+        "balance": statistics['balance'],
+        "category_summary": statistics['category_summary'],
+        "monthly_trend": statistics['monthly_trend'],
+        "transaction_count": statistics['transaction_count'],
+        "accounts": statistics['accounts'],
+        "closing_balance": statistics['closing_balance'],
+        "date_range": {
+            "from": date_from.isoformat(),
+            "to": date_to.isoformat()
+        }
+    }
+
+
+async def aget_statistics(user, date_from, date_to, currency=None):
+    """Статистика для async-представлений (тот же кэш, что у get_statistics)"""
+    return await aget_or_compute(
+        'statistics', user.pk, [date_from, date_to, currency],
+        lambda: acompute_statistics(user, date_from, date_to, currency),
+    )
+
+
+async def acompute_statistics(user, date_from, date_to, currency=None):
+    """
+    Расчет статистики без блокировки event loop. Без сводок итоги,
+    категории, месяцы и дни недели считаются четырьмя независимыми
+    запросами одновременно (см. async_utils.py)
+    """
+    currency = currency or await run_in_thread(get_base_currency, user)
+    if getattr(settings, 'STATISTICS_USE_ROLLUPS', True):
+        buckets, accounts = await gather_in_threads(
+            (lambda: list(rollup_buckets(user, date_from, date_to, currency)),),
+            (summarize_accounts, user, date_to, currency),
+        )
+        statistics = summarize_buckets(buckets)
+        statistics.update(accounts)
+        statistics['currency'] = currency
+        return statistics
+
+    transactions = transaction_source(date_from).objects.filter(
+        user=user,
+        date__range=[date_from, date_to]
+    )
+    *results, accounts = await gather_in_threads(*(
+        (lambda group_by=group_by: list(aggregate_buckets(transactions, group_by, currency)),)
+        for group_by, _ in STATISTICS_PARTS
+    ), (summarize_accounts, user, date_to, currency))
+    statistics = {}
+    for (_, summarize), buckets in zip(STATISTICS_PARTS, results):
+        statistics.update(summarize(buckets))
+    statistics.update(accounts)
+    statistics['currency'] = currency
+    return statistics
@@ -0,0 +1,122 @@
+"""
+Инкрементальная синхронизация клиентов.
+
+Клиент передает непрозрачный токен из прошлого ответа и получает только
+транзакции и категории, созданные, измененные (updated_at) или удаленные
+(Tombstone) после него, а также новый токен.
+"""
+import base64
+import binascii
+import json
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Category, LedgerTransaction, Tombstone, Transaction
+
+
+# Перекрытие окна: записи, закоммиченные позже, чем было выставлено их
+# updated_at, не будут пропущены (клиент применяет изменения идемпотентно)
+SYNC_OVERLAP = timedelta(seconds=5)
+# Сколько хранятся отметки об удалении; более старые токены — полная синхронизация
+TOMBSTONE_RETENTION = timedelta(days=90)
+
+SYNC_MODELS = {
+    Tombstone.TRANSACTION: Transaction,
+    Tombstone.CATEGORY: Category,
+}
+# Архивные операции (archive.py) не меняются — они нужны только в полном снимке
+SNAPSHOT_MODELS = {
+    Tombstone.TRANSACTION: LedgerTransaction,
+}
+
+
+class InvalidToken(ValueError):
+    pass
+
+
+def encode_token(moment):
+    payload = json.dumps({'t': moment.isoformat()})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_token(token):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        moment = parse_datetime(json.loads(base64.urlsafe_b64decode(padded.encode()))['t'])
+    except (binascii.Error, ValueError, KeyError, TypeError) as e:
+        raise InvalidToken(str(e))
+    if moment is None or timezone.is_naive(moment):
+        raise InvalidToken('Некорректный токен')
+    return moment
+
+
+# Отметки об удалении, накопленные внутри defer_tombstones()
+_pending = ContextVar('tombstones_pending', default=None)
+
+
+@contextmanager
+def defer_tombstones():
+    """Отметки об удалении внутри блока записываются одним bulk_create"""
+    if _pending.get() is not None:
+        yield
+        return
+    pending = []
+    token = _pending.set(pending)
+    try:
+        yield
+    finally:
+        _pending.reset(token)
+    Tombstone.objects.bulk_create(pending)
+
+
+def record_deletion(model, instance):
+    tombstone = Tombstone(user_id=instance.user_id, model=model, object_id=instance.pk)
+    pending = _pending.get()
+    if pending is not None:
+        pending.append(tombstone)
+    else:
+        tombstone.save()
+
+
+def prune_tombstones(now=None):
+    now = now or timezone.now()
+    return Tombstone.objects.filter(deleted_at__lt=now - TOMBSTONE_RETENTION).delete()[0]
+
+
+def changes_since(user, token=None):
+    """
+    Изменения пользователя после токена: {model: (измененные, удаленные id)}.
+    Без токена, с некорректным, слишком старым или еще не выданным
+    токеном — полный снимок (full=True): клиент заменяет им свои данные
+    """
+    now = timezone.now()
+    try:
+        since = decode_token(token) if token else None
+    except InvalidToken:
+        since = None
+    full = since is None or since < now - TOMBSTONE_RETENTION or since > now
+
+    changes = {}
+    for name, model in SYNC_MODELS.items():
+        if full:
+            model = SNAPSHOT_MODELS.get(name, model)
+        changed = model.objects.filter(user=user)
+        deleted = []
+        if not full:
+            changed = changed.filter(updated_at__gte=since - SYNC_OVERLAP)
+            deleted = list(Tombstone.objects.filter(
+                user=user,
+                model=name,
+                deleted_at__gte=since - SYNC_OVERLAP,
+            ).values_list('object_id', flat=True).distinct())
+        changes[name] = (changed.order_by('updated_at', 'pk'), deleted)
+
+    return {
+        'token': encode_token(now),
+        'full': full,
+        'changes': changes,
+    }
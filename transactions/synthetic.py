@@ -0,0 +1,160 @@
+"""
+Детерминированный генератор синтетических данных для бенчмарков
+(manage.py benchmark, benchmarks.py).
+
+N пользователей × M категорий × K операций на пользователя. Одинаковые
+параметры и seed дают одинаковые данные. Распределения приближены
+к реальным: суммы — логнормальные с медианой и разбросом своими для
+каждой категории, частота категорий — по весам, даты — равномерно
+за период с более частыми тратами в выходные, доходов — около 5%.
+
+Операции вставляются bulk_create пачками (FTS-индекс поиска
+поддерживают триггеры), сводки и остатки счетов пересчитываются
+по пользователю в конце (rebuild_rollups). Пользователи — с префиксом
+SYNTHETIC_PREFIX; delete_synthetic_users удаляет их операции одним
+запросом, без сигналов по каждой строке.
+"""
+import math
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction as db_transaction
+from django.utils import timezone
+
+from .models import Account, Category, Transaction
+from .rollups import rebuild_rollups
+
+
+SYNTHETIC_PREFIX = 'synthetic-'
+BATCH_SIZE = 5000
+INCOME_SHARE = 0.05
+# Трата в выходные в 1.4 раза вероятнее, чем в будний день
+WEEKEND_WEIGHT = 1.4
+
+# Профили категорий: название, тип, медиана суммы, разброс (sigma
+# логнормального распределения), относительная частота, описания
+CATEGORY_PROFILES = [
+    ('Продукты', Transaction.EXPENSE, 1200, 0.6, 30, ('Пятерочка', 'Перекресток', 'Рынок')),
+    ('Кафе', Transaction.EXPENSE, 600, 0.5, 15, ('Кофе', 'Обед', 'Ужин с друзьями')),
+    ('Транспорт', Transaction.EXPENSE, 250, 0.7, 15, ('Метро', 'Такси', 'Бензин')),
+    ('Жилье', Transaction.EXPENSE, 25000, 0.2, 2, ('Аренда квартиры', 'Коммунальные услуги')),
+    ('Связь', Transaction.EXPENSE, 700, 0.3, 2, ('Мобильная связь', 'Интернет')),
+    ('Здоровье', Transaction.EXPENSE, 1800, 0.9, 4, ('Аптека', 'Стоматолог', 'Анализы')),
+    ('Одежда', Transaction.EXPENSE, 3500, 0.8, 4, ('Куртка', 'Обувь', 'Футболки')),
+    ('Развлечения', Transaction.EXPENSE, 1500, 0.8, 6, ('Кино', 'Концерт', 'Подписка')),
+    ('Подарки', Transaction.EXPENSE, 3000, 0.9, 2, ('Подарок на день рождения', 'Цветы')),
+    ('Путешествия', Transaction.EXPENSE, 15000, 1.0, 1, ('Авиабилеты', 'Гостиница', 'Экскурсия')),
+    ('Образование', Transaction.EXPENSE, 5000, 0.7, 1, ('Онлайн-курс', 'Книги')),
+    ('Дом', Transaction.EXPENSE, 2000, 1.0, 3, ('Хозтовары', 'Мебель', 'Ремонт')),
+]
+INCOME_PROFILES = [
+    ('Зарплата', Transaction.INCOME, 80000, 0.25, 4, ('Зарплата', 'Аванс', 'Премия')),
+    ('Подработка', Transaction.INCOME, 12000, 0.8, 1, ('Фриланс', 'Консультация')),
+]
+
+
+def category_profiles(count):
+    """
+    Профили count категорий: доходные и расходные по кругу (хотя бы
+    одна доходная); названия повторяющихся профилей — с номером
+    """
+    base = INCOME_PROFILES[:1] + CATEGORY_PROFILES + INCOME_PROFILES[1:]
+    profiles = []
+    for index in range(count):
+        name, *rest = base[index % len(base)]
+        if index >= len(base):
+            name = f'{name} {index // len(base) + 1}'
+        profiles.append((name, *rest))
+    return profiles
+
+
+def _days(date_from, date_to):
+    days = [date_from + timedelta(days=offset) for offset in range((date_to - date_from).days + 1)]
+    weights = [WEEKEND_WEIGHT if day.weekday() >= 5 else 1 for day in days]
+    return days, weights
+
+
+def synthetic_rows(profiles, count, date_from, date_to, seed):
+    """
+    count операций (тип, номер профиля категории, сумма, описание, дата)
+    для категорий profiles — детерминированно по seed
+    """
+    rng = random.Random(seed)
+    days, weights = _days(date_from, date_to)
+    incomes = [index for index, profile in enumerate(profiles) if profile[1] == Transaction.INCOME]
+    expenses = [index for index, profile in enumerate(profiles) if profile[1] == Transaction.EXPENSE] or incomes
+    for day in rng.choices(days, weights=weights, k=count):
+        pool = incomes if rng.random() < INCOME_SHARE else expenses
+        index = rng.choices(pool, weights=[profiles[position][4] for position in pool])[0]
+        _, kind, median, sigma, _, descriptions = profiles[index]
+        amount = max(median * math.exp(rng.gauss(0, sigma)), 1)
+        yield kind, index, Decimal(f'{amount:.2f}'), rng.choice(descriptions), day
+
+
+def generate_ledger(users, categories, transactions_per_user, days=3 * 365, seed=0,
+                    batch_size=BATCH_SIZE, progress=None):
+    """
+    Создать users пользователей (synthetic-0, synthetic-1, ...) с categories
+    категориями, одним счетом и transactions_per_user операциями каждый
+    за последние days дней. Возвращает созданных пользователей
+    """
+    date_to = timezone.localdate()
+    date_from = date_to - timedelta(days=days - 1)
+    profiles = category_profiles(categories)
+    created = []
+    for number in range(users):
+        user = User.objects.create_user(f'{SYNTHETIC_PREFIX}{number}')
+        account = Account.objects.create(user=user, name='Основная карта')
+        category_ids = [
+            category.pk for category in Category.objects.bulk_create(
+                Category(user=user, name=profile[0]) for profile in profiles
+            )
+        ]
+        batch = []
+        rows = synthetic_rows(profiles, transactions_per_user, date_from, date_to, seed=f'{seed}:{number}')
+        for kind, index, amount, description, day in rows:
+            batch.append(Transaction(
+                user=user, account=account, category_id=category_ids[index],
+                type=kind, amount=amount, description=description, date=day,
+            ))
+            if len(batch) >= batch_size:
+                _flush(batch, progress)
+        _flush(batch, progress)
+        rebuild_rollups(user)
+        created.append(user)
+    return created
+
+
+def _flush(batch, progress):
+    if not batch:
+        return
+    with db_transaction.atomic():
+        Transaction.objects.bulk_create(batch)
+    if progress:
+        progress(len(batch))
+    batch.clear()
+
+
+def delete_synthetic_users():
+    """Удалить синтетических пользователей и их данные. Возвращает число пользователей"""
+    users = User.objects.filter(username__startswith=SYNTHETIC_PREFIX)
+    user_ids = list(users.values_list('pk', flat=True))
+    if not user_ids:
+        return 0
+    placeholders = ', '.join(['%s'] * len(user_ids))
+    with db_transaction.atomic():
+        # Операции — одним запросом: сводки, остатки и отметки удаления
+        # удалятся вместе с пользователями
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {connection.ops.quote_name(Transaction._meta.db_table)} '
+                f'WHERE user_id IN ({placeholders})',
+                user_ids,
+            )
+        # По одному: сигналы не пишут отметки удаления, только если
+        # удаляется сам пользователь (origin — объект User)
+        for user in users:
+            user.delete()
+    return len(user_ids)
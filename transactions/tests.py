@@ -1,3 +1,1870 @@
-from django.test import TestCase
+import base64
+import codecs
+import csv
+import json
+import os
+import re
+import tempfile
+import zipfile
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from importlib.util import find_spec
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
+from xml.etree import ElementTree
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.storage import FileSystemStorage
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.db.models import Count, Sum
+from django.db.models.functions import ExtractWeekDay, TruncMonth
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from .analytics import analytics_available
+from .archive import archive_horizon
+from .benchmarks import compare_results
+from .budgets import check_budgets, compute_budget_statuses
+from .cache import get_cache, get_cache_stats, get_data_version, reset_cache_stats
+from .currency import InvalidRates, convert, import_rates
+from .checks import check_shared_statistics_cache
+from .db import sqlite_pragmas
+from .exports import EXPORT_FORMATS, EXPORT_HEADERS
+from .ledger import attach_running_balances, balances_as_of
+from .models import (
+    Account, AccountRollup, ArchivedTransaction, Budget, Category, DailyRollup, ExchangeRate, Job, LedgerTransaction,
+    MonthlyRollup, Profile, RecurringRule, SpendingRollup, Tombstone, Transaction,
+)
+from .batch import TransactionBatch
+from .importers import TransactionImporter, iter_rows
+from .instrumentation import registry
+from .jobs import claim_job, requeue_stale_jobs, run_job
+from .pagination import ORDERINGS, InvalidCursor, decode_cursor, encode_cursor, keyset_page
+from .recurring import materialize_rules, occurrences
+from .rollups import defer_rollups, rebuild_rollups
+from .search import fts_enabled, search_transactions
+from .serializers import TransactionSerializer
+from .statistics import (
+    WEEKDAY_NAMES, aggregate_buckets, compute_statistics, get_period, get_statistics, statistics_buckets,
+)
+from .sync import TOMBSTONE_RETENTION, encode_token
+from .synthetic import SYNTHETIC_PREFIX, category_profiles, synthetic_rows
+from .views import TransactionListView, TransactionViewSet
+
+
+# Полный проход по таблице: "SCAN <таблица>" без "USING ... INDEX"
+# (поиск по FTS-индексу — "SCAN <таблица> VIRTUAL TABLE INDEX")
+FULL_SCAN_RE = re.compile(r'\bSCAN (transactions_\w+)\b(?! USING| VIRTUAL TABLE)')
+
+ROLLUP_MODELS = (DailyRollup, MonthlyRollup, AccountRollup, SpendingRollup)
+
+
+def rollup_snapshot(user):
+    """Строки всех сводок пользователя (без id) и остатки его счетов"""
+    snapshot = {
+        model.__name__: sorted(
+            model.objects.filter(user=user, count__gt=0).values_list(
+                *[field.attname for field in model._meta.concrete_fields if not field.primary_key]
+            ),
+            # category_id может быть NULL
+            key=lambda row: [(value is None, value) for value in row],
+        )
+        for model in ROLLUP_MODELS
+    }
+    snapshot['balances'] = dict(Account.objects.filter(user=user).values_list('pk', 'balance'))
+    return snapshot
+
+
+class RollupAssertionsMixin:
+    def assertRollupsRebuilt(self, user):
+        """Инкрементально поддерживаемые сводки совпадают с полным пересчетом (rebuild_rollups)"""
+        incremental = rollup_snapshot(user)
+        rebuild_rollups(user)
+        self.assertEqual(rollup_snapshot(user), incremental)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN есть только в SQLite')
+class QueryPlanTests(TestCase):
+    """Горячие запросы не должны откатываться к полному сканированию таблиц"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('plan', password='plan')
+        cls.category = Category.objects.create(name='Продукты', user=cls.user)
+        for offset in range(20):
+            Transaction.objects.create(
+                user=cls.user,
+                category=cls.category,
+                type=Transaction.EXPENSE if offset % 2 else Transaction.INCOME,
+                amount=100 + offset,
+                date=date(2025, 1, 1) + timedelta(days=offset * 7),
+            )
+
+    def assertNoFullScan(self, queryset, index=None):
+        plan = queryset.explain()
+        self.assertIsNone(FULL_SCAN_RE.search(plan), plan)
+        if index:
+            self.assertIn(index, plan)
+
+    def list_view_queryset(self, **params):
+        request = RequestFactory().get('/', params)
+        request.user = self.user
+        view = TransactionListView()
+        view.setup(request)
+        return view.get_queryset()
+
+    def viewset_queryset(self, **params):
+        request = Request(RequestFactory().get('/api/transactions/', params))
+        request.user = self.user
+        view = TransactionViewSet(action='list', request=request, format_kwarg=None)
+        return view.filter_queryset(view.get_queryset())
+
+    def test_list_view_date_range(self):
+        self.assertNoFullScan(
+            self.list_view_queryset(date_from='2025-01-01', date_to='2025-03-01'),
+            'transaction_user_date_idx',
+        )
+
+    def test_list_view_type(self):
+        self.assertNoFullScan(
+            self.list_view_queryset(type='expense', date_from='2025-01-01'),
+            'transaction_user_type_date_idx',
+        )
+
+    def test_list_view_category(self):
+        self.assertNoFullScan(
+            self.list_view_queryset(category=self.category.pk, date_from='2025-01-01'),
+            'transaction_user_cat_date_idx',
+        )
+
+    def test_list_view_orderings(self):
+        for ordering in ('-date', 'date', 'amount', '-amount'):
+            with self.subTest(ordering=ordering):
+                self.assertNoFullScan(self.list_view_queryset(ordering=ordering))
+
+    def test_viewset_filters(self):
+        self.assertNoFullScan(self.viewset_queryset())
+        self.assertNoFullScan(self.viewset_queryset(type='income'))
+        self.assertNoFullScan(self.viewset_queryset(category=self.category.pk))
+        self.assertNoFullScan(
+            self.viewset_queryset(ordering='-amount'), 'transaction_user_amount_idx'
+        )
+
+    def test_viewset_search_and_ranges(self):
+        queryset = self.viewset_queryset(search='кофе', amount_min='100', date_from='2025-01-01')
+        plan = queryset.explain()
+        self.assertNoFullScan(queryset)
+        if fts_enabled():
+            self.assertIn('VIRTUAL TABLE', plan)
+
+    def test_statistics_queries(self):
+        transactions = Transaction.objects.filter(
+            user=self.user, date__range=[date(2025, 1, 1), date(2025, 6, 30)]
+        )
+        self.assertNoFullScan(aggregate_buckets(transactions), 'transaction_user_date_idx')
+        self.assertNoFullScan(transactions.order_by('-amount')[:10])
+
+    def test_rollup_queries(self):
+        self.assertNoFullScan(
+            DailyRollup.objects.filter(
+                user=self.user, currency='RUB', date__range=[date(2025, 1, 1), date(2025, 1, 31)],
+            ),
+            'dailyrollup_user_cur_date_idx',
+        )
+        self.assertNoFullScan(
+            MonthlyRollup.objects.filter(user=self.user, month__gte=date(2025, 1, 1)),
+            'monthlyrollup_user_month_idx',
+        )
+
+
+class InstrumentationTests(TestCase):
+    """Server-Timing по каждому ответу и метрики только для staff"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('metrics', password='metrics')
+
+    def setUp(self):
+        registry.reset()
+        self.client.force_login(self.user)
+
+    def test_server_timing_header(self):
+        response = self.client.get('/')
+        self.assertRegex(response['Server-Timing'], r'^total;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries"$')
+        self.assertEqual(registry.snapshot()['transaction_list']['requests'], 1)
+
+    def test_metrics_staff_only(self):
+        self.assertEqual(self.client.get('/metrics/').status_code, 302)
+        self.user.is_staff = True
+        self.user.save()
+        self.client.get('/')
+        response = self.client.get('/metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('finance_view_requests_total{view="transaction_list"} 1', response.content.decode())
+
+
+class CategoryUsageTests(TestCase):
+    """Сводка по категориям — постоянное число запросов"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('usage', password='usage')
+        for index in range(10):
+            category = Category.objects.create(name=f'Категория {index}', user=cls.user)
+            Transaction.objects.create(
+                user=cls.user, category=category, type=Transaction.EXPENSE,
+                amount=10 + index, date=date(2025, 1, 1 + index),
+            )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_category_list_queries(self):
+        # Сессия, пользователь, базовая валюта и один запрос с аннотациями
+        with self.assertNumQueries(4):
+            response = self.client.get('/categories/')
+        self.assertContains(response, '1 транзакций')
+
+    def test_category_api_fields(self):
+        with self.assertNumQueries(4):
+            data = self.client.get('/api/categories/').json()
+        self.assertEqual(data[0]['transaction_count'], 1)
+        self.assertEqual(data[0]['total_expense'], '10.00')
+        self.assertEqual(data[0]['total_income'], '0.00')
+        self.assertEqual(data[0]['last_used'], '2025-01-01')
+
+    def test_totals_in_base_currency(self):
+        import_rates(StringIO('date,currency,rate\n2025-01-01,USD,90\n'))
+        category = Category.objects.create(name='Поездка', user=self.user)
+        for amount, currency in [(100, 'RUB'), (10, 'USD')]:
+            Transaction.objects.create(user=self.user, category=category, type=Transaction.EXPENSE,
+                                       amount=amount, currency=currency, date=date(2025, 1, 1))
+        rows = {row['name']: row for row in self.client.get('/api/categories/').json()}
+        self.assertEqual(rows['Поездка']['total_expense'], '1000.00')
+        statistics = compute_statistics(self.user, date(2025, 1, 1), date(2025, 1, 1))
+        by_category = {row['category__name']: row['total'] for row in statistics['expense_by_category']}
+        self.assertEqual(by_category['Поездка'], 1000)
+
+        Profile.objects.create(user=self.user, base_currency='USD')
+        rows = {row['name']: row for row in self.client.get('/api/categories/').json()}
+        self.assertEqual(rows['Поездка']['total_expense'], '11.11')
+
+
+class TransactionTotalsTests(TestCase):
+    """Итоги списка — один условный агрегат с кэшем по фильтрам"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('totals', password='totals')
+        for offset in range(6):
+            Transaction.objects.create(
+                user=cls.user,
+                type=Transaction.INCOME if offset % 3 == 0 else Transaction.EXPENSE,
+                amount=100,
+                date=date(2025, 1, 1) + timedelta(days=offset),
+            )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_list_totals(self):
+        # Сессия, пользователь, базовая валюта, итоги, страница, категории и счета фильтра
+        with self.assertNumQueries(7):
+            response = self.client.get('/?page=1')
+        self.assertEqual(response.context['total_count'], 6)
+        self.assertEqual(response.context['balance'], -200)
+        # Повторный запрос — итоги из кэша
+        with self.assertNumQueries(5):
+            self.client.get('/?page=1')
+
+    def test_api_totals_follow_filters(self):
+        data = self.client.get('/api/transactions/?pagination=cursor&type=income').json()
+        self.assertEqual(data['totals'], {
+            'count': 2, 'total_income': 200.0, 'total_expense': 0.0, 'balance': 200.0, 'currency': 'RUB',
+        })
+        Transaction.objects.create(user=self.user, type=Transaction.INCOME, amount=50, date=date(2025, 2, 1))
+        data = self.client.get('/api/transactions/?pagination=cursor&type=income').json()
+        self.assertEqual(data['totals']['total_income'], 250.0)
+
+
+class TransactionFilterTests(TestCase):
+    """Фильтры и поиск — одинаково в HTML-списке и API"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('filters', password='filters')
+        cls.food = Category.objects.create(name='Еда', user=cls.user)
+        cls.home = Category.objects.create(name='Дом', user=cls.user)
+        cls.coffee = Transaction.objects.create(
+            user=cls.user, category=cls.food, type=Transaction.EXPENSE,
+            amount=250, description='Кофе и круассан', date=date(2025, 3, 1),
+        )
+        cls.rent = Transaction.objects.create(
+            user=cls.user, category=cls.home, type=Transaction.EXPENSE,
+            amount=30000, description='Аренда квартиры', date=date(2025, 3, 2),
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def api_ids(self, query):
+        response = self.client.get(f'/api/transactions/?{query}')
+        self.assertEqual(response.status_code, 200, response.content)
+        return [item['id'] for item in response.json()]
+
+    def test_search_index_follows_writes(self):
+        transactions = Transaction.objects.filter(user=self.user)
+        self.assertEqual(list(search_transactions(transactions, 'кофе')), [self.coffee])
+        self.assertEqual(list(search_transactions(transactions, 'кварт')), [self.rent])
+        # QuerySet.update() минует сигналы, индекс обновляют триггеры
+        transactions.filter(pk=self.coffee.pk).update(description='Чай')
+        self.assertFalse(search_transactions(transactions, 'кофе').exists())
+        self.assertEqual(list(search_transactions(transactions, 'чай')), [self.coffee])
+
+    def test_api_filters(self):
+        self.assertEqual(self.api_ids(f'category={self.food.pk},{self.home.pk}&ordering=amount'),
+                         [self.coffee.pk, self.rent.pk])
+        self.assertEqual(self.api_ids('amount_min=1000'), [self.rent.pk])
+        self.assertEqual(self.api_ids('search=круассан'), [self.coffee.pk])
+        self.assertEqual(self.client.get('/api/transactions/?ordering=description').status_code, 400)
+
+    def test_list_view_ignores_invalid_values(self):
+        response = self.client.get('/?ordering=description&amount_max=abc&search=аренда')
+        self.assertEqual([transaction.pk for transaction in response.context['transactions']], [self.rent.pk])
+
+
+class AsyncViewsTests(TransactionTestCase):
+    """
+    Async-варианты отдают то же, что и sync. TransactionTestCase: параллельные
+    запросы идут через другие соединения и видят только закоммиченные данные
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user('async', password='async')
+        category = Category.objects.create(name='Еда', user=self.user)
+        for offset in range(12):
+            Transaction.objects.create(
+                user=self.user,
+                category=category if offset % 2 else None,
+                type=Transaction.INCOME if offset % 3 == 0 else Transaction.EXPENSE,
+                amount=100 + offset,
+                description='кофе' if offset % 4 == 0 else '',
+                date=date(2025, 1, 1) + timedelta(days=offset * 11),
+            )
+        self.client.force_login(self.user)
+
+    def assertSameResponse(self, sync_url, async_url):
+        sync_data = self.client.get(sync_url).json()
+        async_data = self.client.get(async_url).json()
+        self.assertEqual(sync_data, async_data)
+        return async_data
+
+    @override_settings(STATISTICS_USE_ROLLUPS=False)
+    def test_statistics(self):
+        query = '?from_date=2025-01-01&to_date=2025-06-30'
+        data = self.assertSameResponse('/api/statistics/' + query, '/api/async/statistics/' + query)
+        self.assertEqual(data['transaction_count'], 12)
+
+    def test_transactions(self):
+        self.assertSameResponse('/api/transactions/?type=expense', '/api/async/transactions/?type=expense')
+        query = '?pagination=cursor&page_size=5&search=кофе'
+        sync_data = self.client.get('/api/transactions/' + query).json()
+        async_data = self.client.get('/api/async/transactions/' + query).json()
+        self.assertEqual(sync_data['results'], async_data['results'])
+        self.assertEqual(sync_data['totals'], async_data['totals'])
+
+    @skipUnless(analytics_available(), 'нужен numpy')
+    def test_statistics_page_analytics(self):
+        response = self.client.get('/statistics/?from_date=2025-01-01&to_date=2025-06-30')
+        self.assertEqual(response.context['analytics']['forecast']['month'], '2025-07')
+        self.assertContains(response, 'dailyChart')
+        with mock.patch('transactions.analytics.np', None):
+            response = self.client.get('/statistics/')
+        self.assertIsNone(response.context['analytics'])
+
+        # Перевернутый период — пустая страница без аналитики, а не 500
+        response = self.client.get('/statistics/?from_date=2025-10-10&to_date=2025-01-01')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context['analytics'])
+        self.assertEqual(response.context['transaction_count'], 0)
+
+    def test_requires_login(self):
+        self.client.logout()
+        self.assertEqual(self.client.get('/api/async/statistics/').status_code, 403)
+        self.assertEqual(self.client.get('/statistics/').status_code, 302)
+
+
+class JobTests(TestCase):
+    """Большие отчеты уходят в фоновую задачу: 202, опрос статуса, скачивание"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('jobs', password='jobs')
+        for offset in range(10):
+            Transaction.objects.create(
+                user=cls.user,
+                type=Transaction.INCOME if offset % 2 else Transaction.EXPENSE,
+                amount=100 + offset,
+                date=date(2024, 1, 1) + timedelta(days=offset * 60),
+            )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        files_root = tempfile.TemporaryDirectory()
+        self.addCleanup(files_root.cleanup)
+        # Хранилище поля создается при импорте модели — подменяем его
+        storage = mock.patch.object(Job._meta.get_field('file'), 'storage', FileSystemStorage(files_root.name))
+        storage.start()
+        self.addCleanup(storage.stop)
+
+    def test_large_statistics_runs_in_background(self):
+        query = '?from_date=2024-01-01&to_date=2025-12-31'
+        response = self.client.get('/api/statistics/' + query)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response['Location'], f"/api/jobs/{response.json()['id']}/")
+        # Повторный запрос — та же задача
+        self.assertEqual(self.client.get('/api/statistics/' + query).json()['id'], response.json()['id'])
+
+        job_id = claim_job('test')
+        self.assertEqual(job_id, response.json()['id'])
+        self.assertIsNone(claim_job('test'))
+        self.assertEqual(run_job(job_id), Job.DONE)
+
+        job = self.client.get(response['Location']).json()
+        self.assertEqual((job['status'], job['progress']), (Job.DONE, 100))
+        inline = self.client.get('/api/statistics/' + query + '&background=0').json()
+        self.assertEqual(job['result'], inline)
+
+    def test_export_job_file(self):
+        response = self.client.get('/api/transactions/export/?file_format=csv&type=income&background=1')
+        self.assertEqual(response.status_code, 202)
+        job_url = response['Location']
+        self.assertEqual(self.client.get(job_url + 'download/').status_code, 409)
+
+        run_job(claim_job('test'))
+        job = self.client.get(job_url).json()
+        self.assertEqual(job['result'], {'rows': 5, 'file_format': 'csv'})
+        download = self.client.get(job_url + 'download/')
+        inline = self.client.get('/api/transactions/export/?file_format=csv&type=income&background=0')
+        self.assertEqual(b''.join(download.streaming_content), b''.join(inline.streaming_content))
+
+    def test_create_validates_params(self):
+        response = self.client.post('/api/jobs/', {'kind': 'export', 'params': {'file_format': 'pdf'}},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        other = User.objects.create_user('other', password='other')
+        job = Job.objects.create(user=other, kind=Job.STATISTICS, params={})
+        self.assertEqual(self.client.get(f'/api/jobs/{job.pk}/').status_code, 404)
+
+    def test_stale_jobs_requeued(self):
+        job = Job.objects.create(user=self.user, kind=Job.STATISTICS, params={})
+        claim_job('dead-worker')
+        later = timezone.now() + timedelta(seconds=settings.JOBS['STALE_AFTER_SECONDS'] + 1)
+        self.assertEqual(requeue_stale_jobs(now=later), (1, 0))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.worker), (Job.PENDING, ''))
+
+
+@skipUnless(analytics_available(), 'нужен numpy')
+class AnalyticsTests(TestCase):
+    """Аналитика: один запрос рядов, векторные расчеты"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('analytics', password='analytics')
+        cls.food = Category.objects.create(name='Еда', user=cls.user)
+        # Расход на еду растет на 100 каждый месяц: 2025-01 … 2025-06
+        for month in range(1, 7):
+            for day in (5, 20):
+                Transaction.objects.create(
+                    user=cls.user, category=cls.food, type=Transaction.EXPENSE,
+                    amount=50 * month, date=date(2025, month, day),
+                )
+        Transaction.objects.create(
+            user=cls.user, type=Transaction.INCOME, amount=1000, date=date(2025, 6, 1),
+        )
+        # Ежедневная мелочь и одна необычно крупная покупка
+        for day in range(1, 21):
+            Transaction.objects.create(
+                user=cls.user, type=Transaction.EXPENSE, amount=10 + day % 3, date=date(2025, 6, day),
+            )
+        cls.outlier = Transaction.objects.create(
+            user=cls.user, type=Transaction.EXPENSE, amount=500, date=date(2025, 6, 25),
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_api(self):
+        query = '?from_date=2025-06-01&to_date=2025-06-30'
+        # Сессия, пользователь, базовая валюта, ряды, имена категорий, детали аномалий
+        with self.assertNumQueries(6):
+            data = self.client.get('/api/analytics/' + query).json()
+
+        daily = data['daily']
+        self.assertEqual(len(daily['dates']), 30)
+        self.assertEqual(daily['expense'][19], 300 + 10 + 20 % 3)
+        # 30-дневное окно захватывает расходы мая до начала периода
+        self.assertEqual(daily['expense_avg_30'][0], round((250 + 250 + 11) / 30, 2))
+        self.assertEqual(daily['income_avg_7'][6], round(1000 / 7, 2))
+
+        self.assertEqual(data['monthly'], [{
+            'month': '2025-06', 'income': 1000.0, 'expense': 1321.0,
+            'income_growth': None, 'expense_growth': round((1321 - 500) / 500 * 100, 1),
+        }])
+
+        forecast = data['forecast']
+        self.assertEqual((forecast['month'], forecast['method']), ('2025-07', 'linear'))
+        food = next(item for item in forecast['categories'] if item['category'] == 'Еда')
+        self.assertEqual(food['forecast'], 700.0)
+
+        self.assertEqual([item['id'] for item in data['outliers']], [self.outlier.pk])
+
+    def test_without_numpy(self):
+        with mock.patch('transactions.analytics.np', None):
+            self.assertEqual(self.client.get('/api/analytics/').status_code, 503)
+
+
+class RecurringRuleTests(TestCase):
+    """Повторяющиеся операции: расписание, водяной знак, идемпотентность"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('recurring', password='recurring')
+        cls.rent = Category.objects.create(name='Аренда', user=cls.user)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def make_rule(self, **kwargs):
+        kwargs.setdefault('type', Transaction.EXPENSE)
+        kwargs.setdefault('amount', 30000)
+        return RecurringRule.objects.create(user=self.user, category=self.rent, **kwargs)
+
+    def test_occurrences(self):
+        rule = self.make_rule(frequency=RecurringRule.MONTHLY, start_date=date(2025, 1, 31))
+        dates, next_date = occurrences(rule, date(2025, 4, 30))
+        self.assertEqual(dates, [date(2025, 1, 31), date(2025, 2, 28), date(2025, 3, 31), date(2025, 4, 30)])
+        self.assertEqual(next_date, date(2025, 5, 31))
+
+        rule = self.make_rule(frequency=RecurringRule.WEEKLY, interval=2,
+                              start_date=date(2025, 1, 1), end_date=date(2025, 2, 1))
+        self.assertEqual(occurrences(rule, date(2025, 12, 31))[0],
+                         [date(2025, 1, 1), date(2025, 1, 15), date(2025, 1, 29)])
+
+    def test_materialize_idempotent(self):
+        rule = self.make_rule(frequency=RecurringRule.MONTHLY, start_date=date(2025, 1, 10))
+        self.make_rule(frequency=RecurringRule.DAILY, start_date=date(2025, 3, 1), end_date=date(2025, 3, 5))
+
+        report = materialize_rules(as_of=date(2025, 3, 31))
+        self.assertEqual((report['rules'], report['transactions']), (2, 3 + 5))
+        rule.refresh_from_db()
+        self.assertEqual(rule.next_date, date(2025, 4, 10))
+        # Повторный запуск ничего не создает
+        self.assertEqual(materialize_rules(as_of=date(2025, 3, 31))['transactions'], 0)
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 8)
+        self.assertEqual(DailyRollup.objects.filter(user=self.user).aggregate(Sum('count'))['count__sum'], 8)
+
+        with self.assertRaises(IntegrityError):
+            Transaction.objects.create(user=self.user, type=Transaction.EXPENSE, amount=1,
+                                       date=date(2025, 1, 10), recurring_rule=rule)
+
+    def test_command(self):
+        self.make_rule(frequency=RecurringRule.YEARLY, start_date=date(2024, 2, 29))
+        call_command('materialize_recurring', '--date', '2026-03-01', stdout=StringIO())
+        self.assertEqual(
+            list(Transaction.objects.filter(user=self.user).order_by('date').values_list('date', flat=True)),
+            [date(2024, 2, 29), date(2025, 2, 28), date(2026, 2, 28)],
+        )
+
+    def test_api(self):
+        start = timezone.localdate() - timedelta(days=2)
+        response = self.client.post('/api/recurring/', {
+            'type': 'expense', 'amount': '9.99', 'category': self.rent.pk,
+            'frequency': 'daily', 'start_date': start.isoformat(),
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        # Наступившие даты создаются сразу
+        self.assertEqual(response.json()['next_date'], (start + timedelta(days=3)).isoformat())
+        self.assertEqual(Transaction.objects.filter(recurring_rule_id=response.json()['id']).count(), 3)
+
+        url = f"/api/recurring/{response.json()['id']}/"
+        self.assertEqual(self.client.patch(url, {'interval': 2}, content_type='application/json').status_code, 400)
+        response = self.client.patch(url, {'amount': '12.00'}, content_type='application/json')
+        self.assertEqual(response.json()['amount'], '12.00')
+
+    def test_create_form_repeat(self):
+        day = timezone.localdate() - timedelta(days=14)
+        self.client.post('/transactions/create/', {
+            'type': 'expense', 'category': self.rent.pk, 'amount': '5',
+            'description': 'Подписка', 'date': day.isoformat(), 'repeat': 'weekly',
+        })
+        transactions = Transaction.objects.filter(user=self.user, description='Подписка').order_by('date')
+        self.assertEqual([t.date for t in transactions], [day, day + timedelta(weeks=1), day + timedelta(weeks=2)])
+        self.assertEqual(len({t.recurring_rule_id for t in transactions}), 1)
+
+
+class AccountLedgerTests(TestCase):
+    """Остатки счетов: снимок, остаток на дату, нарастающий остаток"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('ledger', password='ledger')
+        cls.card = Account.objects.create(user=cls.user, name='Карта', opening_balance=1000)
+        cls.cash = Account.objects.create(user=cls.user, name='Наличные', kind=Account.CASH)
+        for day, kind, amount, account in [
+            (1, Transaction.INCOME, 500, cls.card),
+            (2, Transaction.EXPENSE, 200, cls.card),
+            (2, Transaction.EXPENSE, 50, cls.cash),
+            (3, Transaction.EXPENSE, 100, cls.card),
+            (5, Transaction.INCOME, 300, cls.card),
+            (5, Transaction.EXPENSE, 20, None),
+        ]:
+            Transaction.objects.create(user=cls.user, type=kind, amount=amount,
+                                       date=date(2025, 1, day), account=account)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def assertBalancesRebuilt(self):
+        """Инкрементальные остатки и итоги счетов совпадают с полным пересчетом"""
+        def snapshot():
+            return (
+                dict(Account.objects.values_list('pk', 'balance')),
+                set(AccountRollup.objects.values_list('account_id', 'date', 'total', 'count')),
+            )
+        incremental = snapshot()
+        rebuild_rollups(self.user)
+        self.assertEqual(snapshot(), incremental)
+
+    def test_balance_follows_writes(self):
+        self.card.refresh_from_db()
+        self.assertEqual(self.card.balance, 1000 + 500 - 200 - 100 + 300)
+
+        transaction = Transaction.objects.get(account=self.card, amount=200)
+        transaction.amount = 250
+        transaction.save()
+        transaction.account = self.cash
+        transaction.save()
+        Transaction.objects.get(amount=300).delete()
+        self.card.opening_balance = 0
+        self.card.save()
+        self.assertEqual(self.card.balance, 500 - 100)
+        self.cash.refresh_from_db()
+        self.assertEqual(self.cash.balance, -300)
+
+        response = self.client.post('/api/transactions/batch/', {
+            'create': [{'type': 'income', 'amount': '70', 'date': '2025-01-06', 'account': self.cash.pk}],
+            'update': [{'id': transaction.pk, 'account': self.card.pk}],
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.cash.refresh_from_db()
+        self.assertEqual(self.cash.balance, -50 + 70)
+        self.assertBalancesRebuilt()
+
+    def test_balance_as_of(self):
+        with self.assertNumQueries(1):
+            balances = {account.name: account.balance_as_of
+                        for account in balances_as_of(self.user, date(2025, 1, 2))}
+        self.assertEqual(balances, {'Карта': 1300, 'Наличные': -50})
+
+        response = self.client.get('/api/accounts/?as_of=2025-01-04')
+        self.assertEqual([row['balance_as_of'] for row in response.json()], ['1200.00', '-50.00'])
+        self.assertEqual(self.client.get('/api/accounts/?as_of=2025-13-01').status_code, 400)
+
+        statistics = self.client.get('/api/statistics/?from_date=2025-01-01&to_date=2025-01-03').json()
+        self.assertEqual(statistics['closing_balance'], 1200 - 50)
+
+    def test_running_balance(self):
+        rows = self.client.get('/api/transactions/?ordering=date').json()
+        self.assertEqual(
+            [(row['amount'], row['running_balance']) for row in rows],
+            [('500.00', '1500.00'), ('200.00', '1300.00'), ('50.00', '-50.00'),
+             ('100.00', '1200.00'), ('300.00', '1500.00'), ('20.00', None)],
+        )
+        # Страница с фильтром: остаток по всему счету, а не по выборке
+        data = self.client.get('/api/transactions/?pagination=cursor&type=expense&account=%d&page_size=1'
+                               % self.card.pk).json()
+        self.assertEqual([row['running_balance'] for row in data['results']], ['1200.00'])
+
+        response = self.client.get('/')
+        self.assertEqual([t.running_balance for t in response.context['transactions']][:2],
+                         [None, 1500])
+
+
+class CurrencyTests(TestCase):
+    """Курсы из CSV с заполнением пропусков и итоги в валюте отчета"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('currency', password='currency')
+        import_rates(StringIO(
+            'date,currency,rate\n'
+            '2025-01-01,USD,90\n'
+            '2025-01-03,USD,100\n'
+            '2025-01-01,EUR,100\n'
+        ))
+        cls.dollars = Account.objects.create(user=cls.user, name='Доллары', currency='USD')
+        for day, kind, amount, currency in [
+            (1, Transaction.EXPENSE, 1000, 'RUB'),
+            (2, Transaction.EXPENSE, 10, 'USD'),    # курс 2 января — заполнен курсом 1 января
+            (3, Transaction.EXPENSE, 1, 'EUR'),     # курса EUR на 3 января нет — последний известный
+            (10, Transaction.INCOME, 5, 'USD'),     # после последнего курса
+        ]:
+            Transaction.objects.create(user=cls.user, type=kind, amount=amount,
+                                       currency=currency, date=date(2025, 1, day))
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_import_fills_gaps(self):
+        rates = dict(ExchangeRate.objects.filter(currency='USD').values_list('date', 'rate'))
+        self.assertEqual(rates, {date(2025, 1, 1): 90, date(2025, 1, 2): 90, date(2025, 1, 3): 100})
+        # Следующий файл продолжает ряд от последнего курса в БД
+        self.assertEqual(import_rates(StringIO('date,currency,rate\n2025-01-05,USD,110\n')), {'USD': 2})
+        self.assertEqual(ExchangeRate.objects.get(currency='USD', date=date(2025, 1, 4)).rate, 100)
+        with self.assertRaises(InvalidRates):
+            import_rates(StringIO('date,currency,rate\n2025-01-05,RUB,1\n'))
+
+    def test_converted_statistics(self):
+        period = (date(2025, 1, 1), date(2025, 1, 31))
+        for currency in ('RUB', 'USD', 'EUR'):
+            expected = {
+                kind: sum(convert(t.amount, t.currency, t.date, currency)
+                          for t in Transaction.objects.filter(user=self.user, type=kind))
+                for kind in (Transaction.INCOME, Transaction.EXPENSE)
+            }
+            for use_rollups in (True, False):
+                with self.subTest(currency=currency, use_rollups=use_rollups), \
+                        override_settings(STATISTICS_USE_ROLLUPS=use_rollups):
+                    statistics = compute_statistics(self.user, *period, currency)
+                    self.assertAlmostEqual(statistics['total_income'], float(expected['income']), places=2)
+                    self.assertAlmostEqual(statistics['total_expense'], float(expected['expense']), places=2)
+        statistics = compute_statistics(self.user, *period)
+        self.assertEqual((statistics['total_expense'], statistics['total_income']), (1000 + 900 + 100, 500))
+
+    def test_api(self):
+        query = '/api/statistics/?from_date=2025-01-01&to_date=2025-01-31'
+        self.assertEqual(self.client.get(query).json()['total_expense'], 2000)
+        self.assertEqual(self.client.get(query + '&currency=XXX').status_code, 400)
+
+        # Новые курсы сбрасывают кэш статистики
+        import_rates(StringIO('date,currency,rate\n2025-01-02,USD,95\n'))
+        self.assertEqual(self.client.get(query).json()['total_expense'], 1000 + 950 + 100)
+
+        # Смена базовой валюты — итоги списка и статистика по умолчанию в ней
+        response = self.client.patch('/api/profile/', {'base_currency': 'EUR'}, content_type='application/json')
+        self.assertEqual(response.json(), {'base_currency': 'EUR'})
+        data = self.client.get(query).json()
+        self.assertEqual(data['currency'], 'EUR')
+        self.assertAlmostEqual(data['total_income'], 5.0, places=2)
+        totals = self.client.get('/api/transactions/?pagination=cursor').json()['totals']
+        self.assertEqual(totals['currency'], 'EUR')
+
+        # Валюта операции по счету — валюта счета
+        response = self.client.post('/api/transactions/', {
+            'type': 'expense', 'amount': '3', 'date': '2025-01-05', 'account': self.dollars.pk,
+        }, content_type='application/json')
+        self.assertEqual(response.json()['currency'], 'USD')
+        response = self.client.post('/api/transactions/', {
+            'type': 'expense', 'amount': '3', 'date': '2025-01-05', 'account': self.dollars.pk, 'currency': 'EUR',
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+class BudgetTests(TestCase):
+    """Потраченное по бюджетам — из инкрементальной сводки, оповещения — пакетно"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('budget', password='budget')
+        cls.food = Category.objects.create(name='Еда', user=cls.user)
+        cls.home = Category.objects.create(name='Дом', user=cls.user)
+        cls.budget = Budget.objects.create(user=cls.user, category=cls.food, limit=1000)
+        for day, kind, amount, category in [
+            (date(2025, 6, 2), Transaction.EXPENSE, 300, cls.food),
+            (date(2025, 6, 5), Transaction.EXPENSE, 100, cls.food),
+            (date(2025, 6, 6), Transaction.INCOME, 5000, cls.food),
+            (date(2025, 6, 7), Transaction.EXPENSE, 700, cls.home),
+            (date(2025, 7, 1), Transaction.EXPENSE, 900, cls.food),
+        ]:
+            Transaction.objects.create(user=cls.user, type=kind, amount=amount, date=day, category=category)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def status(self, day=date(2025, 6, 10)):
+        return compute_budget_statuses(self.user, day)[self.budget.pk]
+
+    def test_status_follows_writes(self):
+        # Бюджеты и строки сводки месяца
+        with self.assertNumQueries(2):
+            status = self.status()
+        self.assertEqual(
+            (status['spent'], status['remaining'], status['projected'], status['projected_overspend']),
+            (400, 600, 1200, 200),
+        )
+        self.assertEqual(status['status'], Budget.WARNING)
+
+        transaction = Transaction.objects.get(amount=700)
+        transaction.category = self.food
+        transaction.save()
+        self.assertEqual(self.status()['status'], Budget.EXCEEDED)
+        Transaction.objects.get(amount=300).delete()
+        self.assertEqual(self.status()['spent'], 800)
+
+        incremental = set(SpendingRollup.objects.values_list('category_id', 'month', 'total', 'count'))
+        rebuild_rollups(self.user)
+        self.assertEqual(set(SpendingRollup.objects.values_list('category_id', 'month', 'total', 'count')),
+                         incremental)
+
+    def test_check_budgets(self):
+        self.assertEqual(check_budgets(as_of=date(2025, 6, 10), batch_size=1), {'budgets': 1, 'changed': 1})
+        self.budget.refresh_from_db()
+        self.assertEqual((self.budget.alert, self.budget.alert_month), (Budget.WARNING, date(2025, 6, 1)))
+        # Повторный проход ничего не меняет
+        self.assertEqual(check_budgets(as_of=date(2025, 6, 10))['changed'], 0)
+        # Новый месяц — уровень пересчитывается заново
+        check_budgets(as_of=date(2025, 7, 31))
+        self.budget.refresh_from_db()
+        self.assertEqual((self.budget.alert, self.budget.alert_month), (Budget.OK, date(2025, 7, 1)))
+
+    def test_api_and_page(self):
+        response = self.client.post('/api/budgets/', {'category': self.home.pk, 'limit': '500'},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertEqual((data['currency'], data['spent'], data['status']), ('RUB', '0.00', Budget.OK))
+        response = self.client.post('/api/budgets/', {'category': self.home.pk, 'limit': '100'},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+        Transaction.objects.create(user=self.user, type=Transaction.EXPENSE, amount=80,
+                                   category=self.home, date=timezone.localdate())
+        budgets = {row['category']: row for row in self.client.get('/api/budgets/').json()}
+        self.assertEqual(budgets[self.home.pk]['spent'], '80.00')
+        self.assertEqual(budgets[self.home.pk]['remaining'], '420.00')
+
+        response = self.client.get('/budgets/')
+        self.assertEqual([budget.spent for budget in response.context['budgets']], [80, 0])
+
+        # Удаление — только POST
+        budget = Budget.objects.get(user=self.user, category=self.home)
+        self.assertEqual(self.client.get(f'/budgets/{budget.pk}/delete/').status_code, 405)
+        self.assertRedirects(self.client.post(f'/budgets/{budget.pk}/delete/'), '/budgets/')
+        self.assertFalse(Budget.objects.filter(pk=budget.pk).exists())
+
+
+@skipUnless(connection.vendor == 'sqlite', 'PRAGMA — только для SQLite')
+class DatabaseProfileTests(TestCase):
+    def test_sqlite_pragmas_applied(self):
+        # Хук connection_created настраивает каждое соединение
+        pragmas = sqlite_pragmas(connection)
+        expected = {'synchronous': 1, 'busy_timeout': 20000, 'temp_store': 2}
+        if settings.DATABASE_PROFILE != 'sqlite':
+            self.skipTest('Профиль без настроенных PRAGMA')
+        self.assertEqual({name: pragmas[name] for name in expected}, expected)
+
+
+class ArchiveTests(TestCase):
+    """Перенос старых операций в архив и чтение горячих и архивных вместе"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('archive', password='archive')
+        cls.food = Category.objects.create(user=cls.user, name='Еда')
+        cls.card = Account.objects.create(user=cls.user, name='Карта')
+        cls.old = Transaction.objects.create(user=cls.user, type=Transaction.EXPENSE, amount=900, category=cls.food,
+                                             account=cls.card, date=date(2020, 3, 1), description='Старый ноутбук')
+        cls.recent = Transaction.objects.create(user=cls.user, type=Transaction.EXPENSE, amount=100,
+                                                category=cls.food, account=cls.card, date=timezone.localdate(),
+                                                description='Обед')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def archive(self):
+        out = StringIO()
+        call_command('archive_transactions', stdout=out)
+        return out.getvalue()
+
+    def api_rows(self, query=''):
+        return self.client.get(f'/api/transactions/?{query}').json()
+
+    def test_archive_keeps_reads_and_rollups(self):
+        self.assertIn('2020 — 1', self.archive())
+        self.assertFalse(Transaction.objects.filter(pk=self.old.pk).exists())
+        self.assertTrue(ArchivedTransaction.objects.filter(pk=self.old.pk, description='Старый ноутбук').exists())
+        # Сводки и остаток не изменились, полный пересчет читает и архив
+        self.card.refresh_from_db()
+        self.assertEqual(self.card.balance, -1000)
+        rebuild_rollups(self.user)
+        self.assertEqual(compute_statistics(self.user, date(2020, 1, 1), timezone.localdate())['total_expense'], 1000)
+
+        rows = self.api_rows()
+        self.assertEqual([(row['id'], row['archived']) for row in rows],
+                         [(self.recent.pk, False), (self.old.pk, True)])
+        self.assertEqual(rows[1]['running_balance'], '-900.00')
+        self.assertEqual([row['id'] for row in self.api_rows('search=ноутбук')], [self.old.pk])
+        # Период после горизонта — только горячая таблица
+        self.assertEqual([row['id'] for row in self.api_rows(f'date_from={archive_horizon()}')], [self.recent.pk])
+        self.assertEqual(self.client.get('/api/categories/').json()[0]['transaction_count'], 2)
+
+        # Архив — только для чтения
+        self.assertEqual(self.client.get(f'/api/transactions/{self.old.pk}/').status_code, 200)
+        response = self.client.patch(f'/api/transactions/{self.old.pk}/', {'amount': '1'},
+                                     content_type='application/json')
+        self.assertEqual(response.status_code, 404)
+
+    def test_restore_when_horizon_moves_back(self):
+        self.archive()
+        with override_settings(ARCHIVE={**settings.ARCHIVE, 'AFTER_DAYS': 365 * 50}):
+            self.assertIn('Из архива: 2020 — 1', self.archive())
+        self.assertFalse(ArchivedTransaction.objects.exists())
+        # Вернувшаяся операция снова в FTS-индексе горячей таблицы
+        transactions = Transaction.objects.filter(user=self.user)
+        self.assertEqual(list(search_transactions(transactions, 'ноутбук')), [self.old])
+
+
+class BenchmarkTests(TestCase):
+    """Генератор синтетических данных и сравнение прогонов бенчмарка"""
+
+    def test_synthetic_rows_are_deterministic(self):
+        profiles = category_profiles(20)
+        self.assertEqual(len({profile[0] for profile in profiles}), 20)
+        args = (profiles, 500, date(2025, 1, 1), date(2025, 12, 31))
+        rows = list(synthetic_rows(*args, seed='1:0'))
+        self.assertEqual(rows, list(synthetic_rows(*args, seed='1:0')))
+        self.assertNotEqual(rows, list(synthetic_rows(*args, seed='2:0')))
+        incomes = sum(kind == Transaction.INCOME for kind, *_ in rows)
+        self.assertTrue(0 < incomes < 75)
+        self.assertTrue(all(amount >= 1 for _, _, amount, _, _ in rows))
+
+    def test_compare_results(self):
+        baseline = {'1000': {'list': {'p50_ms': 10.0, 'p95_ms': 12.0, 'queries': 5, 'peak_kb': 100}}}
+        current = {'1000': {'list': {'p50_ms': 10.8, 'p95_ms': 20.0, 'queries': 7, 'peak_kb': 120}},
+                   '5000': {'list': {'p50_ms': 99.0, 'p95_ms': 99.0, 'queries': 9, 'peak_kb': 900}}}
+        regressions = compare_results(baseline, current, threshold=0.2)
+        self.assertEqual({(row['size'], row['metric']) for row in regressions},
+                         {('1000', 'p95_ms'), ('1000', 'queries')})
+
+    def test_command_writes_json(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bench.json')
+            call_command('benchmark', rows=[60], users=2, requests=1, endpoint=['api-statistics', 'category-list'],
+                         output=path, stdout=StringIO())
+            with open(path, encoding='utf-8') as output:
+                report = json.load(output)
+        self.assertEqual(set(report['results']['60']), {'api-statistics', 'category-list'})
+        self.assertEqual(report['results']['60']['category-list']['errors'], 0)
+        self.assertIsNotNone(report['results']['60']['category-list']['queries'])
+        self.assertFalse(User.objects.filter(username__startswith=SYNTHETIC_PREFIX).exists())
+
+
+class LeanReadTests(TestCase):
+    """Списки операций через values() и orjson: тот же ответ, что у сериализатора"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('lean', password='lean')
+        cls.food = Category.objects.create(user=cls.user, name='Еда')
+        cls.card = Account.objects.create(user=cls.user, name='Карта', opening_balance=1000)
+        for day, kind, amount, account in [
+            (date(2020, 3, 1), Transaction.EXPENSE, Decimal('900.5'), cls.card),
+            (timezone.localdate() - timedelta(days=1), Transaction.INCOME, 300, cls.card),
+            (timezone.localdate(), Transaction.EXPENSE, 20, None),
+        ]:
+            Transaction.objects.create(user=cls.user, type=kind, amount=amount, category=cls.food,
+                                       account=account, date=day, description='Покупка\u2028')
+        call_command('archive_transactions', stdout=StringIO())
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_matches_serializer(self):
+        transactions = attach_running_balances(list(LedgerTransaction.objects.filter(user=self.user).order_by('date')))
+        expected = json.loads(JSONRenderer().render(TransactionSerializer(transactions, many=True).data))
+        self.assertEqual([row['archived'] for row in expected], [True, False, False])
+        self.assertEqual(self.client.get('/api/transactions/?ordering=date').json(), expected)
+        # Период после горизонта архива — горячая таблица
+        rows = self.client.get(f'/api/transactions/?ordering=date&date_from={archive_horizon()}').json()
+        self.assertEqual(rows, expected[1:])
+
+    def test_fields_and_embed(self):
+        rows = self.client.get('/api/transactions/?ordering=date&fields=id,amount&embed=category').json()
+        self.assertEqual([list(row) for row in rows], [['id', 'amount', 'category_name']] * 3)
+        self.assertEqual({row['category_name'] for row in rows}, {'Еда'})
+
+        response = self.client.get('/api/transactions/?fields=id,password')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', response.json()['fields'][0])
+        self.assertEqual(self.client.get('/api/transactions/?embed=user').status_code, 400)
+
+    @skipUnless(find_spec('orjson'), 'orjson не установлен')
+    def test_orjson_renderer_matches_drf(self):
+        from .renderers import ORJSONParser, ORJSONRenderer
+
+        data = {
+            'amount': Decimal('12.50'), 'label': gettext_lazy('Еда'), 'day': date(2025, 1, 2),
+            'at': datetime(2025, 1, 2, 3, 4, 5, 678901, tzinfo=dt_timezone.utc), 'ids': Category.objects.none(),
+            'text': 'строка\u2028', 1: None,
+        }
+        content = ORJSONRenderer().render(data)
+        self.assertEqual(content, JSONRenderer().render(data))
+        self.assertEqual(ORJSONParser().parse(BytesIO(content)), json.loads(content))
+
+        response = self.client.post('/api/transactions/', '{"amount": ', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+class ConditionalRequestTests(TransactionTestCase):
+    """
+    ETag и Last-Modified: 304 без запросов к данным, новые валидаторы
+    после записи. TransactionTestCase — из-за async-представлений
+    """
+
+    URLS = ['/api/transactions/', '/api/categories/', '/api/statistics/', '/statistics/',
+            '/api/async/transactions/', '/api/async/statistics/']
+
+    def setUp(self):
+        self.user = User.objects.create_user('conditional', password='conditional')
+        self.food = Category.objects.create(user=self.user, name='Еда')
+        Transaction.objects.create(user=self.user, type=Transaction.EXPENSE, amount=100, category=self.food,
+                                   date=timezone.localdate())
+        Transaction.objects.create(user=self.user, type=Transaction.EXPENSE, amount=50, category=self.food,
+                                   date=date(2020, 3, 1))
+        self.client.force_login(self.user)
+
+    def etags(self):
+        return {url: self.client.get(url)['ETag'] for url in self.URLS}
+
+    def test_not_modified(self):
+        for url in self.URLS:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response['ETag'].startswith('W/"'))
+            self.assertIn('private', response['Cache-Control'])
+
+            with CaptureQueriesContext(connection) as queries:
+                cached = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(cached.status_code, 304, url)
+            self.assertEqual(cached.content, b'')
+            self.assertEqual(cached['ETag'], response['ETag'])
+            # Только сессия и пользователь
+            tables = {table for query in queries for table in re.findall(r'FROM "(\w+)"', query['sql'])}
+            self.assertEqual(tables, {'django_session', 'auth_user'}, url)
+
+            cached = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+            self.assertEqual(cached.status_code, 304, url)
+
+        # Другие параметры — другой ETag; ответы с ошибкой без валидаторов
+        self.assertNotEqual(self.client.get('/api/transactions/?type=income')['ETag'],
+                            self.client.get('/api/transactions/')['ETag'])
+        response = self.client.get('/api/transactions/?fields=secret')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_validators_follow_writes(self):
+        before = self.etags()
+        self.client.post('/api/transactions/', {'type': 'income', 'amount': '10', 'date': '2025-01-01'},
+                         content_type='application/json')
+        after = self.etags()
+        self.assertFalse(set(before.values()) & set(after.values()))
+
+        self.food.name = 'Продукты'
+        self.food.save()
+        self.assertFalse(set(after.values()) & set(self.etags().values()))
+
+        # Перенос в архив меняет признак archived в списке
+        before = self.etags()
+        call_command('archive_transactions', stdout=StringIO())
+        self.assertNotEqual(self.etags()['/api/transactions/'], before['/api/transactions/'])
+
+
+class BatchTests(RollupAssertionsMixin, TestCase):
+    """Пакетные операции: все или ничего, частичное применение, сводки, число запросов"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('batch', password='batch')
+        cls.food = Category.objects.create(user=cls.user, name='Еда')
+        cls.card = Account.objects.create(user=cls.user, name='Карта')
+        cls.transactions = [
+            Transaction.objects.create(user=cls.user, type=Transaction.EXPENSE, amount=10 + index,
+                                       category=cls.food, account=cls.card,
+                                       date=date(2025, 1, 1 + index % 28))
+            for index in range(60)
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def batch(self, payload, query=''):
+        return self.client.post(f'/api/transactions/batch/{query}', payload, content_type='application/json')
+
+    def test_update_queries_do_not_grow(self):
+        def queries(size):
+            payload = {'update': [{'id': transaction.pk, 'amount': str(size)}
+                                  for transaction in self.transactions[:size]]}
+            with CaptureQueriesContext(connection) as captured:
+                self.assertEqual(self.batch(payload).status_code, 200)
+            return len(captured)
+
+        # Сводки обновляются запросом на месяц (мелкие изменения — по строке),
+        # поэтому все операции — в одном месяце и пакеты не меньше 10
+        self.assertEqual(len({queries(size) for size in (10, 30, 60)}), 1)
+
+    def test_all_or_nothing(self):
+        target, other = self.transactions[:2]
+        response = self.batch({
+            'create': [{'type': 'income', 'amount': '50', 'date': '2025-02-01'},
+                       {'type': 'income', 'amount': 'много', 'date': '2025-02-01'}],
+            'update': [{'id': target.pk, 'amount': '1'}, {'id': 10 ** 9, 'amount': '1'}],
+            'delete': [other.pk],
+        })
+        self.assertEqual(response.status_code, 400)
+        results = response.json()
+        self.assertEqual([(row['index'], row['status']) for row in results['create']], [(0, 424), (1, 400)])
+        self.assertIn('amount', results['create'][1]['errors'])
+        self.assertEqual([(row['index'], row['status'], row['id']) for row in results['update']],
+                         [(0, 424, target.pk), (1, 404, 10 ** 9)])
+        self.assertEqual([(row['status'], row['id']) for row in results['delete']], [(424, other.pk)])
+        # Ничего не применено
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 60)
+        target.refresh_from_db()
+        self.assertEqual(target.amount, 10)
+
+    def test_allow_partial(self):
+        target, other = self.transactions[:2]
+        response = self.batch({
+            'create': [{'type': 'income', 'amount': '50', 'date': '2025-02-01', 'category': self.food.pk},
+                       {'type': 'income', 'amount': '-'}],
+            'update': [{'id': target.pk, 'amount': '1', 'date': '2025-03-01', 'type': 'income'}],
+            'delete': [other.pk, 10 ** 9],
+        }, query='?allow_partial=1')
+        self.assertEqual(response.status_code, 207)
+        results = response.json()
+        self.assertEqual([row['status'] for row in results['create']], [201, 400])
+        created = Transaction.objects.get(pk=results['create'][0]['id'])
+        self.assertEqual(results['create'][0]['data']['amount'], '50.00')
+        self.assertEqual(created.category, self.food)
+        self.assertEqual(results['update'][0]['data']['date'], '2025-03-01')
+        self.assertEqual([row['status'] for row in results['delete']], [204, 404])
+        self.assertFalse(Transaction.objects.filter(pk=other.pk).exists())
+        self.assertRollupsRebuilt(self.user)
+
+    def test_conflicts(self):
+        first, second = self.transactions[:2]
+        response = self.batch({
+            'update': [{'id': first.pk, 'amount': '1'}, {'id': first.pk, 'amount': '2'},
+                       {'id': second.pk, 'amount': '3'}],
+            'delete': [second.pk],
+        })
+        self.assertEqual(response.status_code, 400)
+        updates = response.json()['update']
+        self.assertEqual([row['status'] for row in updates], [424, 400, 400])
+        self.assertIn('id', updates[1]['errors'])
+        # Чужие операции не видны
+        stranger = User.objects.create_user('stranger')
+        foreign = Transaction.objects.create(user=stranger, type=Transaction.EXPENSE, amount=1, date=date(2025, 1, 1))
+        response = self.batch({'update': [{'id': foreign.pk, 'amount': '2'}], 'delete': [foreign.pk]})
+        self.assertEqual([row['status'] for row in response.json()['delete']], [404])
+        self.assertEqual(self.batch({'create': [{}] * 1001}).status_code, 400)
+
+    def test_non_integer_ids(self):
+        target = self.transactions[0]
+        for payload in ({'update': [{'id': [target.pk], 'amount': '1'}]},
+                        {'update': [{'id': str(target.pk), 'amount': '1'}]},
+                        {'update': [{'amount': '1'}]},
+                        {'update': [target.pk]},
+                        {'delete': [{'id': target.pk}]},
+                        {'delete': [[target.pk]]},
+                        {'delete': [True]}):
+            with self.subTest(payload=payload):
+                response = self.batch(payload)
+                self.assertEqual(response.status_code, 400)
+                name = next(iter(payload))
+                self.assertEqual(response.json()[name]['0']['id'], ['Ожидался целочисленный id'])
+        target.refresh_from_db()
+        self.assertEqual(target.amount, 10)
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 60)
+
+    def test_concurrent_change_before_apply(self):
+        # Операцию меняют другим запросом между проверкой пакета и его применением
+        target = self.transactions[0]
+        other = Category.objects.create(user=self.user, name='Другое')
+        validate = TransactionBatch.validate
+
+        def validate_then_change(batch):
+            valid = validate(batch)
+            concurrent = Transaction.objects.get(pk=target.pk)
+            concurrent.date, concurrent.category, concurrent.amount = date(2025, 5, 1), other, Decimal('77')
+            concurrent.save()
+            return valid
+
+        with mock.patch.object(TransactionBatch, 'validate', autospec=True, side_effect=validate_then_change):
+            response = self.batch({'update': [{'id': target.pk, 'type': 'income'}]})
+        self.assertEqual(response.status_code, 200)
+        target.refresh_from_db()
+        self.assertEqual((target.type, target.amount, target.date), ('income', 77, date(2025, 5, 1)))
+        self.assertRollupsRebuilt(self.user)
+
+    def test_rollups_follow_bulk_writes(self):
+        cash = Account.objects.create(user=self.user, name='Наличные')
+        travel = Category.objects.create(user=self.user, name='Путешествия')
+        response = self.batch({
+            'create': [{'type': 'expense', 'amount': str(index + 1), 'date': f'2025-02-{index + 1:02d}',
+                        'category': travel.pk, 'account': cash.pk} for index in range(12)],
+            'update': [{'id': transaction.pk, 'category': travel.pk, 'account': cash.pk, 'type': 'income',
+                        'date': '2025-04-01'} for transaction in self.transactions[:8]],
+            'delete': [transaction.pk for transaction in self.transactions[8:16]],
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertRollupsRebuilt(self.user)
+        statistics = compute_statistics(self.user, date(2025, 1, 1), date(2025, 4, 30))
+        self.assertEqual(statistics['transaction_count'], 60 - 8 + 12)
+
+
+class SyncTests(TestCase):
+    """Инкрементальная синхронизация: токены, отметки удаления, полный снимок"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('sync', password='sync')
+        cls.food = Category.objects.create(user=cls.user, name='Еда')
+        cls.fun = Category.objects.create(user=cls.user, name='Досуг')
+        cls.transactions = [
+            Transaction.objects.create(user=cls.user, type=Transaction.EXPENSE, amount=10 + index,
+                                       category=cls.fun if index == 0 else cls.food, date=date(2025, 1, 1 + index))
+            for index in range(4)
+        ]
+        # Старые записи — вне окна перекрытия токена
+        an_hour_ago = timezone.now() - timedelta(hours=1)
+        Transaction.objects.filter(user=cls.user).update(updated_at=an_hour_ago)
+        Category.objects.filter(user=cls.user).update(updated_at=an_hour_ago)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def sync(self, token=None):
+        response = self.client.get('/api/sync/', {'token': token} if token else {})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def changed_ids(self, data, name='transactions'):
+        return {row['id'] for row in data[name]['changed']}
+
+    def test_round_trip(self):
+        snapshot = self.sync()
+        self.assertTrue(snapshot['full'])
+        self.assertEqual(self.changed_ids(snapshot), {transaction.pk for transaction in self.transactions})
+        self.assertEqual(self.changed_ids(snapshot, 'categories'), {self.food.pk, self.fun.pk})
+
+        data = self.sync(snapshot['token'])
+        self.assertFalse(data['full'])
+        self.assertEqual(self.changed_ids(data), set())
+
+        created = Transaction.objects.create(user=self.user, type=Transaction.INCOME, amount=5, date=date(2025, 2, 1))
+        updated, deleted = self.transactions[1:3]
+        updated.amount = 99
+        updated.save()
+        deleted_pk = deleted.pk
+        deleted.delete()
+        data = self.sync(snapshot['token'])
+        self.assertFalse(data['full'])
+        self.assertEqual(self.changed_ids(data), {created.pk, updated.pk})
+        self.assertEqual(data['transactions']['deleted'], [deleted_pk])
+        self.assertEqual(data['categories'], {'changed': [], 'deleted': []})
+
+        # Следующий токен не повторяет удаление, отмеченное час назад
+        Tombstone.objects.filter(object_id=deleted_pk).update(deleted_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(self.sync(self.sync(snapshot['token'])['token'])['transactions']['deleted'], [])
+
+    def test_category_deletion_touches_transactions(self):
+        token = self.sync()['token']
+        category_pk = self.fun.pk
+        self.fun.delete()
+        data = self.sync(token)
+        self.assertEqual(data['categories']['deleted'], [category_pk])
+        changed = data['transactions']['changed']
+        self.assertEqual([(row['id'], row['category']) for row in changed], [(self.transactions[0].pk, None)])
+
+    def test_full_snapshot_for_bad_tokens(self):
+        expired = encode_token(timezone.now() - TOMBSTONE_RETENTION - timedelta(days=1))
+        future = encode_token(timezone.now() + timedelta(days=1))
+        for token in (expired, future, 'не-токен', encode_token(timezone.now())[:-3]):
+            with self.subTest(token=token):
+                data = self.sync(token)
+                self.assertTrue(data['full'])
+                self.assertEqual(len(data['transactions']['changed']), 4)
+                self.assertEqual(data['transactions']['deleted'], [])
+
+
+    def test_user_deletion_skips_tombstones(self):
+        # Удаление пользователя — объектом и запросом (массовое действие админки)
+        for delete in (lambda user: user.delete(), lambda user: User.objects.filter(pk=user.pk).delete()):
+            user = User.objects.create_user('gone', password='gone')
+            category = Category.objects.create(user=user, name='Еда')
+            account = Account.objects.create(user=user, name='Карта')
+            Transaction.objects.create(user=user, category=category, account=account, type=Transaction.EXPENSE,
+                                       amount=10)
+            user_pk = user.pk
+            delete(user)
+            self.assertFalse(User.objects.filter(pk=user_pk).exists())
+            self.assertFalse(Tombstone.objects.filter(user_id=user_pk).exists())
+            self.assertFalse(Transaction.objects.filter(user_id=user_pk).exists())
+            self.assertFalse(Account.objects.filter(user_id=user_pk).exists())
+
+class ImportTests(RollupAssertionsMixin, TestCase):
+    """Импорт CSV и JSON Lines: отчет по строкам, категории, сводки и кэш"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('import', password='import')
+        cls.food = Category.objects.create(user=cls.user, name='Еда')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def post(self, body, content_type='text/csv', query=''):
+        return self.client.post(f'/api/transactions/import/{query}', body, content_type=content_type)
+
+    def test_csv_report(self):
+        response = self.post(
+            '\ufefftype,amount,category,description,date\n'
+            'expense,120.50, еда ,Обед,2025-01-10\n'
+            'expense,300,Такси,,2025-01-11\n'
+            'expense,много,Еда,Ужин,2025-01-12\n'
+        )
+        # Одна некорректная строка не отменяет импорт остальных
+        self.assertEqual(response.status_code, 201)
+        report = response.json()
+        self.assertEqual((report['total'], report['created'], report['failed']), (3, 2, 1))
+        self.assertEqual([error['row'] for error in report['errors']], [3])
+        self.assertIn('amount', report['errors'][0]['errors'])
+
+        self.assertEqual(Category.objects.filter(user=self.user).count(), 2)
+        imported = Transaction.objects.filter(user=self.user).order_by('date')
+        self.assertEqual([(t.category.name, t.amount, t.description) for t in imported],
+                         [('Еда', Decimal('120.50'), 'Обед'), ('Такси', 300, '')])
+
+    def test_jsonl_upload(self):
+        upload = BytesIO(
+            '{"type": "income", "amount": "1000", "date": "2025-01-05", "category": "Зарплата"}\n'
+            '\n'
+            '{"type": "income", "amount": \n'
+            '[1, 2]\n'
+            '{"type": "expense", "amount": "10", "date": "2025-01-06"}\n'.encode()
+        )
+        upload.name = 'transactions.jsonl'
+        response = self.client.post('/api/transactions/import/', {'file': upload})
+        self.assertEqual(response.status_code, 201)
+        report = response.json()
+        self.assertEqual((report['total'], report['created']), (4, 2))
+        self.assertEqual([error['row'] for error in report['errors']], [2, 3])
+        self.assertTrue(Category.objects.filter(user=self.user, name='Зарплата').exists())
+
+    def test_without_creating_categories(self):
+        response = self.post(
+            'type,amount,category,date\nexpense,10,Еда,2025-01-01\nexpense,20,Кино,2025-01-02\n',
+            query='?create_categories=0',
+        )
+        self.assertEqual(response.status_code, 201)
+        report = response.json()
+        self.assertEqual(report['created'], 1)
+        self.assertIn('category', report['errors'][0]['errors'])
+        self.assertFalse(Category.objects.filter(name='Кино').exists())
+
+        # Ни одной корректной строки — 400 с тем же отчетом
+        response = self.post('type,amount\nexpense,-\n')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['failed'], 1)
+        self.assertEqual(self.post('', query='?file_format=xml').status_code, 400)
+
+    def test_rollups_and_cache(self):
+        query = '?from_date=2025-01-01&to_date=2025-01-31'
+        self.assertEqual(self.client.get('/api/statistics/' + query).json()['transaction_count'], 0)
+        rows = ''.join(f'expense,{index + 1},Еда,2025-01-{index % 28 + 1:02d}\n' for index in range(30))
+        importer = TransactionImporter(self.user, batch_size=7)
+        report = importer.run(iter_rows(StringIO('type,amount,category,date\n' + rows), 'csv'))
+        self.assertEqual(report['created'], 30)
+
+        statistics = self.client.get('/api/statistics/' + query).json()
+        self.assertEqual(statistics['transaction_count'], 30)
+        self.assertEqual(statistics['total_expense'], sum(range(1, 31)))
+        self.assertRollupsRebuilt(self.user)
+
+
+class CacheInvalidationTests(TestCase):
+    """Версия данных в ключе кэша: статистика пересчитывается после любой записи"""
+
+    PERIOD = (date(2025, 1, 1), date(2025, 1, 31))
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('cache', password='cache')
+        cls.food = Category.objects.create(user=cls.user, name='Еда')
+        for day, amount in [(1, 100), (2, 200), (3, 300)]:
+            Transaction.objects.create(user=cls.user, type=Transaction.EXPENSE, amount=amount,
+                                       category=cls.food, date=date(2025, 1, day))
+
+    def setUp(self):
+        get_cache().clear()
+        self.client.force_login(self.user)
+
+    def assertRecomputed(self, total_expense):
+        """Первый запрос после записи — пересчет, повторный — из кэша"""
+        reset_cache_stats()
+        for _ in range(2):
+            self.assertEqual(get_statistics(self.user, *self.PERIOD)['total_expense'], total_expense)
+        stats = get_cache_stats()
+        self.assertEqual((stats['misses'], stats['hits']), (1, 1))
+
+    def test_orm_writes(self):
+        self.assertRecomputed(600)
+        transaction = Transaction.objects.create(user=self.user, type=Transaction.EXPENSE, amount=50,
+                                                 category=self.food, date=date(2025, 1, 4))
+        self.assertRecomputed(650)
+        transaction.amount = 70
+        transaction.save()
+        self.assertRecomputed(670)
+        transaction.delete()
+        self.assertRecomputed(600)
+
+        version = get_data_version(self.user.pk)
+        self.food.name = 'Продукты'
+        self.food.save()
+        self.assertNotEqual(get_data_version(self.user.pk), version)
+
+    @override_settings(STATISTICS_USE_ROLLUPS=False)
+    def test_bulk_and_batch_writes(self):
+        self.assertRecomputed(600)
+        Transaction.objects.filter(user=self.user, amount=100).update(amount=150)
+        self.assertRecomputed(650)
+        Transaction.objects.bulk_create([
+            Transaction(user=self.user, type=Transaction.EXPENSE, amount=10, date=date(2025, 1, 5)),
+        ])
+        self.assertRecomputed(660)
+        target = Transaction.objects.get(user=self.user, amount=150)
+        response = self.client.post('/api/transactions/batch/', {'delete': [target.pk]},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertRecomputed(510)
+
+    def test_rate_change(self):
+        Transaction.objects.create(user=self.user, type=Transaction.EXPENSE, amount=10, currency='USD',
+                                   date=date(2025, 1, 5))
+        # Без курса сумма в итоги не попадает
+        self.assertRecomputed(600)
+        import_rates(StringIO('date,currency,rate\n2025-01-01,USD,90\n'))
+        self.assertRecomputed(1500)
+
+    def test_deploy_check_requires_shared_cache(self):
+        self.assertEqual([warning.id for warning in check_shared_statistics_cache(None)], ['transactions.W001'])
+        with tempfile.TemporaryDirectory() as directory:
+            shared = {**settings.CACHES, 'statistics': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory,
+            }}
+            with override_settings(CACHES=shared):
+                self.assertEqual(check_shared_statistics_cache(None), [])
+
+
+class RollupConsistencyTests(RollupAssertionsMixin, TestCase):
+    """Сводки, обновляемые сигналами, совпадают с rebuild_rollups после любых изменений"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('rollups', password='rollups')
+        cls.food = Category.objects.create(name='Продукты', user=cls.user)
+        cls.salary = Category.objects.create(name='Зарплата', user=cls.user)
+        cls.card = Account.objects.create(user=cls.user, name='Карта', opening_balance=1000)
+        cls.cash = Account.objects.create(user=cls.user, name='Наличные', kind=Account.CASH)
+
+    def create(self, **fields):
+        values = {
+            'user': self.user, 'category': self.food, 'account': self.card,
+            'type': Transaction.EXPENSE, 'amount': Decimal('100.00'), 'date': date(2025, 1, 31),
+        }
+        values.update(fields)
+        return Transaction.objects.create(**values)
+
+    def assertNoEmptyRows(self):
+        for model in ROLLUP_MODELS:
+            self.assertFalse(model.objects.filter(user=self.user, count__lte=0).exists(), model.__name__)
+
+    def test_create_update_delete(self):
+        first = self.create()
+        second = self.create(amount=Decimal('50.00'))
+        self.assertRollupsRebuilt(self.user)
+
+        # Дата: другой день, месяц и день недели
+        first.date = date(2025, 2, 3)
+        first.save()
+        self.assertRollupsRebuilt(self.user)
+        # Категория и счет
+        first.category, first.account = self.salary, self.cash
+        first.save()
+        self.assertRollupsRebuilt(self.user)
+        # Тип: расход становится доходом (знак в остатке счета меняется)
+        first.type = Transaction.INCOME
+        first.save()
+        self.assertRollupsRebuilt(self.user)
+        # Без категории и счета, в другой валюте
+        second.category, second.account, second.currency = None, None, 'USD'
+        second.save()
+        self.assertRollupsRebuilt(self.user)
+
+        first.delete()
+        self.assertRollupsRebuilt(self.user)
+        second.delete()
+        self.assertRollupsRebuilt(self.user)
+        self.assertNoEmptyRows()
+        self.assertFalse(DailyRollup.objects.filter(user=self.user).exists())
+
+    def test_category_and_account_deletion(self):
+        self.create()
+        self.create(type=Transaction.INCOME, category=self.salary, account=self.cash, date=date(2025, 1, 5))
+        self.food.delete()
+        self.cash.delete()
+        self.assertRollupsRebuilt(self.user)
+
+    def test_bulk_path(self):
+        # Больше SMALL_DELTA ключей за раз — изменения применяются пакетно
+        with defer_rollups():
+            transactions = [self.create(date=date(2025, 1, 1) + timedelta(days=index * 5)) for index in range(8)]
+        self.assertRollupsRebuilt(self.user)
+
+        with defer_rollups():
+            for index, transaction in enumerate(transactions):
+                transaction.date += timedelta(days=index * 3)
+                transaction.category = self.salary if index % 2 else self.food
+                transaction.type = Transaction.INCOME if index % 3 else Transaction.EXPENSE
+                transaction.save()
+            # Создание и удаление внутри одного блока взаимно погашаются
+            self.create(date=date(2024, 12, 1)).delete()
+        self.assertRollupsRebuilt(self.user)
+
+        with defer_rollups():
+            for transaction in transactions[:6]:
+                transaction.delete()
+        self.assertRollupsRebuilt(self.user)
+        self.assertNoEmptyRows()
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('pages', password='pages')
+        # Много совпадающих дат и сумм: порядок внутри них задает только id
+        Transaction.objects.bulk_create([
+            Transaction(user=cls.user, type=Transaction.EXPENSE, amount=Decimal(10 * (index % 3) + 5),
+                        date=date(2025, 1, 1 + index % 4))
+            for index in range(23)
+        ])
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def walk(self, ordering, page_size=4):
+        url = f'/api/transactions/?pagination=cursor&page_size={page_size}&ordering={ordering}'
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            self.assertLessEqual(len(data['results']), page_size)
+            ids.extend(item['id'] for item in data['results'])
+            url = data['next']
+        return ids
+
+    def test_walk_every_ordering(self):
+        for ordering, keys in ORDERINGS.items():
+            with self.subTest(ordering=ordering):
+                expected = list(
+                    Transaction.objects.filter(user=self.user).order_by(*keys).values_list('pk', flat=True)
+                )
+                ids = self.walk(ordering)
+                # Без повторов и пропусков, в порядке сортировки
+                self.assertEqual(ids, expected)
+
+    def test_page_boundaries(self):
+        queryset = Transaction.objects.filter(user=self.user)
+        total = queryset.count()
+        for page_size in (1, 5, total - 1, total, total + 1):
+            with self.subTest(page_size=page_size):
+                items, cursor, pages = [], None, 0
+                while True:
+                    page, cursor = keyset_page(queryset, 'amount', cursor, page_size)
+                    items.extend(page)
+                    pages += 1
+                    if cursor is None:
+                        break
+                self.assertEqual(len({item.pk for item in items}), total)
+                self.assertEqual(pages, -(-total // page_size))
+
+    def test_invalid_cursors(self):
+        item = Transaction.objects.filter(user=self.user).first()
+
+        def raw(payload):
+            return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+        cursors = {
+            'мусор': '!!!',
+            'не JSON': base64.urlsafe_b64encode(b'not json').decode(),
+            'не объект': raw([1, 2]),
+            'без id': raw({'o': '-date', 'v': '2025-01-01'}),
+            'чужая сортировка': encode_cursor('amount', item),
+            'плохая дата': raw({'o': '-date', 'v': '2025-13-01', 'id': item.pk}),
+            'не дата': raw({'o': '-date', 'v': 'yesterday', 'id': item.pk}),
+            'плохой id': raw({'o': '-date', 'v': '2025-01-01', 'id': 'x'}),
+        }
+        for name, cursor in cursors.items():
+            with self.subTest(name):
+                with self.assertRaises(InvalidCursor):
+                    decode_cursor('-date', cursor)
+                response = self.client.get(f'/api/transactions/?cursor={cursor}')
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(response.json()['detail'], 'Некорректный курсор')
+                response = self.client.get(f'/?cursor={cursor}')
+                self.assertEqual(response.status_code, 404)
+
+        for value in ('abc', 'NaN', 'Infinity'):
+            with self.subTest(amount=value):
+                cursor = raw({'o': 'amount', 'v': value, 'id': item.pk})
+                response = self.client.get(f'/api/transactions/?ordering=amount&cursor={cursor}')
+                self.assertEqual(response.status_code, 404)
+
+
+def legacy_statistics(user, date_from, date_to):
+    """
+    Показатели так, как их считали StatisticsTemplateView и StatisticsView
+    до движка statistics.py: отдельный запрос на каждый показатель
+    """
+    def to_float(value):
+        return float(value) if value is not None else 0
+
+    transactions = Transaction.objects.filter(user=user, date__range=[date_from, date_to])
+    total_income = to_float(transactions.filter(type='income').aggregate(total=Sum('amount'))['total'])
+    total_expense = to_float(transactions.filter(type='expense').aggregate(total=Sum('amount'))['total'])
+
+    def by_category(rows):
+        return [
+            {'category__name': row['category__name'], 'total': to_float(row['total'])}
+            for row in rows.values('category__name').annotate(total=Sum('amount')).order_by('-total')
+        ]
+
+    monthly_trend = {}
+    for entry in transactions.annotate(month=TruncMonth('date')).values('month', 'type').annotate(
+        total=Sum('amount')
+    ).order_by('month'):
+        month = monthly_trend.setdefault(entry['month'].strftime('%Y-%m'), {'income': 0, 'expense': 0})
+        month[entry['type']] = to_float(entry['total'])
+
+    weekday_data = [
+        {'weekday': WEEKDAY_NAMES[item['weekday']], 'total': to_float(item['total']), 'count': item['count']}
+        for item in transactions.annotate(weekday=ExtractWeekDay('date')).values('weekday').annotate(
+            total=Sum('amount'), count=Count('id')
+        ).order_by('weekday')
+    ]
+    expense_count = transactions.filter(type='expense').count()
+    return {
+        'total_income': total_income,
+        'total_expense': total_expense,
+        'balance': total_income - total_expense,
+        'expense_by_category': by_category(transactions.filter(type='expense')),
+        'income_by_category': by_category(transactions.filter(type='income')),
+        'category_summary': by_category(transactions),
+        'monthly_trend': monthly_trend,
+        'weekday_data': weekday_data,
+        'transaction_count': transactions.count(),
+        'avg_transaction': total_expense / expense_count if expense_count else 0,
+    }
+
+
+class StatisticsEngineTests(TransactionTestCase):
+    """
+    Движок статистики (из сводок и из транзакций) отдает то же, что прежние
+    представления. TransactionTestCase: страница статистики читает данные
+    из потоков со своими соединениями
+    """
+    PERIOD = (date(2025, 1, 10), date(2025, 4, 20))
+
+    def setUp(self):
+        self.user = User.objects.create_user('engine', password='engine')
+        categories = [Category.objects.create(name=name, user=self.user) for name in ('Еда', 'Дом', 'Зарплата')]
+        # Суммы по категориям различаются: порядок по убыванию однозначен
+        for index in range(40):
+            Transaction.objects.create(
+                user=self.user,
+                category=categories[index % 3] if index % 7 else None,
+                type=Transaction.INCOME if index % 5 == 0 else Transaction.EXPENSE,
+                amount=Decimal('10.25') * (index + 1),
+                date=date(2025, 1, 1) + timedelta(days=index * 3),
+            )
+        # Чужие операции в статистику не попадают
+        other = User.objects.create_user('other', password='other')
+        Transaction.objects.create(user=other, type=Transaction.EXPENSE, amount=999, date=date(2025, 2, 1))
+
+    def assertMatchesLegacy(self, statistics, date_from, date_to):
+        expected = legacy_statistics(self.user, date_from, date_to)
+        self.assertEqual({key: statistics[key] for key in expected}, expected)
+
+    def test_matches_legacy_queries(self):
+        periods = [self.PERIOD, (date(2025, 2, 1), date(2025, 2, 28)), (date(2026, 1, 1), date(2026, 2, 1))]
+        for use_rollups in (True, False):
+            for period in periods:
+                with self.subTest(use_rollups=use_rollups, period=period):
+                    with override_settings(STATISTICS_USE_ROLLUPS=use_rollups):
+                        self.assertMatchesLegacy(compute_statistics(self.user, *period), *period)
+
+    def test_views(self):
+        self.client.force_login(self.user)
+        expected = legacy_statistics(self.user, *self.PERIOD)
+        query = f'?from_date={self.PERIOD[0]}&to_date={self.PERIOD[1]}'
+
+        data = self.client.get('/api/statistics/' + query).json()
+        for key in ('total_income', 'total_expense', 'balance', 'category_summary', 'monthly_trend',
+                    'transaction_count'):
+            self.assertEqual(data[key], expected[key], key)
+
+        context = self.client.get('/statistics/' + query).context
+        for key in ('total_income', 'total_expense', 'balance', 'expense_by_category', 'income_by_category',
+                    'monthly_trend', 'weekday_data', 'transaction_count', 'avg_transaction'):
+            self.assertEqual(context[key], expected[key], key)
+        self.assertEqual(json.loads(context['weekday_data_json']), expected['weekday_data'])
+
+    def test_impossible_dates_use_default_period(self):
+        self.assertEqual(get_period('2024-02-30', '2025-13-01'), get_period())
+        self.assertEqual(get_period('2025-02-01', '2025-02-31'), (date(2025, 2, 1), get_period()[1]))
+        self.client.force_login(self.user)
+        for url in ('/api/statistics/', '/statistics/', '/api/async/statistics/'):
+            with self.subTest(url=url):
+                response = self.client.get(url + '?from_date=2024-02-30&to_date=2025-02-31')
+                self.assertEqual(response.status_code, 200)
+
+    def test_single_grouped_query(self):
+        with override_settings(STATISTICS_USE_ROLLUPS=False), CaptureQueriesContext(connection) as queries:
+            list(statistics_buckets(self.user, *self.PERIOD))
+        self.assertEqual(len(queries), 1)
+
+
+class ExportTests(TestCase):
+    """Потоковые выгрузки — корректные CSV, JSON Lines и XLSX с фильтрами списка"""
+    XLSX_NS = {'x': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('export', password='export')
+        cls.food = Category.objects.create(name='Еда', user=cls.user)
+        # Описания с разделителями, кавычками, переводами строк, разметкой и управляющими символами
+        descriptions = ['', 'кофе, "латте"', 'строка 1\nстрока 2', '<b>&amp;</b>', 'звонок\x07', 'обычная']
+        for index in range(12):
+            Transaction.objects.create(
+                user=cls.user,
+                category=cls.food if index % 2 else None,
+                type=Transaction.EXPENSE if index % 3 else Transaction.INCOME,
+                amount=Decimal('12.50') + index,
+                description=descriptions[index % len(descriptions)],
+                date=date(2025, 3, 1) + timedelta(days=index),
+            )
+        other = User.objects.create_user('other', password='other')
+        Transaction.objects.create(user=other, type=Transaction.EXPENSE, amount=1, date=date(2025, 3, 2))
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def export(self, file_format, query=''):
+        response = self.client.get(f'/api/transactions/export/?file_format={file_format}&background=0{query}')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], EXPORT_FORMATS[file_format])
+        self.assertIn(f'.{file_format}"', response['Content-Disposition'])
+        return b''.join(response.streaming_content)
+
+    def expected(self, **filters):
+        return list(Transaction.objects.filter(user=self.user, **filters).order_by('-date', '-id'))
+
+    def test_csv(self):
+        content = self.export('csv', '&type=expense&ordering=-date')
+        self.assertTrue(content.startswith(codecs.BOM_UTF8))
+        header, *rows = csv.reader(StringIO(content.decode('utf-8-sig')))
+        self.assertEqual(tuple(header), EXPORT_HEADERS)
+        expected = self.expected(type=Transaction.EXPENSE)
+        self.assertEqual([int(row[0]) for row in rows], [transaction.pk for transaction in expected])
+        for row, transaction in zip(rows, expected):
+            self.assertEqual(row[1:7], [
+                transaction.date.isoformat(), transaction.type, str(transaction.amount), transaction.currency,
+                transaction.category.name if transaction.category else '', transaction.description,
+            ])
+
+    def test_jsonl(self):
+        content = self.export('jsonl', '&date_from=2025-03-03&date_to=2025-03-08')
+        items = [json.loads(line) for line in content.decode().splitlines()]
+        expected = self.expected(date__range=[date(2025, 3, 3), date(2025, 3, 8)])
+        self.assertEqual([item['id'] for item in items], [transaction.pk for transaction in expected])
+        self.assertEqual(set(items[0]), set(EXPORT_HEADERS))
+        self.assertEqual(
+            {item['description'] for item in items},
+            {transaction.description for transaction in expected},
+        )
+
+    def xlsx_rows(self, content):
+        archive = zipfile.ZipFile(BytesIO(content))
+        self.assertIsNone(archive.testzip())
+        self.assertIn('[Content_Types].xml', archive.namelist())
+        sheet = ElementTree.fromstring(archive.read('xl/worksheets/sheet1.xml'))
+        return [
+            [''.join(cell.itertext()) for cell in row.findall('x:c', self.XLSX_NS)]
+            for row in sheet.iterfind('x:sheetData/x:row', self.XLSX_NS)
+        ]
+
+    def test_xlsx(self):
+        header, *rows = self.xlsx_rows(self.export('xlsx'))
+        self.assertEqual(tuple(header), EXPORT_HEADERS)
+        expected = self.expected()
+        self.assertEqual([int(row[0]) for row in rows], [transaction.pk for transaction in expected])
+        self.assertEqual([Decimal(row[3]) for row in rows], [transaction.amount for transaction in expected])
+        # Управляющие символы недопустимы в XML и вырезаются, разметка экранируется
+        self.assertEqual(
+            {row[6] for row in rows},
+            {transaction.description.replace('\x07', '') for transaction in expected},
+        )
+
+    @skipUnless(find_spec('openpyxl'), 'нужен openpyxl')
+    def test_xlsx_opens_in_openpyxl(self):
+        import openpyxl
+
+        workbook = openpyxl.load_workbook(BytesIO(self.export('xlsx')), read_only=True)
+        rows = list(workbook.active.iter_rows(values_only=True))
+        self.assertEqual(rows[0], EXPORT_HEADERS)
+        self.assertEqual(len(rows), len(self.expected()) + 1)
+
+    def test_streamed_in_chunks(self):
+        # Небольшие куски: ответ отдается по частям, а склейка остается корректной
+        with mock.patch('transactions.exports.ROWS_PER_CHUNK', 5):
+            for file_format in EXPORT_FORMATS:
+                with self.subTest(file_format=file_format):
+                    response = self.client.get(f'/api/transactions/export/?file_format={file_format}&background=0')
+                    chunks = list(response.streaming_content)
+                    self.assertGreater(len(chunks), 2)
+                    content = b''.join(chunks)
+                    if file_format == 'csv':
+                        self.assertEqual(len(list(csv.reader(StringIO(content.decode('utf-8-sig'))))), 13)
+                    elif file_format == 'jsonl':
+                        self.assertEqual(len(content.decode().splitlines()), 12)
+                    else:
+                        self.assertEqual(len(self.xlsx_rows(content)), 13)
+
+    def test_empty_and_unknown_format(self):
+        header, *rows = csv.reader(StringIO(self.export('csv', '&date_from=2030-01-01').decode('utf-8-sig')))
+        self.assertEqual((tuple(header), rows), (EXPORT_HEADERS, []))
+        self.assertEqual(self.export('jsonl', '&date_from=2030-01-01'), b'')
+        self.assertEqual(self.xlsx_rows(self.export('xlsx', '&date_from=2030-01-01')), [list(EXPORT_HEADERS)])
+        response = self.client.get('/api/transactions/export/?file_format=pdf')
+        self.assertEqual(response.status_code, 400)
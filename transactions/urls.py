@@ -10,7 +10,11 @@ from .views import (
     CategoryListView,
     CategoryCreateView,
     CategoryDeleteView,
+    BudgetListView,
+    BudgetCreateView,
+    BudgetDeleteView,
     StatisticsTemplateView,
+    MetricsView,
 )
 router = DefaultRouter()
 router.register(r'categories', CategoryViewSet, basename='category')
@@ -27,6 +31,12 @@ urlpatterns = [
     path('categories/', CategoryListView.as_view(), name='category_list'),
     path('categories/create/', CategoryCreateView.as_view(), name='category_create'),
     path('categories/<int:pk>/delete/', CategoryDeleteView.as_view(), name='category_delete'),
+
+    path('budgets/', BudgetListView.as_view(), name='budget_list'),
+    path('budgets/create/', BudgetCreateView.as_view(), name='budget_create'),
+    path('budgets/<int:pk>/delete/', BudgetDeleteView.as_view(), name='budget_delete'),
     
     path('statistics/', StatisticsTemplateView.as_view(), name='statistics_view'),
+
+    path('metrics/', MetricsView.as_view(), name='metrics'),
 ]
\ No newline at end of file
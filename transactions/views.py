@@ -1,46 +1,64 @@
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
 from django.shortcuts import redirect
 from django.utils.decorators import method_decorator
-from django.views.generic import ListView, CreateView, UpdateView, DeleteView, TemplateView
+from django.views.generic import ListView, CreateView, UpdateView, DeleteView, TemplateView, View
 from django.views.decorators.http import require_POST
-from django.urls import reverse_lazy
-from django.db.models import Sum
+from django.urls import reverse, reverse_lazy
 from django.contrib import messages
-from django.db.models.functions import TruncMonth
-from django.db.models import Count
-from django.db.models.functions import ExtractWeekDay
 
 # DRF импорты (е REST API)
-from rest_framework import viewsets, permissions, filters
+from rest_framework import viewsets, permissions, serializers, status
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 
 # Локальные импорты
-from .models import Category, Transaction
-from .serializers import CategorySerializer, TransactionSerializer
-from .forms import TransactionForm, CategoryForm
+from .models import CURRENCY_CHOICES, Account, Budget, Category, Job, Profile, RecurringRule, Transaction
+from .serializers import (
+    AccountSerializer, BudgetSerializer, CategorySerializer, JobSerializer, ProfileSerializer,
+    RecurringRuleSerializer, TransactionSerializer,
+)
+from .forms import BudgetForm, TransactionForm, CategoryForm
+from .statistics import (
+    aget_statistics, decimal_to_float, get_period, get_statistics, get_totals, statistics_response_data,
+)
+from .pagination import InvalidCursor, KeysetPagination, akeyset_page, keyset_page
+from .importers import FORMATS, TransactionImporter, detect_format, iter_rows
+from .filters import TransactionFilter, filter_signature, filter_transactions
+from .exports import EXPORT_FORMATS, export_response
+from .batch import TransactionBatch
+from .sync import changes_since
+from .cache import get_cache_stats, peek
+from .recurring import materialize_rules, rule_from_transaction
+from .jobs import InvalidJobParams, export_params, statistics_params, submit_job, validate_params
+from .instrumentation import registry, render_prometheus
+from .async_utils import run_in_thread
+from .analytics import DEFAULT_PERIOD_DAYS as ANALYTICS_PERIOD_DAYS, analytics_available, get_analytics
+from .ledger import attach_running_balances, balances_as_of
+from .currency import UnknownCurrency, get_base_currency, parse_currency
+from .budgets import attach_statuses, get_budget_statuses
+from .archive import params_source, transaction_source
+from .lean import InvalidFields, lean_queryset, lean_rows, parse_fields
+from .conditional import conditional
+from asgiref.sync import sync_to_async
 
 # Дополнительные
-from collections import OrderedDict
-from datetime import datetime, timedelta
+import asyncio
 import json
-from decimal import Decimal
-
-def decimal_to_float(value):
-    """Преобразование Decimal в float для JSON сериализации"""
-    if isinstance(value, Decimal):
-        return float(value)
-    return value
+import os
 
+@method_decorator(conditional, name='list')
 class CategoryViewSet(viewsets.ModelViewSet):
     serializer_class = CategorySerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Category.objects.filter(user=self.request.user)
+        return Category.objects.filter(user=self.request.user).with_usage(get_base_currency(self.request.user))
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -48,19 +66,119 @@ class CategoryViewSet(viewsets.ModelViewSet):
 
 
     
+@method_decorator(conditional, name='list')
 class TransactionViewSet(viewsets.ModelViewSet):
     serializer_class = TransactionSerializer
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
-    filterset_fields = ['type', 'category']  # фильтр по типу и категории
-    ordering_fields = ['date', 'amount']     # сортировка по дате и сумме
-    ordering = ['-date']                     # сортировка по умолчанию
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = TransactionFilter      # фильтры, поиск и сортировка — как в HTML-списке
+    pagination_class = KeysetPagination      # ?pagination=cursor — курсорные страницы
 
     def get_queryset(self):
-        return Transaction.objects.filter(user=self.request.user)
+        # Чтение — вместе с архивом, если период его захватывает (archive.py);
+        # изменять и удалять можно только операции горячей таблицы
+        model = Transaction
+        if self.action in ('list', 'retrieve', 'export'):
+            model = params_source(self.request.query_params)
+        return model.objects.filter(user=self.request.user)
+
+    def get_totals(self, queryset):
+        """Блок totals для страниц списка (см. KeysetPagination)"""
+        totals = get_totals(self.request.user, queryset, filter_signature(self.request.query_params))
+        return {key: decimal_to_float(value) for key, value in totals.items()}
     
+    def list(self, request, *args, **kwargs):
+        """
+        Список — быстрым путем (lean.py): строки values() без моделей
+        и сериализатора; ?fields= — только нужные поля, ?embed=category —
+        с названием категории
+        """
+        try:
+            fields = parse_fields(request.query_params)
+        except InvalidFields as error:
+            return Response({'fields': [str(error)]}, status=status.HTTP_400_BAD_REQUEST)
+        queryset = lean_queryset(self.filter_queryset(self.get_queryset()), fields)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(lean_rows(page, fields))
+        return Response(lean_rows(queryset, fields))
+
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)  # Добавьте этот метод!    
+
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_transactions(self, request):
+        """
+        Массовый импорт: файл CSV/JSON Lines в поле file (multipart)
+        или телом запроса с Content-Type text/csv / application/x-ndjson
+        """
+        content_type = request.content_type or ''
+        if content_type.startswith('multipart/'):
+            upload = request.FILES.get('file')
+            if upload is None:
+                return Response({'detail': 'Не передан файл (поле file)'},
+                                status=status.HTTP_400_BAD_REQUEST)
+            stream, name = upload, upload.name
+        else:
+            # Тело читается потоком, без разбора парсерами DRF
+            stream, name = request._request, ''
+
+        file_format = request.query_params.get('file_format') or detect_format(name, content_type)
+        if file_format not in FORMATS:
+            return Response({'detail': f'Неизвестный формат: {file_format}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        importer = TransactionImporter(
+            request.user,
+            create_categories=request.query_params.get('create_categories', '1') != '0',
+        )
+        report = importer.run(iter_rows(stream, file_format))
+        response_status = status.HTTP_201_CREATED if report['created'] else status.HTTP_400_BAD_REQUEST
+        return Response(report, status=response_status)
+
+    @action(detail=False, methods=['get'], url_path='export')
+    def export(self, request):
+        """
+        Потоковая выгрузка (?file_format=csv|jsonl|xlsx) с теми же фильтрами,
+        что и у списка (TransactionFilter)
+        """
+        file_format = request.query_params.get('file_format', 'csv')
+        if file_format not in EXPORT_FORMATS:
+            return Response({'detail': f'Неизвестный формат: {file_format}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        queryset = self.filter_queryset(self.get_queryset())
+
+        # Большие выгрузки — фоновой задачей (файл — GET /api/jobs/<id>/download/)
+        def is_large():
+            return queryset.count() > settings.JOBS['EXPORT_INLINE_MAX_ROWS']
+
+        if wants_background(request, is_large):
+            job, _ = submit_job(request.user, Job.EXPORT, export_params(file_format, request.query_params))
+            return job_accepted(request, job)
+        return export_response(queryset, file_format)
+
+    @action(detail=False, methods=['post'], url_path='batch')
+    def batch(self, request):
+        """
+        Пакет операций {"create": [...], "update": [{"id": ..., ...}], "delete": [id, ...]}.
+        По умолчанию применяется целиком или никак; ?allow_partial=1 —
+        применить корректные операции, даже если в пакете есть ошибки
+        """
+        payload = request.data if isinstance(request.data, dict) else {}
+        batch = TransactionBatch(request, payload)
+        valid = batch.validate()
+        allow_partial = request.query_params.get('allow_partial') == '1'
+
+        if valid:
+            batch.apply()
+            response_status = status.HTTP_200_OK
+        elif allow_partial:
+            batch.apply()
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            batch.mark_skipped()
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response(batch.results(), status=response_status)
 # Template Views (новые)
 
 
@@ -72,40 +190,51 @@ class TransactionListView(ListView):
     paginate_by = 20
 
     def get_queryset(self):
-        queryset = Transaction.objects.filter(user=self.request.user)
-        
-        # Фильтры
-        transaction_type = self.request.GET.get('type')
-        category_id = self.request.GET.get('category')
-        ordering = self.request.GET.get('ordering', '-date')
-        date_from = self.request.GET.get('date_from')
-        date_to = self.request.GET.get('date_to')
-        
-        if transaction_type:
-            queryset = queryset.filter(type=transaction_type)
-        if category_id:
-            queryset = queryset.filter(category_id=category_id)
-        if date_from:
-            queryset = queryset.filter(date__gte=date_from)
-        if date_to:
-            queryset = queryset.filter(date__lte=date_to)
-            
-        queryset = queryset.order_by(ordering)
-        return queryset.select_related('category')
+        queryset = params_source(self.request.GET).objects.filter(user=self.request.user)
+        queryset = filter_transactions(queryset, self.request.GET)
+        return queryset.select_related('category', 'account')
+
+    def get_totals(self):
+        if not hasattr(self, 'totals'):
+            self.totals = get_totals(self.request.user, self.object_list, filter_signature(self.request.GET))
+        return self.totals
+
+    def get_paginator(self, queryset, per_page, **kwargs):
+        paginator = super().get_paginator(queryset, per_page, **kwargs)
+        # Число записей уже известно из итогов — без отдельного COUNT(*)
+        paginator.count = self.get_totals()['count']
+        return paginator
+
+    def paginate_queryset(self, queryset, page_size):
+        # ?page=N — прежняя постраничная навигация через OFFSET,
+        # иначе курсорный режим «Загрузить ещё» без COUNT(*)
+        if self.page_kwarg in self.request.GET:
+            return super().paginate_queryset(queryset, page_size)
+        try:
+            transactions, self.next_cursor = keyset_page(
+                queryset,
+                self.request.GET.get('ordering'),
+                self.request.GET.get('cursor'),
+                page_size,
+            )
+        except InvalidCursor:
+            raise Http404('Некорректный курсор')
+        return (None, None, transactions, False)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['categories'] = Category.objects.filter(user=self.request.user)
-        
-        # Подсчет итогов
-        queryset = self.get_queryset()
-        total_income = queryset.filter(type='income').aggregate(Sum('amount'))['amount__sum'] or 0
-        total_expense = queryset.filter(type='expense').aggregate(Sum('amount'))['amount__sum'] or 0
-        balance = total_income - total_expense
-        
-        context['total_income'] = total_income
-        context['total_expense'] = total_expense
-        context['balance'] = balance
+        context['accounts'] = Account.objects.filter(user=self.request.user).order_by('pk')
+        context['next_cursor'] = getattr(self, 'next_cursor', None)
+        context['transactions'] = attach_running_balances(context['transactions'])
+        
+        # Итоги по всей отфильтрованной выборке — один условный агрегат
+        totals = self.get_totals()
+        context['total_count'] = totals['count']
+        context['total_income'] = totals['total_income']
+        context['total_expense'] = totals['total_expense']
+        context['balance'] = totals['balance']
+        context['currency'] = totals['currency']
         
         return context
 
@@ -119,8 +248,15 @@ class TransactionCreateView(CreateView):
 
     def form_valid(self, form):
         form.instance.user = self.request.user
+        frequency = form.cleaned_data.get('repeat')
+        if frequency:
+            form.instance.recurring_rule = rule_from_transaction(form.instance, frequency)
         messages.success(self.request, 'Транзакция успешно создана')
-        return super().form_valid(form)
+        response = super().form_valid(form)
+        if frequency:
+            # Дата в прошлом — пропущенные повторы создаются сразу
+            materialize_rules(RecurringRule.objects.filter(pk=form.instance.recurring_rule_id))
+        return response
 
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
@@ -165,7 +301,7 @@ class CategoryListView(ListView):
     context_object_name = 'categories'
 
     def get_queryset(self):
-        return Category.objects.filter(user=self.request.user)
+        return Category.objects.filter(user=self.request.user).with_usage(get_base_currency(self.request.user))
 
 
 @method_decorator(login_required, name='dispatch')
@@ -212,243 +348,432 @@ def delete(self, request, *args, **kwargs):
 
 
 @method_decorator(login_required, name='dispatch')
+class BudgetListView(ListView):
+    """Бюджеты с потраченным за текущий месяц (статус — из сводок, см. budgets.py)"""
+    model = Budget
+    template_name = 'budgets/budget_list.html'
+    context_object_name = 'budgets'
+
+    def get_queryset(self):
+        budgets = Budget.objects.filter(user=self.request.user).select_related('category').order_by('category__name')
+        return attach_statuses(budgets, get_budget_statuses(self.request.user))
+
+
+@method_decorator(login_required, name='dispatch')
+class BudgetCreateView(CreateView):
+    model = Budget
+    form_class = BudgetForm
+    template_name = 'budgets/budget_form.html'
+    success_url = reverse_lazy('budget_list')
+
+    def get_initial(self):
+        return {'currency': get_base_currency(self.request.user)}
+
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['user'] = self.request.user
+        return kwargs
+
+    def form_valid(self, form):
+        form.instance.user = self.request.user
+        messages.success(self.request, 'Бюджет создан')
+        return super().form_valid(form)
+
+
+@method_decorator(login_required, name='dispatch')
+@method_decorator(require_POST, name='dispatch')
+class BudgetDeleteView(DeleteView):
+    model = Budget
+    success_url = reverse_lazy('budget_list')
+
+    def get_queryset(self):
+        return Budget.objects.filter(user=self.request.user)
+
+
+@method_decorator(login_required, name='get')
+@method_decorator(conditional, name='get')
 class StatisticsTemplateView(TemplateView):
+    """Страница статистики (async: запросы не занимают поток воркера)"""
     template_name = 'transactions/statistics.html'
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        user = self.request.user
-        
-        # Получаем даты из GET-параметров или используем значения по умолчанию
-        from_date = self.request.GET.get('from_date')
-        to_date = self.request.GET.get('to_date')
+    async def get(self, request, *args, **kwargs):
+        user = await request.auser()
+        context = self.get_context_data(**kwargs)
         
-        # Устанавливаем дефолтные значения (последние 30 дней)
-        if not from_date:
-            from_date = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
-        if not to_date:
-            to_date = datetime.now().strftime('%Y-%m-%d')
+        # Получаем даты из GET-параметров (по умолчанию последние 30 дней)
+        date_from, date_to = get_period(
+            request.GET.get('from_date'),
+            request.GET.get('to_date'),
+        )
         
+        # Неизвестная валюта — базовая валюта пользователя
+        try:
+            currency = parse_currency(request.GET.get('currency'))
+        except UnknownCurrency:
+            currency = None
+
         # Сохраняем даты для отображения в форме
-        context['from_date'] = from_date
-        context['to_date'] = to_date
+        context['from_date'] = date_from.isoformat()
+        context['to_date'] = date_to.isoformat()
+        context['currencies'] = CURRENCY_CHOICES
         
         # Получаем данные статистики
-        statistics_data = self._get_statistics_data(user, from_date, to_date)
+        statistics_data = await self._get_statistics_data(user, date_from, date_to, currency)
         context.update(statistics_data)
         
-        return context
+        return self.render_to_response(context)
     
-    def _get_statistics_data(self, user, from_date, to_date):
+    async def _get_statistics_data(self, user, date_from, date_to, currency=None):
         """Получение данных статистики для пользователя за период"""
-        
-        # Фильтруем транзакции пользователя по дате
-        transactions = Transaction.objects.filter(
+        # Самые крупные транзакции (отдельный запрос — нужны объекты)
+        largest_transactions = transaction_source(date_from).objects.filter(
             user=user,
-            date__range=[from_date, to_date]
-        )
-        
-        # Основные показатели (преобразуем Decimal в float)
-        total_income_result = transactions.filter(type='income').aggregate(
-            total=Sum('amount')
-        )
-        total_income = decimal_to_float(total_income_result['total']) or 0
-        
-        total_expense_result = transactions.filter(type='expense').aggregate(
-            total=Sum('amount')
-        )
-        total_expense = decimal_to_float(total_expense_result['total']) or 0
-        
-        balance = total_income - total_expense
-        
-        # Статистика по категориям расходов
-        expense_by_category = list(transactions.filter(
-            type='expense'
-        ).values(
-            'category__name'
-        ).annotate(
-            total=Sum('amount')
-        ).order_by('-total'))
-        
-        # Преобразуем Decimal в float для категорий расходов
-        for item in expense_by_category:
-            item['total'] = decimal_to_float(item['total']) or 0
-        
-        # Статистика по категориям доходов
-        income_by_category = list(transactions.filter(
-            type='income'
-        ).values(
-            'category__name'
-        ).annotate(
-            total=Sum('amount')
-        ).order_by('-total'))
-        
-        # Преобразуем Decimal в float для категорий доходов
-        for item in income_by_category:
-            item['total'] = decimal_to_float(item['total']) or 0
-        
-        # Динамика по месяцам
-        monthly_data = list(transactions.annotate(
-            month=TruncMonth('date')
-        ).values(
-            'month', 
-            'type'
-        ).annotate(
-            total=Sum('amount')
-        ).order_by('month'))
-        
-        # Форматируем данные для графика (преобразуем Decimal в float)
-        monthly_trend = OrderedDict()
-        for entry in monthly_data:
-            month_str = entry['month'].strftime('%Y-%m')
-            if month_str not in monthly_trend:
-                monthly_trend[month_str] = {'income': 0, 'expense': 0}
-            monthly_trend[month_str][entry['type']] = decimal_to_float(entry['total']) or 0
-        
-        # Самые крупные транзакции (уже будут Decimal в amount)
-        largest_transactions = transactions.select_related(
-            'category'
-        ).order_by('-amount')[:10]
-        
-        # Количество транзакций по дням недели (совместимо с SQLite)
-        weekday_data = list(transactions.annotate(
-            weekday=ExtractWeekDay('date')
-        ).values('weekday').annotate(
-            total=Sum('amount'),
-            count=Count('id')
-        ).order_by('weekday'))
-        
-        # Преобразуем Decimal в float для дней недели
-        for item in weekday_data:
-            item['total'] = decimal_to_float(item['total']) or 0
-        
-        # Преобразуем номера дней недели в названия
-        weekday_names = {
-            1: 'Воскресенье',
-            2: 'Понедельник', 
-            3: 'Вторник',
-            4: 'Среда',
-            5: 'Четверг',
-            6: 'Пятница',
-            7: 'Суббота'
-        }
-        
-        formatted_weekday_data = []
-        for item in weekday_data:
-            formatted_weekday_data.append({
-                'weekday': weekday_names.get(item['weekday'], f"День {item['weekday']}"),
-                'total': item['total'],
-                'count': item['count']
-            })
-        
-        # Подготавливаем данные для JavaScript (графиков)
-        context = {
-            'total_income': total_income,
-            'total_expense': total_expense,
-            'balance': balance,
-            'expense_by_category': expense_by_category,
-            'income_by_category': income_by_category,
-            'monthly_trend': monthly_trend,
-            'largest_transactions': largest_transactions,
-            'weekday_data': formatted_weekday_data,
-            'transaction_count': transactions.count(),
-        }
-        
-        # Средняя транзакция расходов (с проверкой деления на ноль)
-        expense_count = transactions.filter(type='expense').count()
-        if expense_count > 0:
-            context['avg_transaction'] = total_expense / expense_count
-        else:
-            context['avg_transaction'] = 0
-        
-        # JSON данные для JavaScript (теперь все значения float)
-        try:
-            context['monthly_trend_json'] = json.dumps(monthly_trend)
-            context['expense_by_category_json'] = json.dumps(expense_by_category)
-            context['income_by_category_json'] = json.dumps(income_by_category)
-            context['weekday_data_json'] = json.dumps(formatted_weekday_data)
-        except TypeError as e:
-            # Если все равно ошибка, показываем пустые данные
-            print(f"JSON serialization error: {e}")
-            context['monthly_trend_json'] = '{}'
-            context['expense_by_category_json'] = '[]'
-            context['income_by_category_json'] = '[]'
-            context['weekday_data_json'] = '[]'
+            date__range=[date_from, date_to]
+        ).select_related('category').order_by('-amount')[:10]
+
+        # Статистика, крупные транзакции и аналитика считаются одновременно
+        calls = [
+            aget_statistics(user, date_from, date_to, currency),
+            run_in_thread(list, largest_transactions),
+        ]
+        # Перевернутый период — пустая страница, как и без аналитики
+        # (AnalyticsView отвечает на него 400)
+        if analytics_available() and date_from <= date_to:
+            calls.append(run_in_thread(get_analytics, user, date_from, date_to, currency))
+        statistics, largest_transactions, *analytics = await asyncio.gather(*calls)
+        context = dict(statistics)
+        context['largest_transactions'] = largest_transactions
+        context['analytics'] = analytics[0] if analytics else None
+        
+        # JSON данные для JavaScript (все значения float)
+        context['monthly_trend_json'] = json.dumps(context['monthly_trend'])
+        context['expense_by_category_json'] = json.dumps(context['expense_by_category'])
+        context['income_by_category_json'] = json.dumps(context['income_by_category'])
+        context['weekday_data_json'] = json.dumps(context['weekday_data'])
+        context['analytics_daily_json'] = json.dumps(context['analytics']['daily'] if analytics else None)
             
         return context
 
 
+def wants_background(request, is_large):
+    """
+    ?background=1 — фоновой задачей, ?background=0 — сразу в ответе,
+    иначе по объему работы (is_large() вызывается только в этом случае)
+    """
+    value = request.query_params.get('background')
+    if value in ('0', '1'):
+        return value == '1'
+    return is_large()
+
+
+def job_accepted(request, job):
+    """202 с задачей; статус — GET /api/jobs/<id>/"""
+    return Response(
+        JobSerializer(job, context={'request': request}).data,
+        status=status.HTTP_202_ACCEPTED,
+        headers={'Location': reverse('job-detail', kwargs={'pk': job.pk})},
+    )
+
+
+@method_decorator(conditional, name='get')
 class StatisticsView(APIView):
+    """
+    Статистика за период. Длинные периоды (JOBS['STATISTICS_INLINE_MAX_DAYS'])
+    без готового результата в кэше считаются фоновой задачей: ответ 202
+    """
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        from_date = request.query_params.get('from_date')
-        to_date = request.query_params.get('to_date')
-        
-        # Устанавливаем дефолтные значения
-        if not from_date:
-            from_date = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
-        if not to_date:
-            to_date = datetime.now().strftime('%Y-%m-%d')
-
-        transactions = Transaction.objects.filter(
-            user=request.user,
-            date__range=[from_date, to_date]
+        date_from, date_to = get_period(
+            request.query_params.get('from_date'),
+            request.query_params.get('to_date'),
         )
+        try:
+            currency = parse_currency(request.query_params.get('currency'))
+        except UnknownCurrency as error:
+            return Response({'detail': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+
+        def is_large():
+            return (
+                (date_to - date_from).days > settings.JOBS['STATISTICS_INLINE_MAX_DAYS']
+                and peek('statistics', request.user.pk, [date_from, date_to, currency]) is None
+            )
+
+        if wants_background(request, is_large):
+            job, _ = submit_job(request.user, Job.STATISTICS, statistics_params(date_from, date_to, currency))
+            return job_accepted(request, job)
 
-        # Преобразуем Decimal в float
-        total_income_result = transactions.filter(type='income').aggregate(
-            total=Sum('amount')
+        statistics = get_statistics(request.user, date_from, date_to, currency)
+        return Response(statistics_response_data(statistics, date_from, date_to))
+
+
+class AnalyticsView(APIView):
+    """
+    Аналитика за период (по умолчанию последний год): скользящие средние
+    по дням, рост по месяцам, прогноз расходов, аномальные операции
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        if not analytics_available():
+            return Response({'detail': 'Аналитика недоступна: не установлен numpy'},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        date_from, date_to = get_period(
+            request.query_params.get('from_date'),
+            request.query_params.get('to_date'),
+            default_days=ANALYTICS_PERIOD_DAYS,
         )
-        total_income = decimal_to_float(total_income_result['total']) or 0
-        
-        total_expense_result = transactions.filter(type='expense').aggregate(
-            total=Sum('amount')
+        if date_from > date_to:
+            return Response({'detail': 'from_date позже to_date'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            currency = parse_currency(request.query_params.get('currency'))
+        except UnknownCurrency as error:
+            return Response({'detail': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(get_analytics(request.user, date_from, date_to, currency))
+
+
+# Async API (ASGI). DRF не поддерживает async-обработчики, поэтому это
+# обычные представления Django с аутентификацией по сессии
+
+
+NOT_AUTHENTICATED = {'detail': 'Учетные данные не были предоставлены.'}
+
+
+@method_decorator(conditional, name='get')
+class AsyncStatisticsView(View):
+    """Асинхронный вариант /api/statistics/ с тем же ответом"""
+
+    async def get(self, request):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return JsonResponse(NOT_AUTHENTICATED, status=status.HTTP_403_FORBIDDEN)
+
+        date_from, date_to = get_period(
+            request.GET.get('from_date'),
+            request.GET.get('to_date'),
+        )
+        try:
+            currency = parse_currency(request.GET.get('currency'))
+        except UnknownCurrency as error:
+            return JsonResponse({'detail': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        statistics = await aget_statistics(user, date_from, date_to, currency)
+        return JsonResponse(statistics_response_data(statistics, date_from, date_to))
+
+
+@method_decorator(conditional, name='get')
+class AsyncTransactionListView(View):
+    """
+    Асинхронный вариант GET /api/transactions/: те же фильтры
+    (TransactionFilter), поля (?fields=, ?embed=, см. lean.py)
+    и курсорные страницы с блоком totals
+    """
+    pagination_class = KeysetPagination
+
+    async def get(self, request):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return JsonResponse(NOT_AUTHENTICATED, status=status.HTTP_403_FORBIDDEN)
+
+        queryset = params_source(request.GET).objects.filter(user=user)
+        filterset = TransactionFilter(request.GET, queryset=queryset)
+        if not filterset.is_valid():
+            return JsonResponse(filterset.errors, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            fields = parse_fields(request.GET)
+        except InvalidFields as error:
+            return JsonResponse({'fields': [str(error)]}, status=status.HTTP_400_BAD_REQUEST)
+        # Поиск может проверить наличие FTS-индекса запросом к БД
+        queryset = await sync_to_async(lambda: lean_queryset(filterset.qs, fields))()
+
+        paginator = self.pagination_class()
+        if not paginator.is_enabled(request):
+            return JsonResponse(await run_in_thread(lean_rows, queryset, fields), safe=False)
+
+        paginator.request = request
+        try:
+            # Страница — через async-итерацию ORM, итоги — параллельно
+            # в отдельном потоке со своим соединением
+            (transactions, paginator.next_cursor), totals = await asyncio.gather(
+                akeyset_page(
+                    queryset,
+                    request.GET.get('ordering'),
+                    request.GET.get(paginator.cursor_query_param),
+                    paginator.get_page_size(request),
+                ),
+                run_in_thread(get_totals, user, queryset, filter_signature(request.GET)),
+            )
+        except InvalidCursor:
+            return JsonResponse({'detail': 'Некорректный курсор'}, status=status.HTTP_404_NOT_FOUND)
+
+        return JsonResponse({
+            'next': paginator.get_next_link(),
+            'totals': {key: decimal_to_float(value) for key, value in totals.items()},
+            'results': await run_in_thread(lean_rows, transactions, fields),
+        })
+
+
+class AccountViewSet(viewsets.ModelViewSet):
+    """
+    Счета пользователя с текущим остатком; ?as_of=YYYY-MM-DD — еще и
+    остаток на конец этого дня (balance_as_of)
+    """
+    serializer_class = AccountSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        as_of = self.request.query_params.get('as_of')
+        if as_of:
+            try:
+                day = serializers.DateField().to_internal_value(as_of)
+            except serializers.ValidationError as e:
+                raise serializers.ValidationError({'as_of': e.detail})
+            return balances_as_of(self.request.user, day)
+        return Account.objects.filter(user=self.request.user).order_by('pk')
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+
+class BudgetViewSet(viewsets.ModelViewSet):
+    """
+    Месячные бюджеты по категориям с потраченным, остатком и прогнозом
+    на конец месяца; alert — уровень последней пакетной проверки
+    (manage.py check_budgets), status — текущий
+    """
+    serializer_class = BudgetSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return Budget.objects.filter(user=self.request.user).order_by('pk')
+
+    def get_serializer(self, *args, **kwargs):
+        if args and args[0] is not None:
+            statuses = get_budget_statuses(self.request.user)
+            budgets = attach_statuses(args[0] if kwargs.get('many') else [args[0]], statuses)
+            args = (budgets if kwargs.get('many') else budgets[0], *args[1:])
+        return super().get_serializer(*args, **kwargs)
+
+    def perform_create(self, serializer):
+        currency = serializer.validated_data.get('currency') or get_base_currency(self.request.user)
+        serializer.save(user=self.request.user, currency=currency)
+        attach_statuses([serializer.instance], get_budget_statuses(self.request.user))
+
+    def perform_update(self, serializer):
+        serializer.save()
+        attach_statuses([serializer.instance], get_budget_statuses(self.request.user))
+
+
+class ProfileView(APIView):
+    """
+    Настройки пользователя: GET — профиль, PATCH {"base_currency"} — смена
+    базовой валюты (итоги и статистика по умолчанию считаются в ней)
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get_object(self):
+        return Profile.objects.get_or_create(user=self.request.user)[0]
+
+    def get(self, request):
+        return Response(ProfileSerializer(self.get_object()).data)
+
+    def patch(self, request):
+        serializer = ProfileSerializer(self.get_object(), data=request.data, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data)
+
+
+class RecurringRuleViewSet(viewsets.ModelViewSet):
+    """
+    Повторяющиеся операции. Операции по правилу создает планировщик
+    (manage.py materialize_recurring); уже наступившие — сразу при создании
+    """
+    serializer_class = RecurringRuleSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return RecurringRule.objects.filter(user=self.request.user).order_by('pk')
+
+    def perform_create(self, serializer):
+        rule = serializer.save(user=self.request.user)
+        materialize_rules(RecurringRule.objects.filter(pk=rule.pk))
+        rule.refresh_from_db()
+
+
+class JobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Фоновые задачи пользователя: постановка (POST {"kind", "params"}),
+    опрос статуса и прогресса, скачивание результата выгрузки
+    """
+    serializer_class = JobSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return Job.objects.filter(user=self.request.user).order_by('-created_at')
+
+    def create(self, request):
+        kind = request.data.get('kind')
+        try:
+            params = validate_params(kind, request.data.get('params') or {})
+        except InvalidJobParams as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        job, _ = submit_job(request.user, kind, params)
+        return job_accepted(request, job)
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        job = self.get_object()
+        if job.status != Job.DONE or not job.file:
+            return Response({'detail': 'Результат еще не готов', 'status': job.status},
+                            status=status.HTTP_409_CONFLICT)
+        return FileResponse(
+            job.file.open('rb'),
+            as_attachment=True,
+            filename=os.path.basename(job.file.name),
+            content_type=EXPORT_FORMATS.get(job.params.get('file_format')),
+        )
+
+
+class SyncView(APIView):
+    """
+    Инкрементальная синхронизация: ?token=<токен из прошлого ответа>.
+    Без токена (или с некорректным либо устаревшим) возвращается полный
+    снимок данных пользователя
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        sync = changes_since(request.user, request.query_params.get('token'))
+        transactions, deleted_transactions = sync['changes']['transaction']
+        categories, deleted_categories = sync['changes']['category']
+        context = {'request': request}
+        return Response({
+            'token': sync['token'],
+            'full': sync['full'],
+            'transactions': {
+                'changed': TransactionSerializer(transactions, many=True, context=context).data,
+                'deleted': deleted_transactions,
+            },
+            'categories': {
+                'changed': CategorySerializer(categories, many=True, context=context).data,
+                'deleted': deleted_categories,
+            },
+        })
+
+
+@method_decorator(staff_member_required, name='dispatch')
+class MetricsView(View):
+    """Метрики по представлениям в формате Prometheus"""
+
+    def get(self, request):
+        cache_stats = get_cache_stats()
+        extra = [
+            ('finance_statistics_cache_hits_total', 'counter',
+             'Попадания в кэш статистики', cache_stats['hits']),
+            ('finance_statistics_cache_misses_total', 'counter',
+             'Промахи кэша статистики', cache_stats['misses']),
+        ]
+        return HttpResponse(
+            render_prometheus(registry.snapshot(), extra),
+            content_type='text/plain; version=0.0.4; charset=utf-8',
         )
-        total_expense = decimal_to_float(total_expense_result['total']) or 0
-        
-        balance = total_income - total_expense
-
-        # Сумма по категориям (преобразуем Decimal в float)
-        category_summary = list(transactions.values(
-            'category__name'
-        ).annotate(
-            total=Sum('amount')
-        ).order_by('-total'))
-        
-        for item in category_summary:
-            item['total'] = decimal_to_float(item['total']) or 0
-
-        # Тренд по месяцам
-        monthly_trend_data = list(transactions.annotate(
-            month=TruncMonth('date')
-        ).values(
-            'month', 
-            'type'
-        ).annotate(
-            total=Sum('amount')
-        ).order_by('month'))
-
-        # Форматируем месячные данные (преобразуем Decimal в float)
-        trend = OrderedDict()
-        for entry in monthly_trend_data:
-            month_str = entry['month'].strftime('%Y-%m')
-            if month_str not in trend:
-                trend[month_str] = {'income': 0, 'expense': 0}
-            trend[month_str][entry['type']] = decimal_to_float(entry['total']) or 0
-
-        data = {
-            "total_income": total_income,
-            "total_expense": total_expense,
-            "balance": balance,
-            "category_summary": category_summary,
-            "monthly_trend": trend,
-            "transaction_count": transactions.count(),
-            "date_range": {
-                "from": from_date,
-                "to": to_date
-            }
-        }
-
-        return Response(data)
-    
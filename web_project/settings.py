@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+from importlib.util import find_spec
 from pathlib import Path
 import os
 
@@ -43,6 +44,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'transactions.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -77,11 +79,150 @@ WSGI_APPLICATION = 'web_project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
+# Профиль БД выбирается переменной DATABASE_PROFILE:
+# sqlite (по умолчанию) — SQLite с WAL и PRAGMA из SQLITE_PRAGMAS
+# (применяются при каждом подключении, см. transactions/db.py);
+# sqlite-default — SQLite с настройками по умолчанию (для сравнения);
+# postgres — PostgreSQL из переменных POSTGRES_*, с постоянными
+# соединениями (POSTGRES_CONN_MAX_AGE) или пулом psycopg (POSTGRES_POOL_MAX_SIZE).
+
+DATABASE_PROFILE = os.environ.get('DATABASE_PROFILE', 'sqlite')
+SQLITE_PATH = os.environ.get('SQLITE_PATH', BASE_DIR / 'db.sqlite3')
+POSTGRES_POOL_MAX_SIZE = int(os.environ.get('POSTGRES_POOL_MAX_SIZE', 0))
+
+DATABASE_PROFILES = {
+    'sqlite-default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': SQLITE_PATH,
+    },
+    'sqlite': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': SQLITE_PATH,
+        'OPTIONS': {
+            # Ожидание блокировки вместо "database is locked": писатели
+            # SQLite ждут без очереди, и при 16 потоках отдельные ожидания
+            # превышают 5 с (см. manage.py bench_writes)
+            'timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 20000)) / 1000,
+            # Блокировка на запись берется в начале транзакции: без
+            # взаимоблокировок при повышении чтения до записи
+            'transaction_mode': 'IMMEDIATE',
+        },
+    },
+    'postgres': {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('POSTGRES_DB', 'finance'),
+        'USER': os.environ.get('POSTGRES_USER', 'finance'),
+        'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+        'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+        'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+        # С пулом постоянные соединения не используются (их держит пул)
+        'CONN_MAX_AGE': 0 if POSTGRES_POOL_MAX_SIZE else int(os.environ.get('POSTGRES_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'pool': {
+                'min_size': int(os.environ.get('POSTGRES_POOL_MIN_SIZE', 2)),
+                'max_size': POSTGRES_POOL_MAX_SIZE,
+                'timeout': int(os.environ.get('POSTGRES_POOL_TIMEOUT', 10)),
+            },
+        } if POSTGRES_POOL_MAX_SIZE else {},
+    },
+}
+
 DATABASES = {
+    'default': DATABASE_PROFILES[DATABASE_PROFILE],
+}
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 20000)),
+    'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+    # Отрицательное значение — размер в КиБ
+    'cache_size': -int(os.environ.get('SQLITE_CACHE_SIZE_KB', 64 * 1024)),
+    'temp_store': 'MEMORY',
+} if DATABASE_PROFILE == 'sqlite' else {
+    # WAL сохраняется в файле БД: профиль по умолчанию возвращает журнал
+    'journal_mode': 'DELETE',
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+# Кэш статистики выбирается переменной STATISTICS_CACHE_BACKEND:
+# locmem (по умолчанию, LRU в памяти процесса), file или redis
+# (локальный redis-server; вытеснение задается его maxmemory-policy).
+
+STATISTICS_CACHE_TIMEOUT = int(os.environ.get('STATISTICS_CACHE_TIMEOUT', 600))
+STATISTICS_CACHE_MAX_ENTRIES = int(os.environ.get('STATISTICS_CACHE_MAX_ENTRIES', 10000))
+
+STATISTICS_CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'statistics',
+        'OPTIONS': {'MAX_ENTRIES': STATISTICS_CACHE_MAX_ENTRIES},
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('STATISTICS_CACHE_LOCATION', BASE_DIR / 'cache' / 'statistics'),
+        'OPTIONS': {'MAX_ENTRIES': STATISTICS_CACHE_MAX_ENTRIES},
+    },
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('STATISTICS_CACHE_LOCATION', 'redis://127.0.0.1:6379/1'),
+    },
+}
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'statistics': {
+        **STATISTICS_CACHE_BACKENDS[os.environ.get('STATISTICS_CACHE_BACKEND', 'locmem')],
+        'TIMEOUT': STATISTICS_CACHE_TIMEOUT,
+    },
+}
+STATISTICS_CACHE_ALIAS = 'statistics'
+
+
+# Instrumentation
+# Время ответа, время в БД и число SQL-запросов по представлениям:
+# заголовок Server-Timing и метрики Prometheus на /metrics/ (только staff).
+# Агрегаты хранятся в памяти процесса.
+
+INSTRUMENTATION = {
+    'ENABLED': os.environ.get('INSTRUMENTATION_ENABLED', '1') == '1',
+    'SERVER_TIMING': True,
+    # Один и тот же SQL N и более раз за запрос — вероятный N+1 (пишется в лог)
+    'N_PLUS_ONE_THRESHOLD': int(os.environ.get('INSTRUMENTATION_N_PLUS_ONE_THRESHOLD', 5)),
+}
+
+
+# Background jobs
+# Тяжелая статистика и большие выгрузки выполняются воркером
+# (manage.py run_jobs), очередь — таблица transactions_job.
+
+JOBS = {
+    # Статистика за период длиннее — фоновой задачей (202 + id задачи)
+    'STATISTICS_INLINE_MAX_DAYS': int(os.environ.get('JOBS_STATISTICS_INLINE_MAX_DAYS', 366)),
+    # Выгрузка большего числа строк — фоновой задачей
+    'EXPORT_INLINE_MAX_ROWS': int(os.environ.get('JOBS_EXPORT_INLINE_MAX_ROWS', 50000)),
+    'FILES_ROOT': os.environ.get('JOBS_FILES_ROOT', BASE_DIR / 'jobs'),
+    # Задача без heartbeat дольше этого считается брошенной и перезапускается
+    'STALE_AFTER_SECONDS': 600,
+    'MAX_ATTEMPTS': 3,
+    # Сколько хранятся завершенные задачи и их файлы
+    'RETENTION_DAYS': 7,
+}
+
+
+# Archive
+# Операции старше горизонта переносятся из transactions_transaction
+# в архивную таблицу (manage.py archive_transactions, см. archive.py).
+# Горизонт — начало года, в который попадает дата AFTER_DAYS дней назад.
+
+ARCHIVE = {
+    'AFTER_DAYS': int(os.environ.get('ARCHIVE_AFTER_DAYS', 730)),
+    'BATCH_SIZE': int(os.environ.get('ARCHIVE_BATCH_SIZE', 5000)),
 }
 
 
@@ -123,7 +264,25 @@ STATIC_URL = 'static/'
 STATICFILES_DIRS = [
     os.path.join(BASE_DIR, "static")
 ]
+# JSON в API: orjson (transactions/renderers.py) или стандартный json DRF.
+# По умолчанию orjson, если пакет установлен
+API_JSON_BACKEND = os.environ.get('API_JSON_BACKEND', 'orjson' if find_spec('orjson') else 'json')
+API_JSON_BACKENDS = {
+    'orjson': ('transactions.renderers.ORJSONRenderer', 'transactions.renderers.ORJSONParser'),
+    'json': ('rest_framework.renderers.JSONRenderer', 'rest_framework.parsers.JSONParser'),
+}
+API_JSON_RENDERER, API_JSON_PARSER = API_JSON_BACKENDS[API_JSON_BACKEND]
+
 REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        API_JSON_RENDERER,
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        API_JSON_PARSER,
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],